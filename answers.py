@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Ответы на «Вопрос дня»
+- Каждый ответ — строка (user_id, день, вопрос) → выбранный вариант и/или свободный комментарий;
+  повторный ответ в тот же день перезаписывает строку, а не добавляет новую
+- Распределение ответов по вариантам (qod_counts) и серии дней подряд (qod_users) держатся в памяти
+  и обновляются на каждый ответ → «ты и N% остальных» и серия — O(1), без прохода по истории
+- Запись — write-behind, как у state_store: пачкой в отдельном потоке, одной транзакцией
+  (строки + приращения счётчиков + серии); история пользователя — запрос по первичному ключу
+- ANSWERS_DB (answers.db; при STATE_BACKEND=memory — в памяти). Шарды пишут в одну базу:
+  приращения складываются в SQL, так что итоги в qod_counts не затирают друг друга. Но «N% остальных»
+  считается по счётчикам в памяти воркера — снимок базы на старте плюс ответы его шарда; ответы
+  других шардов он увидит только после рестарта. Распределения в боте — по шарду, не общие
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+log = logging.getLogger("mindmeld_bot.answers")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS qod_answers ("
+    " user_id INTEGER NOT NULL, day TEXT NOT NULL, question TEXT NOT NULL,"
+    " choice TEXT, comment TEXT, at REAL NOT NULL,"
+    " PRIMARY KEY (user_id, day, question)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS qod_answers_day ON qod_answers (day)",
+    "CREATE TABLE IF NOT EXISTS qod_counts ("
+    " question TEXT NOT NULL, choice TEXT NOT NULL, n INTEGER NOT NULL,"
+    " PRIMARY KEY (question, choice)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS qod_users ("
+    " user_id INTEGER PRIMARY KEY, last TEXT NOT NULL, streak INTEGER NOT NULL,"
+    " best INTEGER NOT NULL, total INTEGER NOT NULL)",
+)
+
+
+class AnswerStore:
+    def __init__(self, path: str = "answers.db", flush_interval: float = 0.5, max_batch: int = 500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.counts = {}        # вопрос → {вариант: сколько раз выбран}
+        self.users = {}         # user_id → [последний день, серия, лучшая серия, дней с ответом]
+        self._today = {}        # (user_id, вопрос) → вариант, выбранный сегодня (для смены ответа)
+        self._today_day = None
+        self._pending = {}      # (user_id, день, вопрос) → [choice, comment, at]
+        self._deltas = {}       # (вопрос, вариант) → приращение
+        self._dirty_users = set()
+        self._wakeup = None
+        self._task = None
+        self._flush_lock = None
+        self.answers = 0
+        self.flushes = 0
+
+    # ─────────── старт / остановка ───────────
+    def _open(self, today: date):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        if self.path != ":memory:":
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        for stmt in _SCHEMA:
+            db.execute(stmt)
+        counts = {}
+        for question, choice, n in db.execute("SELECT question, choice, n FROM qod_counts"):
+            counts.setdefault(question, {})[choice] = n
+        users = {uid: [last, streak, best, total]
+                 for uid, last, streak, best, total in db.execute("SELECT * FROM qod_users")}
+        today_rows = db.execute("SELECT user_id, question, choice FROM qod_answers WHERE day = ? AND choice IS NOT NULL",
+                                (today.isoformat(),)).fetchall()
+        return db, counts, users, {(uid, q): c for uid, q, c in today_rows}
+
+    async def start(self, today: date = None):
+        today = today or date.today()
+        self._db, self.counts, self.users, self._today = await asyncio.to_thread(self._open, today)
+        self._today_day = today
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._flusher(), name="answers-flusher")
+        log.info("answers: %d questions, %d users", len(self.counts), len(self.users))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._db is not None:
+            await self.flush()
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+    # ─────────── запись ───────────
+    def record(self, uid: int, question: str, choice: str = None, comment: str = None, day: date = None) -> dict:
+        """Ответ пользователя на вопрос дня: вариант и/или комментарий (что передано — то и обновится).
+        Возвращает сводку для ответа в чате: доля выбравших то же, серия."""
+        day = day or date.today()
+        if day != self._today_day:
+            self._today, self._today_day = {}, day
+        key = (uid, day.isoformat(), question)
+        row = self._pending.setdefault(key, [None, None, 0.0])
+        row[2] = time.time()
+        if choice is not None:
+            row[0] = choice
+            prev = self._today.get((uid, question))
+            if prev != choice:
+                if prev is not None:
+                    self._count(question, prev, -1)
+                self._count(question, choice, +1)
+                self._today[(uid, question)] = choice
+        if comment is not None:
+            row[1] = comment
+        self._touch_streak(uid, day)
+        self.answers += 1
+        if self._wakeup is not None and len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+        return self.summary(uid, question, self._today.get((uid, question)))
+
+    def _count(self, question: str, choice: str, delta: int):
+        options = self.counts.setdefault(question, {})
+        options[choice] = options.get(choice, 0) + delta
+        self._deltas[(question, choice)] = self._deltas.get((question, choice), 0) + delta
+
+    def _touch_streak(self, uid: int, day: date):
+        rec = self.users.get(uid)
+        iso = day.isoformat()
+        if rec is None:
+            self.users[uid] = [iso, 1, 1, 1]
+        elif rec[0] == iso:
+            return
+        else:
+            rec[1] = rec[1] + 1 if rec[0] == (day - timedelta(days=1)).isoformat() else 1
+            rec[0] = iso
+            rec[2] = max(rec[2], rec[1])
+            rec[3] += 1
+        self._dirty_users.add(uid)
+
+    # ─────────── чтение ───────────
+    def share(self, question: str, choice: str) -> tuple:
+        """(сколько ещё выбрали choice, сколько всего ответов остальных) — без самого пользователя."""
+        options = self.counts.get(question) or {}
+        others = sum(options.values()) - 1
+        return max(0, options.get(choice, 0) - 1), max(0, others)
+
+    def streak(self, uid: int, today: date = None) -> int:
+        """Текущая серия: дни подряд с ответом, включая сегодня или вчера (иначе серия прервана)."""
+        rec = self.users.get(uid)
+        if rec is None:
+            return 0
+        today = today or date.today()
+        alive = (today.isoformat(), (today - timedelta(days=1)).isoformat())
+        return rec[1] if rec[0] in alive else 0
+
+    def profile(self, uid: int) -> dict:
+        rec = self.users.get(uid) or [None, 0, 0, 0]
+        return {"streak": self.streak(uid), "best": rec[2], "days": rec[3]}
+
+    def summary(self, uid: int, question: str, choice: str = None) -> dict:
+        same, others = self.share(question, choice) if choice is not None else (0, 0)
+        return {"choice": choice, "same": same, "others": others,
+                "percent": round(same * 100 / others) if others else None, **self.profile(uid)}
+
+    def _history(self, uid: int, limit: int) -> list:
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT day, question, choice, comment FROM qod_answers WHERE user_id = ?"
+                " ORDER BY day DESC LIMIT ?", (uid, limit)).fetchall()
+        return [{"day": d, "question": q, "choice": c, "comment": m} for d, q, c, m in rows]
+
+    async def history(self, uid: int, limit: int = 10) -> list:
+        """Последние ответы пользователя (новые сверху): сохранённые + ещё не сброшенные на диск."""
+        await self.flush()
+        return await asyncio.to_thread(self._history, uid, limit)
+
+    # ─────────── сброс на диск ───────────
+    async def _flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                log.warning("answers flush failed (will retry): %s", e)
+
+    def _write(self, rows, deltas, users):
+        with self._db_lock:
+            db = self._db
+            db.execute("BEGIN")
+            try:
+                db.executemany(
+                    "INSERT INTO qod_answers (user_id, day, question, choice, comment, at) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (user_id, day, question) DO UPDATE SET"
+                    " choice = COALESCE(excluded.choice, choice), comment = COALESCE(excluded.comment, comment),"
+                    " at = excluded.at", rows)
+                db.executemany(
+                    "INSERT INTO qod_counts (question, choice, n) VALUES (?, ?, ?) "
+                    "ON CONFLICT (question, choice) DO UPDATE SET n = n + excluded.n", deltas)
+                db.executemany(
+                    "INSERT INTO qod_users (user_id, last, streak, best, total) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (user_id) DO UPDATE SET last = excluded.last, streak = excluded.streak,"
+                    " best = excluded.best, total = excluded.total", users)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    async def flush(self):
+        if not (self._pending or self._deltas or self._dirty_users) or self._db is None:
+            return
+        async with self._flush_lock or asyncio.Lock():
+            pending, self._pending = self._pending, {}
+            deltas, self._deltas = self._deltas, {}
+            dirty, self._dirty_users = self._dirty_users, set()
+            rows = [(uid, day, q, c, m, at) for (uid, day, q), (c, m, at) in pending.items()]
+            users = [(uid, *self.users[uid]) for uid in dirty]
+            try:
+                await asyncio.to_thread(self._write, rows, [(q, c, n) for (q, c), n in deltas.items() if n], users)
+            except Exception:
+                # вернуть несохранённое: свежие правки тех же ключей важнее
+                for key, row in pending.items():
+                    self._pending.setdefault(key, row)
+                for key, n in deltas.items():
+                    self._deltas[key] = self._deltas.get(key, 0) + n
+                self._dirty_users |= dirty
+                raise
+            self.flushes += 1
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        return {"questions": len(self.counts), "users": len(self.users), "answers": self.answers,
+                "pending": len(self._pending), "flushes": self.flushes}
+
+
+def open_answers() -> AnswerStore:
+    memory = os.getenv("STATE_BACKEND", "sqlite").strip().lower() == "memory"
+    return AnswerStore(":memory:" if memory else os.getenv("ANSWERS_DB", "answers.db").strip(),
+                       flush_interval=float(os.getenv("STATE_FLUSH_INTERVAL", "0.5")))
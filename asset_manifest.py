@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Манифест собранных медиа (build_assets.py → dist/manifest.json)
+- path(исходник) → оптимизированная копия из манифеста, если она есть и её размер совпадает;
+  иначе — сам исходник (манифеста нет, сборка не запускалась, копия битая)
+- validate() один раз на старте: всё ли на месте, не испорчены ли копии (sha256),
+  не устарела ли сборка относительно исходников → список проблем, а не FileNotFoundError в хендлере
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+log = logging.getLogger("mindmeld_bot.assets")
+
+MANIFEST_VERSION = 1
+_CHUNK = 64 * 1024
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class AssetManifest:
+    def __init__(self, entries: dict = None, path: str = None):
+        self.path = path
+        self.entries = entries or {}   # исходник → {"path", "kind", "sha256", "size", "source_sha256", ...}
+        self.resolved = {}             # исходник → что реально отправляем
+
+    @classmethod
+    def load(cls, path: str) -> "AssetManifest":
+        if not path or not os.path.exists(path):
+            return cls(path=path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            log.warning("asset manifest %s unreadable: %s — using source files", path, e)
+            return cls(path=path)
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            log.warning("asset manifest %s: unsupported version — using source files", path)
+            return cls(path=path)
+        entries = {src: e for src, e in (data.get("assets") or {}).items()
+                   if isinstance(e, dict) and isinstance(e.get("path"), str)}
+        return cls(entries, path=path)
+
+    def path_for(self, source: str) -> str:
+        """Что отправлять вместо source: собранная копия (если цела по размеру) или сам source."""
+        entry = self.entries.get(source)
+        target = source
+        if entry is not None:
+            try:
+                if os.path.getsize(entry["path"]) == entry.get("size"):
+                    target = entry["path"]
+                else:
+                    log.warning("asset %s: size differs from manifest — sending source", entry["path"])
+            except OSError:
+                log.warning("asset %s missing — sending source %s", entry["path"], source)
+        self.resolved[source] = target
+        return target
+
+    def validate(self, check_hashes: bool = True) -> dict:
+        """Проверка всех разрешённых через path_for файлов → {путь: проблема}; пустой словарь — всё в порядке.
+        Устаревшая сборка (исходник поменялся) — только предупреждение: отправляется прошлая версия."""
+        problems = {}
+        for source, target in self.resolved.items():
+            if not os.path.isfile(target):
+                problems[target] = "missing"
+                continue
+            entry = self.entries.get(source)
+            if entry is None or target != entry["path"] or not check_hashes:
+                continue
+            try:
+                if file_sha256(target) != entry.get("sha256"):
+                    problems[target] = "sha256 mismatch"
+                elif os.path.isfile(source) and file_sha256(source) != entry.get("source_sha256"):
+                    log.warning("asset %s is older than %s — rerun build_assets.py", target, source)
+            except OSError as e:
+                problems[target] = str(e)
+        return problems
+
+    def stats(self) -> dict:
+        sizes = {}
+        for source, target in self.resolved.items():
+            try:
+                sizes[target] = os.path.getsize(target)
+            except OSError:
+                sizes[target] = None
+        return {"manifest": self.path if self.entries else None, "files": sizes,
+                "bytes": sum(s for s in sizes.values() if s)}
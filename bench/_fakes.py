@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Минимальные заглушки Update/CallbackQuery/Bot для бенчмарков хендлеров bot.py без сети.
+API-вызовы ничего не делают, кроме учёта (bot.calls) и опциональной задержки (latency).
+Правки ведут себя как в Telegram: edit_text по фото и правка «на то же самое» → BadRequest.
+"""
+
+import asyncio
+import itertools
+import os
+import sys
+from types import SimpleNamespace as NS
+
+from telegram.error import BadRequest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+_msg_ids = itertools.count(1)
+
+
+class FakeBot:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.last = {}  # chat_id → последнее отправленное сообщение
+
+    async def _call(self, **kw):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        msg = FakeMessage(self, kw.get("chat_id", 0), text=kw.get("text"), markup=kw.get("reply_markup"))
+        self.last[msg.chat_id] = msg
+        return msg
+
+    async def send_message(self, chat_id, text, reply_markup=None, **kw):
+        return await self._call(chat_id=chat_id, text=text, reply_markup=reply_markup)
+
+    async def send_photo(self, chat_id, photo=None, caption=None, reply_markup=None, **kw):
+        msg = await self._call(chat_id=chat_id, reply_markup=reply_markup)
+        msg.photo = [NS(file_id="photo-fid")]
+        msg.caption = caption
+        return msg
+
+    async def send_document(self, chat_id, document=None, **kw):
+        msg = await self._call(chat_id=chat_id)
+        msg.document = NS(file_id="doc-fid")
+        return msg
+
+    async def get_chat_member(self, chat_id, user_id, **kw):
+        await self._call()
+        return NS(status="member")
+
+
+class FakeMessage:
+    def __init__(self, bot, chat_id, text="menu", photo=None, markup=None):
+        self._bot = bot
+        self.chat_id = chat_id
+        self.message_id = next(_msg_ids)
+        self.text = text
+        self.caption = None
+        self.reply_markup = markup
+        self.photo = photo
+        self.document = None
+
+    async def _edit(self, field, value, markup):
+        await self._bot._call()
+        if (value, markup) == (getattr(self, field), self.reply_markup):
+            raise BadRequest("Message is not modified")
+        setattr(self, field, value)
+        self.reply_markup = markup
+        return self
+
+    async def edit_text(self, text, reply_markup=None, **kw):
+        if self.photo:
+            await self._bot._call()
+            raise BadRequest("There is no text in the message to edit")
+        return await self._edit("text", text, reply_markup)
+
+    async def edit_caption(self, caption=None, reply_markup=None, **kw):
+        if not self.photo:
+            await self._bot._call()
+            raise BadRequest("There is no caption in the message to edit")
+        return await self._edit("caption", caption, reply_markup)
+
+    async def reply_text(self, text, reply_markup=None, **kw):
+        return await self._bot.send_message(self.chat_id, text, reply_markup=reply_markup)
+
+    async def reply_document(self, document, **kw):
+        return await self._bot.send_document(self.chat_id, document)
+
+    async def delete(self):
+        await self._bot._call()
+        return True
+
+
+class FakeQuery:
+    def __init__(self, bot, uid, data, message=None):
+        self.data = data
+        self.from_user = NS(id=uid)
+        self.message = message or FakeMessage(bot, uid)
+
+    async def answer(self, *a, **kw):
+        await self.message._bot._call()
+        return True
+
+
+def callback_update(bot, uid, data, message=None):
+    q = FakeQuery(bot, uid, data, message)
+    return NS(callback_query=q, effective_chat=NS(id=uid), effective_user=NS(id=uid), message=None)
+
+
+def text_update(bot, uid, text):
+    return NS(callback_query=None, effective_chat=NS(id=uid), effective_user=NS(id=uid),
+              message=FakeMessage(bot, uid, text=text))
+
+
+def context(bot):
+    return NS(bot=bot, job_queue=None)
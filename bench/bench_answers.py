@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Ответы на «Вопрос дня» (answers.py): «так же ответили N%» по счётчикам vs подсчёт по истории.
+
+    python bench/bench_answers.py [--rows 1000000] [--users 50000] [--questions 30] [--answers 20000]
+
+База заранее набита --rows ответами за прошлые дни (как после долгой работы бота). Замеры:
+старт (загрузка счётчиков и серий), record + сводка на ответ (p50/p99) vs GROUP BY по истории
+вопроса, история пользователя (/answers), сброс на диск. Проверка: счётчики в памяти и в qod_counts
+совпадают с подсчётом по строкам qod_answers, смена ответа в тот же день не считается дважды.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+import _fakes  # noqa: F401  (sys.path)
+from answers import _SCHEMA, AnswerStore  # noqa: E402
+
+OPTIONS = ("Да", "Нет", "Скорее да", "Скорее нет", "Не знаю")
+
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+def prefill(path: str, rows: int, users: int, questions: int, today: date):
+    """Прошлые ответы сразу в SQLite: строки + согласованные с ними qod_counts/qod_users."""
+    rnd = random.Random(7)
+    db = sqlite3.connect(path)
+    for stmt in _SCHEMA:
+        db.execute(stmt)
+    answers, counts, last = {}, {}, {}
+    while len(answers) < rows:
+        uid = rnd.randrange(1, users + 1)
+        day = today - timedelta(days=rnd.randrange(1, 365))
+        question = f"Вопрос {rnd.randrange(questions)}"
+        choice = rnd.choice(OPTIONS)
+        key = (uid, day.isoformat(), question)
+        if key in answers:
+            continue
+        answers[key] = choice
+        counts[(question, choice)] = counts.get((question, choice), 0) + 1
+        last[uid] = max(last.get(uid, day), day)
+    db.executemany("INSERT INTO qod_answers VALUES (?, ?, ?, ?, NULL, 0)",
+                   ((u, d, q, c) for (u, d, q), c in answers.items()))
+    db.executemany("INSERT INTO qod_counts VALUES (?, ?, ?)", ((q, c, n) for (q, c), n in counts.items()))
+    db.executemany("INSERT INTO qod_users VALUES (?, ?, 1, 1, 1)", ((u, d.isoformat()) for u, d in last.items()))
+    db.commit()
+    db.close()
+
+
+def scan_counts(db, question: str = None) -> dict:
+    sql = "SELECT question, choice, COUNT(*) FROM qod_answers WHERE choice IS NOT NULL"
+    args = ()
+    if question is not None:
+        sql += " AND question = ?"
+        args = (question,)
+    return {(q, c): n for q, c, n in db.execute(sql + " GROUP BY question, choice", args)}
+
+
+async def main(args):
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "answers.db")
+    today = date.today()
+    t = time.perf_counter()
+    prefill(path, args.rows, args.users, args.questions, today)
+    print(f"prefill: {args.rows} answers in {time.perf_counter() - t:.1f}s, {os.path.getsize(path) / 1e6:.0f} MB")
+
+    store = AnswerStore(path)
+    t = time.perf_counter()
+    await store.start(today)
+    print(f"start (counters + streaks):  {(time.perf_counter() - t) * 1000:8.1f}ms")
+
+    rnd = random.Random(11)
+    question = "Вопрос 0"
+    calls = []
+    for i in range(args.answers):
+        uid = rnd.randrange(1, args.users * 2)
+        t = time.perf_counter()
+        store.record(uid, question, choice=rnd.choice(OPTIONS))
+        calls.append(time.perf_counter() - t)
+        if i % 100 == 0:
+            await asyncio.sleep(0)  # дать флашеру поработать, как между апдейтами
+    print(f"record + summary:            p50 {_pct(calls, .5) * 1e6:6.1f}µs  p99 {_pct(calls, .99) * 1e6:6.1f}µs")
+
+    # тот же пользователь передумал — счётчик переезжает, а не растёт
+    store.record(1, question, choice="Да")
+    store.record(1, question, choice="Нет")
+    store.record(1, question, comment="передумал")
+
+    t = time.perf_counter()
+    await store.flush()
+    print(f"flush:                       {(time.perf_counter() - t) * 1000:8.1f}ms ({store.flushes} flushes total)")
+
+    db = sqlite3.connect(path)
+    t = time.perf_counter()
+    want = scan_counts(db, question)
+    print(f"GROUP BY over history:       {(time.perf_counter() - t) * 1000:8.1f}ms per summary (one question)")
+
+    t = time.perf_counter()
+    history = await store.history(1, limit=10)
+    print(f"/answers history:            {(time.perf_counter() - t) * 1000:8.1f}ms ({len(history)} rows)")
+    assert history[0]["choice"] == "Нет" and history[0]["comment"] == "передумал", history[0]
+
+    got = {(question, c): n for c, n in store.counts[question].items() if n}
+    assert got == want, "in-memory counters differ from rows"
+    stored = {(q, c): n for q, c, n in db.execute("SELECT question, choice, n FROM qod_counts") if n}
+    assert stored == scan_counts(db), "qod_counts differ from rows"
+    await store.close()
+
+    restarted = AnswerStore(path)
+    await restarted.start(today)
+    restarted.record(1, question, choice="Да")  # сегодняшний выбор подхвачен из базы: снова смена, не +1
+    await restarted.flush()
+    assert {(q, c): n for q, c, n in db.execute("SELECT question, choice, n FROM qod_counts") if n} == scan_counts(db)
+    await restarted.close()
+    db.close()
+    print("counters match rows: ok")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--users", type=int, default=50_000)
+    ap.add_argument("--questions", type=int, default=30)
+    ap.add_argument("--answers", type=int, default=20_000)
+    asyncio.run(main(ap.parse_args()))
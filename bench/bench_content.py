@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Горячая перезагрузка контента (content.py): цена фоновой проверки и пересборки снимка.
+
+    python bench/bench_content.py [--questions 7] [--checks 5000]
+
+Временная папка с insights.json / questions.json / texts.json. Замеры: проверка без изменений (только stat),
+перечитка после правки questions.json. Проверки (assert): правка подхватывается новым снимком;
+вариант ответа, не влезающий в callback_data кнопки (64 байта с префиксом qod:pick:), и битый JSON
+не принимаются — остаётся предыдущий снимок, ошибка считается.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import _fakes  # noqa: F401  (sys.path)
+
+from content import PICK_PREFIX, ContentCatalog  # noqa: E402
+
+
+def write(path: str, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))  # другой mtime и на грубых ФС
+
+
+def questions(n: int, option: str = "Да") -> dict:
+    return {"questions": [{"question": f"Вопрос {i}?", "options": [option, "Нет", "Не знаю"]} for i in range(n)]}
+
+
+def main(args):
+    folder = tempfile.mkdtemp()
+    paths = {kind: os.path.join(folder, f"{kind}.json") for kind in ("insights", "questions", "texts")}
+    write(paths["insights"], {"insights": [f"Инсайт {i}" for i in range(365)]})
+    write(paths["questions"], questions(args.questions))
+    write(paths["texts"], {"menu": "Меню"})
+    catalog = ContentCatalog(**paths, check_interval=0)
+    assert catalog.current.version == 1 and len(catalog.current.questions) == args.questions
+
+    t = time.perf_counter()
+    for _ in range(args.checks):
+        assert not catalog.refresh(force=True)
+    print(f"check, no changes:        {(time.perf_counter() - t) / args.checks * 1e6:8.1f}µs")
+
+    write(paths["questions"], questions(args.questions, option="Скорее да"))
+    t = time.perf_counter()
+    assert catalog.refresh(force=True)
+    print(f"reload after edit:        {(time.perf_counter() - t) * 1000:8.2f}ms")
+    good = catalog.current
+    assert good.questions[0][1][0] == "Скорее да"
+
+    limit = 64 - len(PICK_PREFIX.encode())
+    fits = "я" * (limit // 2)  # кириллица — по 2 байта
+    write(paths["questions"], questions(args.questions, option=fits))
+    assert catalog.refresh(force=True) and catalog.current.questions[0][1][0] == fits
+    good = catalog.current
+
+    for label, broken in (("option over 64 bytes", None), ("invalid JSON", "{")):
+        errors = catalog.errors
+        if broken is None:
+            write(paths["questions"], questions(args.questions, option=fits + "я"))
+        else:
+            with open(paths["questions"], "w", encoding="utf-8") as f:
+                f.write(broken)
+        assert not catalog.refresh(force=True), label
+        assert catalog.current is good and catalog.errors == errors + 1, label
+        print(f"rejected, previous kept:  {label}")
+    shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, default=7)
+    ap.add_argument("--checks", type=int, default=5000)
+    logging.disable(logging.WARNING)  # отказы здесь нарочные
+    main(ap.parse_args())
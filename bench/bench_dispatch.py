@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Пропускная способность диспетчеризации колбэков: реестр экранов (bot.callbacks)
+против прежней if-цепочки с пересборкой клавиатур на каждое нажатие.
+
+    python bench/bench_dispatch.py [--taps 50000]
+
+API-вызовы — заглушки без задержки, поэтому меряется только наша сторона:
+поиск маршрута + сборка разметки + safe_edit.
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+
+import _fakes  # noqa: F401  (sys.path + BOT_TOKEN)
+
+os.environ.setdefault("STATE_BACKEND", "memory")
+os.environ.setdefault("EVENTS_FILE", os.path.join(tempfile.mkdtemp(), "events.csv"))
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # noqa: E402
+
+import bot  # noqa: E402
+from bot import safe_edit  # noqa: E402
+
+KEYS = [
+    "nav:menu", "nav:mentorship", "nav:consultation", "nav:guides", "nav:qod",
+    "nav:reviews", "nav:contact", "nav:diagnostics", "req:mentorship", "req:consultation",
+    "qod:start", "nav:unknown",
+]
+
+
+# ─────────── прежняя реализация (до реестра экранов), для сравнения ───────────
+def _legacy_menu_kb():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🎯 Наставничество", callback_data="nav:mentorship"),
+         InlineKeyboardButton("💬 Консультация", callback_data="nav:consultation")],
+        [InlineKeyboardButton("🧭 Диагностика (30 мин, бесплатно)", callback_data="nav:diagnostics")],
+        [InlineKeyboardButton("📚 Гайды", callback_data="nav:guides"),
+         InlineKeyboardButton("🔮 Вопрос дня", callback_data="nav:qod")],
+        [InlineKeyboardButton("💎 Отзывы", callback_data="nav:reviews"),
+         InlineKeyboardButton("💛 Поддержать", callback_data="nav:support")],
+        [InlineKeyboardButton("📞 Связаться", callback_data="nav:contact")]
+    ])
+
+
+def _legacy_link_kb(label, url):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(label, url=url)],
+        [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
+    ])
+
+
+def _legacy_guides_kb():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("Путь к себе", callback_data="guide:path_to_self")],
+        [InlineKeyboardButton("Знаю, но не делаю", callback_data="guide:know_but_dont_do")],
+        [InlineKeyboardButton("Принятие себя", callback_data="guide:self_acceptance")],
+        [InlineKeyboardButton("Заткнуть мозг", callback_data="guide:shut_the_mind")],
+        [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
+    ])
+
+
+def _legacy_request_kb(kind):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("✅ Оставить заявку", callback_data=f"req:{kind}")],
+        [InlineKeyboardButton("🧭 Записаться на диагностику", url=bot.DIAGNOSTIC_URL)],
+        [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
+    ])
+
+
+async def legacy_callbacks(update, ctx):
+    q = update.callback_query
+    await q.answer()
+    data = q.data or ""
+
+    if data == "nav:menu":
+        try:
+            await q.message.edit_text("Выбирай раздел 👇", reply_markup=_legacy_menu_kb())
+        except Exception:
+            await q.message.reply_text("Выбирай раздел 👇", reply_markup=_legacy_menu_kb())
+        return
+    if data == "nav:mentorship":
+        await safe_edit(q, bot.MENTORSHIP_TEXT, reply_markup=_legacy_request_kb("mentorship")); return
+    if data == "nav:consultation":
+        await safe_edit(q, bot.CONSULTATION_TEXT, reply_markup=_legacy_request_kb("consultation")); return
+    if data == "nav:guides":
+        await safe_edit(q, bot.GUIDES_HEADER, reply_markup=_legacy_guides_kb()); return
+    if data == "nav:qod":
+        await bot.send_qod_entry(update, ctx, edit=True); return
+    if data == "nav:reviews":
+        await safe_edit(q, "Отзывы:", reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("Открыть канал с отзывами", url=bot.REVIEWS_CHANNEL_URL)],
+            [InlineKeyboardButton("Пост‑подборка", url=bot.REVIEWS_POST_URL)],
+            [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
+        ])); return
+    if data == "nav:support":
+        await bot.send_support(update, ctx, via_callback=True); return
+    if data == "nav:contact":
+        await safe_edit(q, "Связаться со мной:", reply_markup=_legacy_link_kb("Написать в Telegram", bot.CONTACT_TG_URL)); return
+    if data == "nav:diagnostics":
+        await safe_edit(q, bot.DIAG_TEXT, reply_markup=_legacy_link_kb("✅ Записаться на диагностику", bot.DIAGNOSTIC_URL)); return
+    if data == "req:mentorship":
+        await safe_edit(q, "Оставить заявку на наставничество — напиши мне в личку:",
+                        reply_markup=_legacy_link_kb("Написать в Telegram", bot.CONTACT_TG_URL)); return
+    if data == "req:consultation":
+        await safe_edit(q, "Оставить заявку на консультацию — напиши мне в личку:",
+                        reply_markup=_legacy_link_kb("Написать в Telegram", bot.CONTACT_TG_URL)); return
+    if data.startswith("guide:"):
+        await bot.handle_guide(update, ctx); return
+    if data.startswith("qod:"):
+        await bot.qod_callbacks(update, ctx); return
+
+
+async def run(name, handler, taps):
+    fb = _fakes.FakeBot()
+    ctx = _fakes.context(fb)
+    updates = [_fakes.callback_update(fb, 1000 + i % 97, key)
+               for i, key in zip(range(taps), itertools.cycle(KEYS))]
+    t0 = time.perf_counter()
+    for u in updates:
+        await handler(u, ctx)
+    wall = time.perf_counter() - t0
+    print(f"{name:>8}: {taps} taps in {wall:.3f}s → {taps / wall:,.0f} taps/s, {wall / taps * 1e6:.1f}µs/tap")
+    return taps / wall
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--taps", type=int, default=50_000)
+    args = ap.parse_args()
+    await run("warmup", bot.callbacks, 2000)
+    old = await run("if-chain", legacy_callbacks, args.taps)
+    new = await run("registry", bot.callbacks, args.taps)
+    print(f"speedup: ×{new / old:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Запись событий: синхронный append на каждое событие (как log_event в handlers.py) vs EventWriter.
+
+    python bench/bench_events.py [--events 20000] [--handlers 200] [--fsync]
+
+Хендлеры — корутины, каждая пишет события с паузой sleep(0): так цикл событий крутится,
+как под нагрузкой. Отчёт: время вызова записи внутри хендлера (p50/p99/max) и максимальная
+задержка цикла событий (тикер раз в 1 мс). После close() всё записанное должно дочитаться
+EventIndex'ом — ровно столько строк, сколько событий.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import _fakes  # noqa: F401  (sys.path)
+from eventlog import EventIndex, EventLog, EventWriter  # noqa: E402
+
+EVENTS = ("start", "mentoring_view", "guides_view", "insight_view", "contact_view")
+
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+async def _ticker(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - t - 0.001)
+
+
+async def scenario(name: str, args) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), "events.csv")
+    events_log = EventLog(path)
+    writer = EventWriter(events_log, fsync=args.fsync)
+    if name == "sync":
+        def record(uid, event):
+            now = datetime.now()
+            events_log.append_rows([(now.isoformat(), uid, event, "")], now.date(), fsync=args.fsync)
+    else:
+        record = writer.emit
+        await writer.start()
+
+    calls, lags = [], []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    per_handler = args.events // args.handlers
+
+    async def handler(h):
+        for i in range(per_handler):
+            t = time.perf_counter()
+            record(1000 + h, EVENTS[i % len(EVENTS)])
+            calls.append(time.perf_counter() - t)
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(h) for h in range(args.handlers)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    if name != "sync":
+        await writer.close()
+
+    index = EventIndex(events_log, sidecar=path + ".idx.json")
+    index.refresh()
+    return {"name": name, "events": len(calls), "elapsed": elapsed, "p50": _pct(calls, .5),
+            "p99": _pct(calls, .99), "max": max(calls), "lag": max(lags) if lags else 0.0,
+            "rows": index.rows, "bad": index.bad_rows, "writer": writer.stats()}
+
+
+async def main(args):
+    for name in ("sync", "writer"):
+        r = await scenario(name, args)
+        print(f"{name:>6}: {r['events']} events in {r['elapsed']:.2f}s | call p50 {r['p50'] * 1e6:6.1f}µs "
+              f"p99 {r['p99'] * 1e6:7.1f}µs max {r['max'] * 1e3:6.2f}ms | loop lag max {r['lag'] * 1e3:6.2f}ms "
+              f"| on disk {r['rows']} rows")
+        if name == "writer":
+            print(f"        flushes {r['writer']['flushes']}, dropped {r['writer']['dropped']}")
+        assert r["rows"] == r["events"] and not r["bad"], "events lost or corrupted"
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=20000)
+    ap.add_argument("--handlers", type=int, default=200)
+    ap.add_argument("--fsync", action="store_true", help="fsync после каждой записи / пачки")
+    asyncio.run(main(ap.parse_args()))
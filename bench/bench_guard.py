@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Повторные нажатия и флуд (guard.py): сколько вызовов Bot API уходит без защиты и с ней.
+
+    python bench/bench_guard.py [--users 50] [--taps 3] [--gap 0.12] [--flood 300] [--upload-latency 1.0]
+
+Бот целиком (bot.build_app) на локальном Bot API (fake_api.py), каждый прогон — в отдельном процессе:
+  off — TAP_DEBOUNCE=0, USER_RATE=0 (как было), on — настройки по умолчанию.
+--users пользователей открывают «Гайды» и жмут гайд --taps раз подряд с паузой --gap (пока грузится PDF),
+потом так же «Назад»; один пользователь шлёт --flood нажатий без пауз. Отчёт: вызовы API по методам,
+отсечённые апдейты; проверка (assert): каждое нажатие получило answer(). Отдельно — память и цена проверки на миллионе разных пользователей (LRU).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace as NS
+
+import _fakes  # noqa: F401  (sys.path + BOT_TOKEN)
+from fake_api import FakeBotAPI  # noqa: E402
+
+NAV = ("nav:mentorship", "nav:consultation", "nav:guides", "nav:contact", "nav:reviews", "nav:support")
+WATCHED = ("answerCallbackQuery", "getChatMember", "sendDocument", "editMessageText", "editMessageCaption",
+           "sendMessage")
+
+
+async def child(args) -> dict:
+    api = FakeBotAPI(os.environ["BOT_TOKEN"], latency=args.latency,
+                     method_latency={"sendDocument": args.upload_latency})
+    await api.start()
+    tmp = tempfile.mkdtemp()
+    os.environ.update(BOT_API_URL=api.url, BOT_MODE="polling", PORT="0", STATE_BACKEND="memory",
+                      OUTBOUND_RATE="1000", OUTBOUND_CHAT_RATE="1000",
+                      MEDIA_CACHE_FILE=os.path.join(tmp, "media_cache.json"),
+                      EVENTS_FILE=os.path.join(tmp, "events.csv"))
+    if args.mode == "off":
+        os.environ.update(TAP_DEBOUNCE="0", USER_RATE="0")
+    import bot
+
+    done = set()
+
+    class Probe(bot.CountingApplication):
+        async def process_update(self, update):
+            try:
+                await super().process_update(update)
+            finally:
+                done.add(update.update_id)
+
+    bot.CountingApplication = Probe
+    app = bot.build_app()
+    await app.initialize()
+    await bot.post_init(app)
+    await app.updater.start_polling(poll_interval=0.0, timeout=1)
+    await app.start()
+
+    async def wait(ids, timeout=120.0):
+        deadline = time.perf_counter() + timeout
+        while not all(i in done for i in ids) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+
+    users = [100 + i for i in range(args.users)]
+    flooder = 99
+    await wait([api.command(u, "/start") for u in users + [flooder]])
+    await wait([api.callback(u, "nav:guides") for u in users])
+    before = dict(api.calls)
+
+    async def tapper(u):
+        ids = []
+        for data in ("guide:path_to_self", "nav:menu"):
+            for _ in range(args.taps):
+                ids.append(api.callback(u, data))
+                await asyncio.sleep(args.gap)
+            await wait(ids)
+        return ids
+
+    async def flood():
+        ids = [api.callback(flooder, NAV[i % len(NAV)]) for i in range(args.flood)]
+        await wait(ids)
+        return ids
+
+    started = time.perf_counter()
+    ids = sum(await asyncio.gather(flood(), *(tapper(u) for u in users)), [])
+    elapsed = time.perf_counter() - started
+
+    await app.updater.stop()
+    await app.stop()
+    await bot.post_shutdown(app)
+    await app.shutdown()
+    await api.stop()
+    calls = {m: api.calls[m] - before.get(m, 0) for m in api.calls}
+    return {"mode": args.mode, "updates": len(ids), "elapsed": elapsed, "calls": calls,
+            "total": sum(calls.values()) - calls.get("getUpdates", 0), "guard": bot.GUARD.stats()}
+
+
+def run_child(args, mode: str) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--mode", mode, "--users", str(args.users),
+           "--taps", str(args.taps), "--gap", str(args.gap), "--flood", str(args.flood),
+           "--latency", str(args.latency), "--upload-latency", str(args.upload_latency)]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+async def lru_memory(n: int, max_users: int):
+    from guard import UpdateGuard
+    from telegram.ext import ApplicationHandlerStop
+
+    guard = UpdateGuard(max_users=max_users)
+    message = NS(message_id=1)
+
+    async def answer(*a, **kw):
+        return True
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    for uid in range(n):
+        q = NS(data="nav:menu", message=message, inline_message_id=None, answer=answer)
+        try:
+            await guard.check(NS(callback_query=q, message=None, effective_user=NS(id=uid)), None)
+        except ApplicationHandlerStop:
+            pass
+    per_check = (time.perf_counter() - started) / n
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(guard), peak, per_check
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--taps", type=int, default=3, help="нажатий одной кнопки подряд")
+    ap.add_argument("--gap", type=float, default=0.12, help="пауза между ними, с")
+    ap.add_argument("--flood", type=int, default=300, help="нажатий флудера без пауз")
+    ap.add_argument("--latency", type=float, default=0.02)
+    ap.add_argument("--upload-latency", type=float, default=1.0, help="задержка sendDocument, с")
+    ap.add_argument("--lru-users", type=int, default=1_000_000)
+    ap.add_argument("--mode", choices=("off", "on"), default="on", help=argparse.SUPPRESS)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        import logging
+        logging.disable(logging.WARNING)
+        print(json.dumps(asyncio.run(child(args))))
+        return
+
+    print(f"{args.users} users x {args.taps} taps per button ({args.gap * 1000:.0f}ms apart), "
+          f"flooder {args.flood} taps, sendDocument {args.upload_latency:.1f}s")
+    for mode in ("off", "on"):
+        r = run_child(args, mode)
+        calls = " ".join(f"{m} {r['calls'].get(m, 0)}" for m in WATCHED)
+        print(f"  guard {mode:>3}: {r['updates']} updates → {r['total']:5} API calls | {calls}")
+        if mode == "on":
+            g = r["guard"]
+            print(f"             passed {g['passed']}, debounced {g['debounced']}, throttled {g['throttled']}")
+            assert r["calls"].get("answerCallbackQuery", 0) >= r["updates"], "a tap left without answer()"
+    kept, peak, per_check = asyncio.run(lru_memory(args.lru_users, 50_000))
+    print(f"  LRU: {args.lru_users} distinct users → {kept} kept, peak {peak / 1e6:.1f} MB, "
+          f"{per_check * 1e6:.1f}µs per check")
+
+
+if __name__ == "__main__":
+    main()
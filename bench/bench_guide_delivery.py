@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Выдача гайда при одновременных нажатиях (delivery.py): сколько раз уходит PDF.
+
+    python bench/bench_guide_delivery.py [--taps 20] [--users 200] [--upload-latency 0.3]
+
+bot.handle_guide вызывается напрямую, в обход очереди пользователя (update_processor.py), —
+--taps одновременных нажатий «гайд» одного пользователя, пока sendDocument «грузится».
+Сценарии: без claim (проверка «уже получил» → загрузка → отметка, как было) и с claim/commit;
+первая загрузка падает (rollback, отметки нет, повторное нажатие выдаёт гайд);
+--users пользователей по --taps нажатий сразу. Проверки (assert): ровно одна загрузка на пользователя.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import _fakes  # noqa: F401  (sys.path + BOT_TOKEN)
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("STATE_BACKEND", "memory")
+os.environ.setdefault("MEDIA_CACHE_FILE", os.path.join(_tmp, "media_cache.json"))
+os.environ.setdefault("EVENTS_FILE", os.path.join(_tmp, "events.csv"))
+os.environ.setdefault("ANSWERS_DB", os.path.join(_tmp, "answers.db"))
+from telegram.error import NetworkError  # noqa: E402
+
+import bot  # noqa: E402
+from delivery import DONE, DeliveryClaims  # noqa: E402
+
+GUIDE = "guide:path_to_self"
+
+
+class Unclaimed(DeliveryClaims):
+    """Как было: «уже получил?» → загрузка → отметка, без слота на время загрузки."""
+
+    def claim(self, uid):
+        return DONE if uid in self.done else None
+
+    def _resolve(self, uid, delivered):
+        pass
+
+
+class UploadBot(_fakes.FakeBot):
+    def __init__(self, upload_latency: float, fail: int = 0):
+        super().__init__()
+        self.upload_latency = upload_latency
+        self.fail = fail     # столько первых загрузок упадут
+        self.uploads = {}    # chat_id → число sendDocument
+
+    async def send_document(self, chat_id, document=None, **kw):
+        await asyncio.sleep(self.upload_latency)
+        if self.fail:
+            self.fail -= 1
+            raise NetworkError("upload failed")
+        self.uploads[chat_id] = self.uploads.get(chat_id, 0) + 1
+        return await super().send_document(chat_id, document, **kw)
+
+
+def reset(claims_cls=DeliveryClaims) -> DeliveryClaims:
+    bot.USER_GUIDE_RECEIVED.clear()
+    bot.GUIDE_DELIVERY = claims_cls(bot.USER_GUIDE_RECEIVED)
+    return bot.GUIDE_DELIVERY
+
+
+async def tap_all(fb, users, taps):
+    ctx = _fakes.context(fb)
+    msgs = {u: _fakes.FakeMessage(fb, u) for u in users}
+    results = await asyncio.gather(*(bot.handle_guide(_fakes.callback_update(fb, u, GUIDE, msgs[u]), ctx)
+                                     for u in users for _ in range(taps)), return_exceptions=True)
+    return [r for r in results if isinstance(r, Exception)]
+
+
+async def main(args):
+    uid = 1
+    bot.GUIDES.refresh(force=True)  # в боте — в post_init
+    print(f"{args.taps} simultaneous taps, sendDocument {args.upload_latency * 1000:.0f}ms")
+
+    for label, cls in (("no claim", Unclaimed), ("claim", DeliveryClaims)):
+        claims = reset(cls)
+        fb = UploadBot(args.upload_latency)
+        t = time.perf_counter()
+        await tap_all(fb, [uid], args.taps)
+        elapsed = time.perf_counter() - t
+        print(f"  {label:>8}: {fb.uploads.get(uid, 0):3} uploads in {elapsed * 1000:5.0f}ms | {claims.stats()}")
+    assert fb.uploads == {uid: 1}, fb.uploads
+    assert uid in bot.USER_GUIDE_RECEIVED
+
+    claims = reset()
+    fb = UploadBot(args.upload_latency, fail=1)
+    errors = await tap_all(fb, [uid], args.taps)
+    assert len(errors) == 1 and not fb.uploads and uid not in bot.USER_GUIDE_RECEIVED, (errors, fb.uploads)
+    await tap_all(fb, [uid], args.taps)
+    assert fb.uploads == {uid: 1} and uid in bot.USER_GUIDE_RECEIVED, fb.uploads
+    print(f"  upload fails: rollback, {len(errors)} error, retry → {fb.uploads[uid]} upload | {claims.stats()}")
+
+    claims = reset()
+    fb = UploadBot(args.upload_latency)
+    users = [1000 + i for i in range(args.users)]
+    t = time.perf_counter()
+    await tap_all(fb, users, args.taps)
+    elapsed = time.perf_counter() - t
+    assert sorted(fb.uploads) == users and set(fb.uploads.values()) == {1}, fb.uploads
+    print(f"  {args.users} users x {args.taps} taps: {sum(fb.uploads.values())} uploads in {elapsed * 1000:.0f}ms "
+          f"| {claims.stats()}")
+    print("one upload per user: ok")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--taps", type=int, default=20)
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--upload-latency", type=float, default=0.3)
+    asyncio.run(main(ap.parse_args()))
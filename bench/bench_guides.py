@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Меню гайдов (guides.py): glob по папке + сборка клавиатуры на каждое открытие vs индекс в памяти.
+
+    python bench/bench_guides.py [--guides 4] [--other-files 60] [--opens 20000]
+
+Временная папка — как папка бота: --guides файлов guide_*.pdf по ~300 КБ и --other-files прочих
+(код, state.db, events-*.csv). Замеры: открытие меню (время и системные вызовы scandir/stat на открытие),
+фоновая проверка без изменений, пересканирование после нового файла. Проверки (assert): новый гайд
+виден после одной проверки, заменённый на месте файл получает новый sha256, удалённый пропадает.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import _fakes  # noqa: F401  (sys.path)
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # noqa: E402
+
+from guides import GuideCatalog  # noqa: E402
+
+BACK = [InlineKeyboardButton("⬅️ Назад", callback_data="nav:menu")]
+
+
+def legacy_menu(folder: Path) -> InlineKeyboardMarkup:
+    """Как было в handlers._guides_menu: обход папки и новая клавиатура на каждое открытие."""
+    rows = [[InlineKeyboardButton(p.stem.replace("_", " "), callback_data=f"guide::{p.name}")]
+            for p in sorted(folder.glob("*.pdf"))]
+    return InlineKeyboardMarkup(rows + [BACK])
+
+
+def guides_kb(guides) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton(g.title, callback_data=g.callback_data)] for g in guides] +
+                                [BACK])
+
+
+class Syscalls:
+    """Считает os.scandir/os.stat, пока активен."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        self._scandir, self._stat = os.scandir, os.stat
+
+        def scandir(*a, **kw):
+            self.count += 1
+            return self._scandir(*a, **kw)
+
+        def stat(*a, **kw):
+            self.count += 1
+            return self._stat(*a, **kw)
+
+        os.scandir, os.stat = scandir, stat
+        return self
+
+    def __exit__(self, *exc):
+        os.scandir, os.stat = self._scandir, self._stat
+
+
+def write_guide(folder: str, key: str, kb: int = 300):
+    with open(os.path.join(folder, f"guide_{key}.pdf"), "wb") as f:
+        f.write(b"%PDF-1.4\n" + os.urandom(kb * 1024))
+
+
+def per_open(fn, n: int):
+    with Syscalls() as calls:
+        t = time.perf_counter()
+        for _ in range(n):
+            fn()
+        elapsed = time.perf_counter() - t
+    return elapsed / n, calls.count / n
+
+
+def main(args):
+    folder = tempfile.mkdtemp()
+    for i in range(args.guides):
+        write_guide(folder, f"topic_{i}")
+    for i in range(args.other_files):
+        open(os.path.join(folder, f"events-2025-08-{i:02d}.csv"), "w").close()
+
+    catalog = GuideCatalog(folder, titles={"topic_0": "Первый гайд"}, check_interval=0)
+    assert not catalog.current.guides and catalog.scans == 0  # при создании (импорт bot.py) — ни одного stat
+    t = time.perf_counter()
+    assert catalog.refresh(force=True)  # в боте — GUIDES.start() в post_init, в потоке
+    print(f"{args.guides} guides + {args.other_files} other files; first scan (with sha256) "
+          f"{(time.perf_counter() - t) * 1000:.1f}ms")
+
+    legacy, legacy_calls = per_open(lambda: legacy_menu(Path(folder)), args.opens)
+    indexed, indexed_calls = per_open(lambda: catalog.current.keyboard(guides_kb), args.opens)
+    print(f"  menu open, glob + rebuild:  {legacy * 1e6:8.1f}µs, {legacy_calls:4.1f} scandir/stat")
+    print(f"  menu open, index:           {indexed * 1e6:8.1f}µs, {indexed_calls:4.1f} scandir/stat")
+    assert indexed_calls == 0
+
+    idle, idle_calls = per_open(lambda: catalog.refresh(force=True), 1000)
+    print(f"  watcher tick, no changes:   {idle * 1e6:8.1f}µs, {idle_calls:4.1f} scandir/stat")
+
+    write_guide(folder, "new_one")
+    t = time.perf_counter()
+    assert catalog.refresh(force=True)
+    print(f"  rescan after new file:      {(time.perf_counter() - t) * 1000:8.2f}ms (only the new file hashed)")
+    assert catalog.current.get("new_one") is not None
+    assert catalog.current.guides[0].title == "Первый гайд"
+    menu = catalog.current.keyboard(guides_kb)
+    assert any(b.callback_data == "guide:new_one" for row in menu.inline_keyboard for b in row)
+
+    before = catalog.current.get("topic_1").sha256
+    time.sleep(0.01)  # другой mtime_ns и на грубых ФС
+    write_guide(folder, "topic_1")
+    assert catalog.refresh(force=True) and catalog.current.get("topic_1").sha256 != before
+
+    os.remove(os.path.join(folder, "guide_new_one.pdf"))
+    assert catalog.refresh(force=True) and catalog.current.get("new_one") is None
+    print(f"  add / replace / remove picked up: ok ({catalog.stats()['reloads']} reloads, "
+          f"{catalog.stats()['scans']} scans)")
+    shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--guides", type=int, default=4)
+    ap.add_argument("--other-files", type=int, default=60)
+    ap.add_argument("--opens", type=int, default=20_000)
+    main(ap.parse_args())
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Планировщик исходящих запросов (outbound.py): сколько ждёт живое нажатие, пока идёт рассылка.
+
+    python bench/bench_outbound.py [--bulk 1500] [--taps 60] [--rate 300]
+
+Фейковый Bot API отвечает за latency секунд. В очередь сразу ставится рассылка на --bulk чатов,
+параллельно приходят нажатия (20/с, каждое — в свой чат). Сравниваются:
+  fifo  — одна очередь на всех (как без приоритетов),
+  lanes — interactive/bulk с резервом токенов для нажатий.
+Плюс проверка склейки правок одного сообщения и повтора после 429.
+"""
+
+import argparse
+import asyncio
+import time
+
+import _fakes  # noqa: F401  (sys.path)
+
+from outbound import BULK, INTERACTIVE, OutboundScheduler  # noqa: E402
+
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+def fake_call(latency, calls):
+    async def call():
+        calls.append(time.monotonic())
+        await asyncio.sleep(latency)
+        return 200, b'{"ok":true,"result":true}'
+    return call
+
+
+async def scenario(lanes: bool, bulk: int, taps: int, rate: float, latency: float):
+    sched = OutboundScheduler(rate=rate, bulk_reserve=5 if lanes else 0)
+    calls = []
+    bulk_tasks = [asyncio.create_task(sched.submit("sendMessage", 10_000 + i, fake_call(latency, calls),
+                                                   lane=BULK))
+                  for i in range(bulk)]
+    await asyncio.sleep(0.05)  # рассылка уже стоит в очереди
+    waits = []
+
+    async def tap(i):
+        t0 = time.perf_counter()
+        await sched.submit("editMessageText", i + 1, fake_call(latency, calls),
+                           lane=INTERACTIVE if lanes else BULK)
+        waits.append(time.perf_counter() - t0 - latency)
+
+    tap_tasks = []
+    for i in range(taps):
+        tap_tasks.append(asyncio.create_task(tap(i)))
+        await asyncio.sleep(0.05)
+    await asyncio.gather(*tap_tasks)
+    await asyncio.gather(*bulk_tasks)
+    await sched.stop()
+    return waits, sched.stats()
+
+
+async def coalesce_check(latency: float):
+    sched = OutboundScheduler(rate=1000)
+    calls = []
+    # все 10 правок встают в очередь раньше, чем воркер успевает их забрать → уходит одна, последняя
+    await asyncio.gather(*(sched.submit("editMessageText", 1, fake_call(latency, calls),
+                                        key=("editMessageText", 1, 42, None)) for _ in range(10)))
+    await sched.stop()
+    return len(calls), sched.coalesced
+
+
+async def retry_check():
+    sched = OutboundScheduler(rate=1000)
+    answers = [(429, b'{"ok":false,"parameters":{"retry_after":0.2}}'), (200, b'{"ok":true}')]
+
+    async def call():
+        return answers.pop(0)
+    t0 = time.perf_counter()
+    result = await sched.submit("sendMessage", 1, call)
+    await sched.stop()
+    return result[0], time.perf_counter() - t0, sched.throttled
+
+
+async def main(args):
+    for name, lanes in (("fifo", False), ("lanes", True)):
+        waits, st = await scenario(lanes, args.bulk, args.taps, args.rate, args.latency)
+        print(f"{name:>5}: tap wait p50 {_pct(waits, .5) * 1000:7.1f}ms  p99 {_pct(waits, .99) * 1000:7.1f}ms  "
+              f"max {max(waits) * 1000:7.1f}ms | bulk wait avg {st['bulk']['wait_avg']:.2f}s "
+              f"max {st['bulk']['wait_max']:.2f}s")
+    sent, coalesced = await coalesce_check(args.latency)
+    print(f"coalesce: 10 edits of one message → {sent} API calls ({coalesced} coalesced)")
+    code, took, throttled = await retry_check()
+    print(f"429 retry: final status {code} after {took:.2f}s ({throttled} throttled)")
+    assert sent == 1 and code == 200
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bulk", type=int, default=1500)
+    ap.add_argument("--taps", type=int, default=60)
+    ap.add_argument("--rate", type=float, default=300.0, help="общий лимит, запросов/с (30 в проде)")
+    ap.add_argument("--latency", type=float, default=0.05)
+    asyncio.run(main(ap.parse_args()))
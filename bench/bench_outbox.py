@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Заявки админу (outbox.py): ответ пользователю сразу vs после send_message админу; доставка при сбоях.
+
+    python bench/bench_outbox.py [--apps 200] [--latency 0.2] [--fail 0.3] [--fsync]
+
+1) --apps заявок одновременно. Как было: await send_message(ADMIN_ID) → «Принял», ошибка глотается
+   (с вероятностью --fail заявка пропадает). Теперь: put() в outbox.jsonl → «Принял». Замер — время до «Принял».
+2) Тот же поток при «Telegram штормит»: --fail сбоев и иногда 429 (RetryAfter). Проверка (assert): каждая
+   заявка дошла ровно один раз; сколько сообщений админу (дайджесты) и сколько повторов понадобилось.
+3) «Падение» процесса с недоставленными заявками: новый Outbox на том же файле досылает всё, файл сжимается.
+4) Заявка длиннее 4096 символов (и вперемешку с короткими, при сбоях): уходит частями, каждая в лимите,
+   склейка частей = исходный текст, ничего не обрезано; ack — после последней части.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import re
+import tempfile
+import time
+
+import _fakes  # noqa: F401  (sys.path)
+from telegram.error import NetworkError, RetryAfter  # noqa: E402
+
+from outbox import MESSAGE_LIMIT, Outbox, application_text  # noqa: E402
+
+ADMIN_ID = 1
+TOKEN = re.compile(r"app-\d+")
+
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+class FlakyAdmin:
+    """send_message админу: задержка, сбои с вероятностью fail, каждый 10-й сбой — 429."""
+
+    def __init__(self, latency: float, fail: float, seed: int = 3):
+        self.latency = latency
+        self.fail = fail
+        self.rnd = random.Random(seed)
+        self.sent = []
+        self.errors = 0
+
+    async def send(self, chat_id, text):
+        await asyncio.sleep(self.latency)
+        if self.rnd.random() < self.fail:
+            self.errors += 1
+            if self.errors % 10 == 0:
+                raise RetryAfter(0.2)
+            raise NetworkError("Bad Gateway")
+        self.sent.append(text)
+
+
+def app_text(i: int) -> str:
+    return application_text("Наставничество", 10_000 + i, f"user{i}", f"app-{i}: хочу разобраться с прокрастинацией")
+
+
+async def legacy(args) -> dict:
+    admin = FlakyAdmin(args.latency, args.fail)
+    acks = []
+
+    async def catch(i):
+        t = time.perf_counter()
+        try:
+            await admin.send(ADMIN_ID, app_text(i))
+        except Exception:
+            pass
+        acks.append(time.perf_counter() - t)  # «Принял»
+
+    await asyncio.gather(*(catch(i) for i in range(args.apps)))
+    return {"acks": acks, "delivered": len(admin.sent)}
+
+
+async def with_outbox(args, path: str) -> dict:
+    admin = FlakyAdmin(args.latency, args.fail)
+    box = Outbox(path, fsync=args.fsync, base_backoff=0.05, max_backoff=1.0, batch_window=0.05)
+    await box.start(admin.send)
+    acks = []
+
+    async def catch(i):
+        t = time.perf_counter()
+        await box.put(ADMIN_ID, app_text(i))
+        acks.append(time.perf_counter() - t)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(catch(i) for i in range(args.apps)))
+    while box.backlog and time.perf_counter() - started < 120:
+        await asyncio.sleep(0.01)
+    drained = time.perf_counter() - started
+    await box.stop()
+    tokens = [tok for text in admin.sent for tok in TOKEN.findall(text)]
+    assert sorted(tokens) == sorted(f"app-{i}" for i in range(args.apps)), "lost or duplicated applications"
+    return {"acks": acks, "delivered": len(set(tokens)), "drained": drained, "stats": box.stats()}
+
+
+async def crash_replay(args, path: str) -> dict:
+    down = Outbox(path, batch_window=0)
+
+    async def unreachable(chat_id, text):
+        raise NetworkError("down")
+
+    await down.start(unreachable)
+    for i in range(args.apps):
+        await down.put(ADMIN_ID, app_text(i))
+    down._task.cancel()  # «kill -9»: без stop(), ничего не доставлено
+
+    admin = FlakyAdmin(0.0, 0.0)
+    t = time.perf_counter()
+    box = Outbox(path, batch_window=0, compact_after=1)
+    replayed = box.replayed
+    await box.start(admin.send)
+    while box.backlog:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - t
+    await box.stop()
+    with open(path, encoding="utf-8") as f:
+        left = sum(1 for _ in f)
+    assert replayed == args.apps and len({tok for text in admin.sent for tok in TOKEN.findall(text)}) == args.apps
+    assert Outbox(path).replayed == 0
+    return {"replayed": replayed, "elapsed": elapsed, "messages": len(admin.sent), "file_lines": left}
+
+
+async def long_application(args, path: str) -> dict:
+    admin = FlakyAdmin(0.0, args.fail, seed=5)
+    box = Outbox(path, base_backoff=0.01, max_backoff=0.05, batch_window=0.05)
+    await box.start(admin.send)
+    body = " ".join(f"long-{i:05d}" for i in range(1500)) + "\n" + "x" * 5000 + " END"
+    long_text = app_text(0) + "\n" + body
+    for i in range(1, 4):
+        await box.put(ADMIN_ID, app_text(i))
+    await box.put(ADMIN_ID, long_text)
+    started = time.perf_counter()
+    while box.backlog and time.perf_counter() - started < 60:
+        await asyncio.sleep(0.01)
+    await box.stop()
+    assert all(len(text) <= MESSAGE_LIMIT for text in admin.sent), max(map(len, admin.sent))
+    parts = [text.split("\n", 1)[1] for text in admin.sent if text.startswith("(")]
+    assert "".join(parts) == long_text, "long application truncated or parts resent"
+    short = [tok for text in admin.sent if not text.startswith("(") for tok in TOKEN.findall(text)]
+    assert sorted(short) == ["app-1", "app-2", "app-3"], short
+    return {"length": len(long_text), "parts": len(parts), "messages": len(admin.sent), "stats": box.stats()}
+
+
+async def main(args):
+    tmp = tempfile.mkdtemp()
+    print(f"{args.apps} applications at once, admin send {args.latency * 1000:.0f}ms, "
+          f"failure rate {args.fail:.0%}, fsync {'on' if args.fsync else 'off'}")
+    old = await legacy(args)
+    print(f"  before: reply p50 {_pct(old['acks'], .5) * 1000:7.1f}ms p99 {_pct(old['acks'], .99) * 1000:7.1f}ms"
+          f" | delivered {old['delivered']}/{args.apps} (failures swallowed)")
+    new = await with_outbox(args, os.path.join(tmp, "outbox.jsonl"))
+    s = new["stats"]
+    print(f"  outbox: reply p50 {_pct(new['acks'], .5) * 1000:7.1f}ms p99 {_pct(new['acks'], .99) * 1000:7.1f}ms"
+          f" | delivered {new['delivered']}/{args.apps} in {new['drained']:.1f}s: {s['messages']} messages "
+          f"({s['digests']} digests), {s['failures']} failed attempts, {s['writes']} disk writes")
+    r = await crash_replay(args, os.path.join(tmp, "crash.jsonl"))
+    print(f"  crash with {r['replayed']} undelivered → replayed and sent in {r['elapsed'] * 1000:.0f}ms "
+          f"({r['messages']} messages), file compacted to {r['file_lines']} lines")
+    lg = await long_application(args, os.path.join(tmp, "long.jsonl"))
+    print(f"  {lg['length']}-char application → {lg['parts']} parts (≤{MESSAGE_LIMIT}), {lg['messages']} messages, "
+          f"{lg['stats']['failures']} failed attempts, nothing truncated")
+    print("every application delivered exactly once: ok")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--apps", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.2, help="задержка send_message админу, с")
+    ap.add_argument("--fail", type=float, default=0.3, help="доля неудачных отправок")
+    ap.add_argument("--fsync", action="store_true")
+    logging.disable(logging.WARNING)  # сбои доставки здесь нарочные
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+/stats из дневных сводок (rollups.py) vs подсчёт по сырым строкам журнала.
+
+    python bench/bench_rollups.py [--days 90] [--users 20000] [--rows 500000]
+
+Синтетический журнал: --rows событий за --days дней (словарь events.csv, сессии start → экраны → гайд).
+Замеры: первый проход (дочитать весь журнал), /stats за 7/30 дней и за всё время на тёплых сводках,
+дочитка 1000 новых строк, рестарт (снимок с диска). Проверка: каждая сводка совпадает
+с полным перебором сырых строк — события, уникальные пользователи, воронка, удержание D1/D7/D30.
+"""
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import _fakes  # noqa: F401  (sys.path)
+from eventlog import EventLog, parse_row  # noqa: E402
+from rollups import FUNNEL, RETENTION_DAYS, Rollups, funnel_step  # noqa: E402
+
+VIEWS = ("mentoring_view", "consultation_view", "guides_view", "insight_view", "contact_view",
+         "donate_view", "reviews_view")
+GUIDES = ("Путь к себе", "Знаю, но не делаю", "Принятие себя", "Заткнуть мозг")
+
+
+def generate(events_log: EventLog, days: int, users: int, rows: int, end: date):
+    rnd = random.Random(7)
+    first = {uid: rnd.randrange(days) for uid in range(1, users + 1)}
+    per_day = {}
+    written = 0
+    while written < rows:
+        uid = rnd.randrange(1, users + 1)
+        day = min(days - 1, first[uid] + int(rnd.expovariate(0.15)))
+        session = ["start"] if day == first[uid] or rnd.random() < 0.3 else []
+        session += rnd.sample(VIEWS, rnd.randrange(1, 4))
+        if "guides_view" in session and rnd.random() < 0.4:
+            session.append("guide_download")
+        ts = datetime.combine(end - timedelta(days=days - 1 - day), datetime.min.time()) + timedelta(
+            seconds=rnd.randrange(86000))
+        for i, event in enumerate(session):
+            details = rnd.choice(GUIDES) if event == "guide_download" else ""
+            per_day.setdefault(ts.date(), []).append(((ts + timedelta(seconds=i)).isoformat(), uid, event, details))
+        written += len(session)
+    for day in sorted(per_day):
+        events_log.append_rows(sorted(per_day[day]), day)
+    return written
+
+
+def brute_force(events_log: EventLog, start, end) -> dict:
+    """То же, что Rollups.query, но перебором всех строк всех файлов."""
+    counts, users, active, first_seen, active_days = {}, {}, set(), {}, {}
+    for name in events_log.files():
+        with open(os.path.join(events_log.dir, name), encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                parsed = parse_row(row)
+                if parsed is None:
+                    continue
+                ts, uid, event, _ = parsed
+                day = date.fromisoformat(ts[:10])
+                first_seen[uid] = min(first_seen.get(uid, day), day)
+                active_days.setdefault(uid, set()).add(day)
+                if (start and day < start) or (end and day > end):
+                    continue
+                counts[event] = counts.get(event, 0) + 1
+                users.setdefault(event, set()).add(uid)
+                active.add(uid)
+    steps = {step: set() for step in FUNNEL}
+    for event, who in users.items():
+        if funnel_step(event):
+            steps[funnel_step(event)] |= who
+    reached, funnel = steps["start"], []
+    for step in FUNNEL:
+        reached = reached & steps[step]
+        funnel.append((step, len(reached)))
+    last = max(d for ds in active_days.values() for d in ds)
+    retention = {}
+    for n in RETENTION_DAYS:
+        cohort = [u for u, d in first_seen.items()
+                  if (not start or d >= start) and (not end or d <= end) and d + timedelta(days=n) <= last]
+        retention[n] = (sum(first_seen[u] + timedelta(days=n) in active_days[u] for u in cohort), len(cohort))
+    return {"users": len(active), "events": {e: (counts[e], len(users[e])) for e in counts},
+            "funnel": funnel, "retention": retention}
+
+
+def check(got: dict, want: dict, label: str):
+    for key in ("users", "funnel", "retention"):
+        assert got[key] == want[key], f"{label}: {key} {got[key]} != {want[key]}"
+    assert dict(got["events"]) == want["events"], f"{label}: events differ"
+
+
+def main(args):
+    tmp = tempfile.mkdtemp()
+    events_log = EventLog(os.path.join(tmp, "events.csv"))
+    today = date.today()
+    rows = generate(events_log, args.days, args.users, args.rows, today)
+    size = sum(os.path.getsize(os.path.join(tmp, n)) for n in events_log.files())
+    print(f"log: {rows} rows, {len(events_log.files())} files, {size / 1e6:.1f} MB")
+
+    path = os.path.join(tmp, "events.rollups.json")
+    rollups = Rollups(events_log, path)
+    t = time.perf_counter()
+    rollups.refresh()
+    print(f"first pass (whole log):  {time.perf_counter() - t:8.3f}s")
+
+    ranges = {"7d": (today - timedelta(days=6), today), "30d": (today - timedelta(days=29), today),
+              "all": (None, None)}
+    for label, (start, end) in ranges.items():
+        t = time.perf_counter()
+        want = brute_force(events_log, start, end)
+        raw = time.perf_counter() - t
+        got = rollups.report(start, end)
+        check(got, want, label)
+        print(f"/stats {label:>3}: rollups {got['ms']:8.2f}ms | raw scan {raw * 1000:9.1f}ms  (x{raw * 1000 / got['ms']:.0f})")
+
+    now = datetime.now()
+    events_log.append_rows([(now.isoformat(), 10_000_000 + i, "start", "") for i in range(1000)], now.date())
+    t = time.perf_counter()
+    new = rollups.refresh()
+    print(f"incremental +{new} rows:   {(time.perf_counter() - t) * 1000:8.1f}ms")
+
+    # снимок не сохранён после дочитки (save_interval) — как при падении: рестарт дочитывает хвост заново
+    t = time.perf_counter()
+    restarted = Rollups(events_log, path)
+    restarted.refresh()
+    print(f"restart (snapshot load): {time.perf_counter() - t:8.3f}s, snapshot {os.path.getsize(path) / 1e6:.1f} MB")
+    check(restarted.report(None, None), brute_force(events_log, None, None), "after restart")
+    print("rollups match raw rows: ok")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, default=90)
+    ap.add_argument("--users", type=int, default=20000)
+    ap.add_argument("--rows", type=int, default=500000)
+    main(ap.parse_args())
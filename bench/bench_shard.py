@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Шардированный режим (shard.py): пропускная способность в зависимости от числа воркеров.
+
+    python bench/bench_shard.py [--workers 1,2,4] [--updates 3000] [--users 500] [--latency 0.005]
+
+Локальный Bot API (fake_api.py) в этом процессе, приёмник shard.run() — тоже, воркеры — настоящие
+процессы bot.py. В очередь getUpdates разом кладётся --updates нажатий от --users пользователей;
+замеряется время, пока все они не будут обработаны (по числу answerCallbackQuery на фейковом API).
+Задержка API маленькая, лимиты исходящих сняты — упираемся в CPU воркеров, поэтому рост виден
+только при числе ядер не меньше числа воркеров (сколько ядер — печатается).
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import time
+
+import _fakes  # noqa: F401  (sys.path + BOT_TOKEN)
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # до импорта shard: basicConfig читает его при импорте
+from fake_api import FakeBotAPI  # noqa: E402
+
+import httpx  # noqa: E402
+
+import shard  # noqa: E402
+
+NAV = ("nav:mentorship", "nav:consultation", "nav:guides", "nav:contact", "nav:reviews", "nav:support")
+
+
+def free_ports(count: int) -> int:
+    """Первый из count подряд идущих свободных портов."""
+    for _ in range(50):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            base = s.getsockname()[1]
+        if base + count > 65535:
+            continue
+        socks = []
+        try:
+            for port in range(base, base + count):
+                sock = socket.socket()
+                socks.append(sock)
+                sock.bind(("127.0.0.1", port))
+            return base
+        except OSError:
+            continue
+        finally:
+            for sock in socks:
+                sock.close()
+    raise RuntimeError("no free port range")
+
+
+async def scenario(workers: int, args) -> dict:
+    api = FakeBotAPI(os.environ["BOT_TOKEN"], latency=args.latency)
+    await api.start()
+    base = free_ports(workers + 1)
+    tmp = tempfile.mkdtemp()
+    os.environ.update(BOT_API_URL=api.url, BOT_MODE="polling", PORT=str(base), SHARD_BASE_PORT=str(base + 1),
+                      STATE_BACKEND="memory", STATE_DB=os.path.join(tmp, "state.db"),
+                      MEDIA_CACHE_FILE=os.path.join(tmp, "media_cache.json"), EVENTS_FILE=os.path.join(tmp, "events.csv"),
+                      OUTBOUND_RATE="1000000", OUTBOUND_CHAT_RATE="1000000", USER_RATE="0", TAP_DEBOUNCE="0")
+    stop = asyncio.Event()
+    front = asyncio.create_task(shard.run(workers, stop))
+
+    # ждём, пока все воркеры поднимут HTTP
+    async with httpx.AsyncClient(timeout=1) as client:
+        for i in range(workers):
+            while True:
+                try:
+                    if (await client.get(f"http://127.0.0.1:{base + 1 + i}/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+
+    before = api.calls["answerCallbackQuery"]
+    started = time.perf_counter()
+    for i in range(args.updates):
+        api.callback(1_000_000 + i % args.users, NAV[i % len(NAV)])
+    while api.calls["answerCallbackQuery"] - before < args.updates:
+        if time.perf_counter() - started > args.timeout:
+            break
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    handled = api.calls["answerCallbackQuery"] - before
+
+    stop.set()
+    await front
+    await api.stop()
+    return {"workers": workers, "handled": handled, "elapsed": elapsed, "rate": handled / elapsed}
+
+
+async def main(args):
+    print(f"CPU cores: {os.cpu_count()}")
+    base_rate = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        r = await scenario(workers, args)
+        base_rate = base_rate or r["rate"]
+        print(f"workers={workers}: {r['handled']}/{args.updates} updates in {r['elapsed']:.2f}s → "
+              f"{r['rate']:7.0f} updates/s  (x{r['rate'] / base_rate:.2f})")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", default="1,2,4")
+    ap.add_argument("--updates", type=int, default=3000)
+    ap.add_argument("--users", type=int, default=500)
+    ap.add_argument("--latency", type=float, default=0.005)
+    ap.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Холодный старт: от запуска процесса бота до ответа на апдейт, который его разбудил.
+
+    python bench/bench_startup.py [--runs 5] [--mode polling|webhook] [--latency 0.05] [--warm-chat]
+                                  [--importtime] [--max-ms 0]
+
+Каждый прогон — новый процесс бота на чистом диске (нет state.db, media_cache.json — как после сна
+на free-плане Render) и локальный Bot API (fake_api.py) с задержкой --latency на вызов.
+/start уже ждёт в очереди (polling) или стучится в вебхук, который «уже стоит» у Telegram.
+Замеры (медиана): первый вызов Bot API (= импорты + сборка модуля), начало приёма апдейтов,
+ответ на /start. --warm-chat — задан MEDIA_WARM_CHAT_ID (догрузка медиа на старте);
+--importtime — топ модулей по -X importtime; --max-ms — код 1, если ответ медленнее (для CI).
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import _fakes  # noqa: F401  (sys.path + BOT_TOKEN)
+from fake_api import FakeBotAPI  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SECRET = "bench-secret"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _importtime_top(stderr: str, top: int = 15) -> list:
+    """Верхние уровни -X importtime (модули, импортированные ботом напрямую) по cumulative, мкс."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if len(name) - len(name.lstrip()) <= 3:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+async def run_once(args) -> dict:
+    api = FakeBotAPI(os.environ["BOT_TOKEN"], latency=args.latency)
+    await api.start()
+    tmp = tempfile.mkdtemp()
+    port = _free_port()
+    env = dict(os.environ, BOT_API_URL=api.url, BOT_MODE=args.mode, PORT=str(port), WEBHOOK_SECRET=SECRET,
+               WEBHOOK_URL=f"http://127.0.0.1:{port}", STATE_DB=os.path.join(tmp, "state.db"), ANSWERS_DB=os.path.join(tmp, "answers.db"), OUTBOX_FILE=os.path.join(tmp, "outbox.jsonl"),
+               MEDIA_CACHE_FILE=os.path.join(tmp, "media_cache.json"), EVENTS_FILE=os.path.join(tmp, "events.csv"),
+               LOG_LEVEL="WARNING")
+    if args.warm_chat:
+        env["MEDIA_WARM_CHAT_ID"] = "-100"
+    if args.mode == "webhook":
+        await api.set_webhook(f"http://127.0.0.1:{port}/telegram", SECRET)
+
+    uid = 777
+    api.command(uid, "/start")
+    cmd = [sys.executable] + (["-X", "importtime"] if args.importtime else [])
+    cmd.append(os.path.join(ROOT, "bot.py"))  # как startCommand в render.yaml
+    started = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(*cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                                                stderr=subprocess.PIPE)
+    stderr_task = asyncio.create_task(proc.stderr.read())
+    deadline = started + args.timeout
+    while uid not in api.first_message and time.perf_counter() < deadline:
+        await asyncio.sleep(0.002)
+    proc.terminate()
+    stderr = (await stderr_task).decode("utf-8", "replace")
+    await proc.wait()
+    await api.stop()
+
+    ready_method = "getUpdates" if args.mode == "polling" else "sendPhoto"
+    first_api = min(api.first_call.values()) if api.first_call else None
+    return {"first_api": (first_api - started) if first_api else None,
+            "ready": (api.first_call[ready_method] - started) if ready_method in api.first_call else None,
+            "reply": (api.first_message[uid] - started) if uid in api.first_message else None,
+            "importtime": _importtime_top(stderr) if args.importtime else [],
+            "stderr": stderr}
+
+
+def _ms(values):
+    values = [v for v in values if v is not None]
+    return statistics.median(values) * 1000 if values else float("nan")
+
+
+async def main(args):
+    results = []
+    for _ in range(args.runs):
+        r = await run_once(args)
+        if r["reply"] is None:
+            print(r["stderr"][-2000:])
+            raise SystemExit("no reply to /start — bot failed to start")
+        results.append(r)
+    ready = "getUpdates" if args.mode == "polling" else "first send"
+    print(f"{args.mode}, API latency {args.latency * 1000:.0f}ms, warm chat {'on' if args.warm_chat else 'off'}, "
+          f"{args.runs} runs (median):")
+    print(f"  first Bot API call (imports + module) {_ms(r['first_api'] for r in results):7.0f}ms")
+    print(f"  accepting updates ({ready:>10})      {_ms(r['ready'] for r in results):7.0f}ms")
+    reply = _ms(r["reply"] for r in results)
+    print(f"  reply to waking /start               {reply:7.0f}ms")
+    if args.importtime:
+        print("  top imports (cumulative, last run):")
+        for us, name in results[-1]["importtime"]:
+            print(f"    {us / 1000:7.1f}ms  {name}")
+    if args.max_ms and reply > args.max_ms:
+        raise SystemExit(f"regression: reply {reply:.0f}ms > {args.max_ms:.0f}ms")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    ap.add_argument("--latency", type=float, default=0.05, help="задержка Bot API на вызов, с")
+    ap.add_argument("--warm-chat", action="store_true")
+    ap.add_argument("--importtime", action="store_true")
+    ap.add_argument("--max-ms", type=float, default=0.0)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Задержка хендлеров «Вопроса дня» с сохранением состояния и без.
+
+    python bench/bench_state.py [--users 2000]
+
+Гоняет сценарий qod:start → variants → pick → add_comment → текст через настоящие хендлеры bot.py
+на фейковом боте, сначала с memory-бэкендом, затем с sqlite (WAL + write-behind).
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import _fakes  # noqa: F401  (выставляет sys.path и BOT_TOKEN)
+
+os.environ.setdefault("STATE_BACKEND", "memory")
+import bot  # noqa: E402
+from state_store import StateStore, make_backend  # noqa: E402
+
+FLOW = ["qod:start", "qod:variants", "qod:pick:Сон", "qod:add_comment"]
+
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+async def run(kind: str, users: int, path: str):
+    store = StateStore(make_backend(kind, path))
+    bot.STORE, bot.USER_STATE, bot.USER_GUIDE_RECEIVED = (
+        store, store.dict("user_state"), store.set("guide_received"))
+    await store.start()
+    fb = _fakes.FakeBot()
+    ctx = _fakes.context(fb)
+    lat = []
+    t0 = time.perf_counter()
+    for uid in range(1, users + 1):
+        for data in FLOW:
+            s = time.perf_counter()
+            await bot.callbacks(_fakes.callback_update(fb, uid, data), ctx)
+            lat.append(time.perf_counter() - s)
+        s = time.perf_counter()
+        await bot.message_router(_fakes.text_update(fb, uid, "комментарий"), ctx)
+        lat.append(time.perf_counter() - s)
+        if uid % 50 == 0:
+            await asyncio.sleep(0)  # даём фоновому флашеру поработать, как в живом цикле
+    wall = time.perf_counter() - t0
+    await store.close()
+    print(f"{kind:>6}: {len(lat)} updates in {wall:.3f}s | "
+          f"mean {statistics.mean(lat) * 1e6:.1f}µs  p50 {_pct(lat, .5) * 1e6:.1f}µs  "
+          f"p99 {_pct(lat, .99) * 1e6:.1f}µs | flushes {store.flushes}, rows {store.rows_written}")
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=2000)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        await run("memory", args.users, os.path.join(tmp, "mem.db"))
+        await run("sqlite", args.users, os.path.join(tmp, "state.db"))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Пулы соединений с Bot API (transport.TunedRequest): ожидание соединения под параллельной нагрузкой.
+
+    python bench/bench_transport.py [--users 200] [--latency 0.05] [--upload-latency 0.2]
+                                    [--pools 1,8,64,256] [--photo-kb 20] [--pool-timeout 1] [--http2]
+
+Локальный Bot API (fake_api.py, в отдельном процессе) отвечает с задержкой; --users пользователей одновременно «нажимают
+кнопку»: answerCallbackQuery, getChatMember, sendPhoto с загрузкой файла, sendMessage. Всё это время
+крутится long-poll getUpdates, а апдейты приходят раз в 50 мс. Сценарии:
+  send=N      — свой пул исходящих на N соединений (1 — как у голого HTTPXRequest, 64 — API_POOL_SIZE
+                в боте), getUpdates отдельно;
+  shared=N    — getUpdates и исходящие в одном пуле на N соединений.
+Отчёт: задержка вызова (p50/p99), среднее ожидание соединения (очередь TunedRequest + пул) — главный
+признак конкуренции за пул,
+запросы, упёршиеся в --pool-timeout (предел ожидания, TunedRequest; не отправлены), новые TCP-соединения,
+задержка доставки апдейта.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+import _fakes  # noqa: F401  (sys.path + BOT_TOKEN)
+from fake_api import FakeBotAPI  # noqa: E402
+from telegram import Bot  # noqa: E402
+from telegram.error import TimedOut  # noqa: E402
+
+from metrics import API_POOL_WAIT  # noqa: E402
+from transport import TunedRequest  # noqa: E402
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+async def press(bot: Bot, uid: int, photo: bytes, latencies: list, errors: list):
+    calls = (lambda: bot.answer_callback_query(str(uid)),
+             lambda: bot.get_chat_member(-100, uid),
+             lambda: bot.send_photo(uid, photo),
+             lambda: bot.send_message(uid, "Держи!"))
+    for call in calls:
+        t = time.perf_counter()
+        try:
+            await call()
+        except TimedOut:
+            errors.append(uid)
+            continue
+        latencies.append(time.perf_counter() - t)
+
+
+async def poll(bot: Bot, delays: list, stop: asyncio.Event):
+    offset = 0
+    while not stop.is_set():
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=1)
+        except TimedOut:
+            continue
+        now = time.time()
+        for u in updates:
+            delays.append(now - float(u.message.text.split()[1]))
+            offset = u.update_id + 1
+
+
+def serve_api(latency: float, upload_latency: float, conn):
+    """Bot API в своём процессе: иначе разбор загрузок сервером делит цикл событий с клиентом
+    и меряется он, а не пул. Апдейт /start <время постановки> — раз в 50 мс."""
+    async def run():
+        api = FakeBotAPI(os.environ["BOT_TOKEN"], latency=latency, upload_latency=upload_latency)
+        await api.start()
+        conn.send(api.url)
+        while not conn.poll():
+            api.command(1, f"/start {time.time()}")
+            await asyncio.sleep(0.05)
+        await api.stop()
+    asyncio.run(run())
+
+
+async def scenario(label: str, shared: bool, size: int, args) -> dict:
+    conn, child = multiprocessing.Pipe()
+    server = multiprocessing.get_context("spawn").Process(
+        target=serve_api, args=(args.latency, args.upload_latency, child), daemon=True)
+    server.start()
+    url = await asyncio.to_thread(conn.recv)
+    timeouts = {"pool": args.pool_timeout}
+    send = TunedRequest(pool=label, pool_size=size, http2=args.http2, timeouts=timeouts)
+    polling = send if shared else TunedRequest(pool=label + "/poll", pool_size=1, http2=args.http2,
+                                               timeouts=timeouts)
+    bot = Bot(os.environ["BOT_TOKEN"], base_url=f"{url}/bot", request=send, get_updates_request=polling)
+    await bot.initialize()
+
+    stop = asyncio.Event()
+    delays, latencies, errors = [], [], []
+    poller = asyncio.create_task(poll(bot, delays, stop))
+    await asyncio.sleep(0.2)  # long poll уже висит
+    waits_before = API_POOL_WAIT.count(label)
+    started = time.perf_counter()
+    photo = os.urandom(args.photo_kb * 1024)
+    await asyncio.gather(*(press(bot, 10_000 + i, photo, latencies, errors) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await poller
+    stats = send.stats()
+    capped = sum(pool.stats()["pool_timeouts"] for pool in {send, polling})
+    waited = API_POOL_WAIT.count(label) - waits_before
+    wait_total = API_POOL_WAIT.sum(label)
+    await bot.shutdown()
+    conn.send("stop")
+    await asyncio.to_thread(server.join)
+    return {"label": label, "elapsed": elapsed, "calls": len(latencies), "errors": len(errors),
+            "p50": _pct(latencies, .5), "p99": _pct(latencies, .99),
+            "wait": wait_total / waited if waited else 0.0, "capped": capped,
+            "opened": stats["opened"], "peak": stats["peak"],
+            "update_p99": _pct(delays, .99), "http": stats["http"]}
+
+
+async def main(args):
+    configs = [(f"send={n}", False, n) for n in args.pools] + [(f"shared={args.pools[0]}", True, args.pools[0])]
+    print(f"{args.users} users x 4 calls, API latency {args.latency * 1000:.0f}ms "
+          f"(upload {args.upload_latency * 1000:.0f}ms), pool wait capped at {args.pool_timeout:.1f}s")
+    for label, shared, size in configs:
+        r = await scenario(label, shared, size, args)
+        print(f"  {label:>10} (HTTP/{r['http']}): {r['elapsed']:5.2f}s | call p50 {r['p50'] * 1000:6.0f}ms "
+              f"p99 {r['p99'] * 1000:6.0f}ms | pool wait avg {r['wait'] * 1000:6.1f}ms | "
+              f"not sent (wait cap) {r['capped']:4} | connections {r['opened']:3} | update p99 {r['update_p99'] * 1000:5.0f}ms")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--upload-latency", type=float, default=0.2)
+    ap.add_argument("--pools", type=lambda s: [int(x) for x in s.split(",")], default=[1, 8, 64, 256])
+    ap.add_argument("--photo-kb", type=int, default=20, help="размер загружаемого фото, КБ")
+    ap.add_argument("--pool-timeout", type=float, default=1.0, help="предел ожидания соединения, с")
+    ap.add_argument("--http2", action="store_true", help="нужен h2 (python-telegram-bot[http2])")
+    asyncio.run(main(ap.parse_args()))
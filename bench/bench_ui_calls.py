@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Сколько вызовов Bot API уходит на апдейт: учёт UI-состояния чата (bot.UI) против прежних хендлеров
+(пустое сообщение с ReplyKeyboardRemove на каждый /start и текст, правка «наугад» с повтором).
+
+    python bench/bench_ui_calls.py [--users 500]
+
+Сценарий на пользователя: /start → Гайды → Гайды ещё раз → Поддержать (QR-фото) → Назад → текст ×2.
+Фейковый бот ведёт себя как Telegram: edit_text по фото и правка без изменений → BadRequest.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+
+import _fakes  # noqa: F401  (sys.path + BOT_TOKEN)
+
+os.environ.setdefault("STATE_BACKEND", "memory")
+os.environ.setdefault("MEDIA_CACHE_FILE", os.path.join(tempfile.mkdtemp(), "media_cache.json"))
+os.environ.setdefault("EVENTS_FILE", os.path.join(tempfile.mkdtemp(), "events.csv"))
+from telegram import ReplyKeyboardRemove  # noqa: E402
+from telegram.constants import ParseMode  # noqa: E402
+
+import bot  # noqa: E402
+
+
+# ─────────── прежняя реализация, для сравнения ───────────
+async def legacy_safe_edit(q, text, reply_markup=None, parse_mode=ParseMode.HTML):
+    try:
+        msg = q.message
+        if getattr(msg, "photo", None):
+            return await msg.edit_caption(caption=text, parse_mode=parse_mode, reply_markup=reply_markup)
+        if msg.text:
+            return await msg.edit_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+        return await msg.reply_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+    except Exception:
+        return await q.message.reply_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+
+
+async def legacy_start(update, ctx):
+    chat_id = update.effective_chat.id
+    try:
+        await ctx.bot.send_message(chat_id, " ", reply_markup=ReplyKeyboardRemove())
+    except Exception:
+        pass
+    await bot.MEDIA.send(bot.WELCOME_PHOTO, "photo", lambda photo: ctx.bot.send_photo(
+        chat_id, photo=photo, caption=bot.WELCOME_TEXT, parse_mode=ParseMode.HTML))
+    await ctx.bot.send_message(chat_id, bot.MENU_TEXT, reply_markup=bot.MENU_KB)
+
+
+async def legacy_show_menu(update, ctx):
+    q = update.callback_query
+    try:
+        await q.message.edit_text(bot.MENU_TEXT, reply_markup=bot.MENU_KB)
+    except Exception:
+        await q.message.reply_text(bot.MENU_TEXT, reply_markup=bot.MENU_KB)
+
+
+async def legacy_message_router(update, ctx):
+    try:
+        await ctx.bot.send_message(update.effective_chat.id, " ", reply_markup=ReplyKeyboardRemove())
+    except Exception:
+        pass
+    await update.message.reply_text(bot.MENU_TEXT, reply_markup=bot.MENU_KB)
+
+
+def legacy_routes():
+    screens = bot.VIEW.screens
+    routes = {}
+    for key, screen in screens.items():
+        routes[key] = (lambda s: lambda u, c: legacy_safe_edit(u.callback_query, s.text, reply_markup=s.markup))(screen)
+    routes["nav:menu"] = legacy_show_menu
+    routes["nav:support"] = lambda u, c: bot.send_support(u, c, via_callback=True)
+    return routes
+
+
+# ─────────── сценарий ───────────
+async def session(fb, uid, start, tap, text):
+    ctx = _fakes.context(fb)
+    await start(_fakes.callback_update(fb, uid, "start"), ctx)
+    for data in ("nav:guides", "nav:guides", "nav:support", "nav:menu"):
+        await tap(_fakes.callback_update(fb, uid, data, message=fb.last[uid]), ctx)
+    for _ in range(2):
+        await text(_fakes.text_update(fb, uid, "Гайды"), ctx)
+    return 1 + 4 + 2
+
+
+async def run(users: int, legacy: bool):
+    fb = _fakes.FakeBot()
+    if legacy:
+        routes = legacy_routes()
+
+        async def tap(update, ctx):
+            await update.callback_query.answer()
+            await routes[update.callback_query.data](update, ctx)
+        start, text = legacy_start, legacy_message_router
+    else:
+        start, tap, text = bot.start, bot.callbacks, bot.message_router
+    updates = 0
+    for uid in range(1, users + 1):
+        updates += await session(fb, uid, start, tap, text)
+    return fb.calls, updates
+
+
+async def main(users: int):
+    base_calls, updates = await run(users, legacy=True)
+    new_calls, _ = await run(users, legacy=False)
+    print(f"{updates} updates ({users} users)")
+    print(f"  legacy:   {base_calls:>7} API calls, {base_calls / updates:.2f} per update")
+    print(f"  ui state: {new_calls:>7} API calls, {new_calls / updates:.2f} per update "
+          f"(−{100 * (1 - new_calls / base_calls):.0f}%)")
+    print(f"  {bot.UI.stats()}")
+    await long_caption()
+
+
+async def long_caption():
+    """Текст длиннее CAPTION_LIMIT по фото: новое сообщение, учтено под его id, а не как правка фото."""
+    fb = _fakes.FakeBot()
+    photo = await fb.send_photo(1, caption="qr")
+    bot.UI.remember(photo, "photo", "qr", None)
+    text = "x" * (bot.CAPTION_LIMIT + 1)
+    q = _fakes.FakeQuery(fb, 1, "nav:support", message=photo)
+    edited, sent = bot.SAFE_EDIT.value("edited"), bot.SAFE_EDIT.value("sent")
+    first = await bot.safe_edit(q, text)
+    again = await bot.safe_edit(q, text)  # повторное нажатие на фото — снова отвечает, а не «без изменений»
+    assert first is not photo and again is not first and not photo.text
+    assert bot.SAFE_EDIT.value("edited") == edited and bot.SAFE_EDIT.value("sent") == sent + 2
+    assert bot.UI.is_unchanged(first, text, None) and not bot.UI.is_unchanged(photo, text, None)
+    print("  caption over limit → new message, tracked under its own id: ok")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=500)
+    asyncio.run(main(ap.parse_args().users))
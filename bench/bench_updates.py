@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Блокировка «в голове очереди»: один пользователь качает гайд (медленный sendDocument), остальные жмут кнопки.
+
+    python bench/bench_updates.py [--workers 32] [--taps 40] [--tappers 20] [--upload-latency 2.0]
+
+Бот целиком (bot.build_app) на локальном Bot API (fake_api.py), каждый прогон — в отдельном процессе:
+  workers=1  — апдейты по одному (как было: Application по умолчанию),
+  workers=N  — PerUserUpdateProcessor: разные пользователи параллельно, один пользователь — по порядку.
+Отчёт: задержка нажатий остальных от постановки апдейта до конца обработки (p50/p99/max).
+Проверки: апдейты одного пользователя, отправленные пачкой, обработаны строго по порядку;
+одновременно обрабатывалось не больше workers апдейтов.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import _fakes  # noqa: F401  (sys.path + BOT_TOKEN)
+from fake_api import FakeBotAPI  # noqa: E402
+
+NAV = ("nav:mentorship", "nav:consultation", "nav:guides", "nav:contact", "nav:reviews", "nav:support")
+
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+async def child(args) -> dict:
+    api = FakeBotAPI(os.environ["BOT_TOKEN"], latency=args.latency,
+                     method_latency={"sendDocument": args.upload_latency})
+    await api.start()
+    tmp = tempfile.mkdtemp()
+    os.environ.update(BOT_API_URL=api.url, BOT_MODE="polling", PORT="0", STATE_BACKEND="memory",
+                      UPDATE_WORKERS=str(args.workers), OUTBOUND_RATE="1000", OUTBOUND_CHAT_RATE="1000",
+                      USER_RATE="0", TAP_DEBOUNCE="0",  # пачки нажатий здесь — нагрузка, а не флуд
+                      MEDIA_CACHE_FILE=os.path.join(tmp, "media_cache.json"),
+                      EVENTS_FILE=os.path.join(tmp, "events.csv"))
+    import bot
+
+    done = {}                 # update_id → конец обработки
+    order = {}                # user_id → update_id в порядке начала обработки
+    peak = [0, 0]             # сейчас, максимум
+
+    class Probe(bot.CountingApplication):
+        async def process_update(self, update):
+            peak[0] += 1
+            peak[1] = max(peak[1], peak[0])
+            order.setdefault(update.effective_user.id, []).append(update.update_id)
+            try:
+                await super().process_update(update)
+            finally:
+                peak[0] -= 1
+                done[update.update_id] = time.perf_counter()
+
+    bot.CountingApplication = Probe
+    app = bot.build_app()
+    await app.initialize()
+    await bot.post_init(app)
+    await app.updater.start_polling(poll_interval=0.0, timeout=1)
+    await app.start()
+
+    async def wait(ids, timeout=120.0):
+        deadline = time.perf_counter() + timeout
+        while not all(i in done for i in ids) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+
+    heavy, burst_user = 1, 2
+    tappers = [100 + i for i in range(args.tappers)]
+    await wait([api.command(u, "/start") for u in [heavy, burst_user] + tappers])
+
+    # один качает гайды подряд, остальные жмут кнопки раз в --interval
+    downloads = []
+
+    async def downloader():
+        while len(downloads) < args.downloads:
+            uid = api.callback(heavy, "guide:path_to_self")
+            downloads.append(uid)
+            await wait([uid])
+
+    async def tapper(u, i0):
+        ids = []
+        for i in range(args.taps // len(tappers) or 1):
+            await asyncio.sleep(args.interval)
+            ids.append(api.callback(u, NAV[(i0 + i) % len(NAV)]))
+            await wait(ids[-1:])
+        return ids
+
+    heavy_task = asyncio.create_task(downloader())
+    await asyncio.sleep(0.05)
+    tap_ids = sum(await asyncio.gather(*(tapper(u, i) for i, u in enumerate(tappers))), [])
+    # пачка нажатий одного пользователя — порядок обработки должен совпасть с порядком прихода
+    burst = [api.callback(burst_user, NAV[i % len(NAV)]) for i in range(args.burst)]
+    await wait(burst)
+    await heavy_task
+
+    await app.updater.stop()
+    await app.stop()
+    await bot.post_shutdown(app)
+    await app.shutdown()
+    await api.stop()
+
+    waits = [done[i] - api.pushed[i] for i in tap_ids if i in done]
+    ordered = all(ids == sorted(ids) for ids in order.values())
+    return {"workers": args.workers, "taps": len(waits), "downloads": len(downloads),
+            "p50": _pct(waits, .5), "p99": _pct(waits, .99), "max": max(waits) if waits else 0.0,
+            "ordered": ordered, "burst_in_order": order.get(burst_user, [])[-len(burst):] == burst,
+            "peak": peak[1], "updates": bot.UPDATES.stats()}
+
+
+def run_child(args, workers: int) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--workers", str(workers),
+           "--taps", str(args.taps), "--tappers", str(args.tappers), "--interval", str(args.interval),
+           "--downloads", str(args.downloads), "--burst", str(args.burst),
+           "--latency", str(args.latency), "--upload-latency", str(args.upload_latency)]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=32)
+    ap.add_argument("--taps", type=int, default=40, help="нажатий остальных пользователей всего")
+    ap.add_argument("--tappers", type=int, default=20)
+    ap.add_argument("--interval", type=float, default=0.3, help="пауза между нажатиями одного пользователя, с")
+    ap.add_argument("--downloads", type=int, default=3, help="сколько гайдов подряд качает первый пользователь")
+    ap.add_argument("--burst", type=int, default=20, help="нажатий пачкой от одного пользователя")
+    ap.add_argument("--latency", type=float, default=0.02)
+    ap.add_argument("--upload-latency", type=float, default=2.0, help="задержка sendDocument, с")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        import logging
+        logging.disable(logging.WARNING)
+        print(json.dumps(asyncio.run(child(args))))
+        return
+
+    for workers in (1, args.workers):
+        r = run_child(args, workers)
+        print(f"workers={workers:>3}: taps of other users p50 {r['p50'] * 1000:7.1f}ms  "
+              f"p99 {r['p99'] * 1000:7.1f}ms  max {r['max'] * 1000:7.1f}ms | peak concurrent {r['peak']}, "
+              f"per-user order {'ok' if r['ordered'] and r['burst_in_order'] else 'BROKEN'}, "
+              f"chained {r['updates']['chained']}")
+        assert r["ordered"] and r["burst_in_order"], "updates of one user processed out of order"
+        assert r["peak"] <= workers, "more updates in flight than workers"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+Локальный заменитель Bot API для нагрузочных тестов (на том же http_server.py, что и бот)
+
+    server = FakeBotAPI(token, latency=0.03, upload_latency=0.2, retry_after_rate=0.01)
+    await server.start()            # http://127.0.0.1:<port>, бот: BOT_API_URL=server.url
+    server.push_update({...})       # отдаётся через getUpdates или POST'ом на вебхук (после setWebhook)
+
+Методы: getMe, getUpdates, setWebhook, deleteWebhook, sendMessage, sendPhoto, sendDocument,
+editMessageText, editMessageCaption, editMessageReplyMarkup, deleteMessage, answerCallbackQuery,
+getChatMember. Ответы — настоящие JSON-объекты Telegram, которые PTB разбирает без ошибок.
+Задержка настраивается по методам; retry_after_rate — доля запросов на отправку, получающих 429.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter, deque
+from email.parser import BytesParser
+from urllib.parse import parse_qs
+
+import _fakes  # noqa: F401  (sys.path)
+
+import httpx  # noqa: E402
+
+from http_server import HttpServer, Response  # noqa: E402
+
+SEND_METHODS = {"sendMessage", "sendPhoto", "sendDocument", "editMessageText", "editMessageCaption",
+                "editMessageReplyMarkup"}
+UPLOAD_METHODS = {"sendPhoto", "sendDocument"}
+
+
+def _ok(result):
+    return Response.json(json.dumps({"ok": True, "result": result}, ensure_ascii=False))
+
+
+def _error(code: int, description: str, **params):
+    body = {"ok": False, "error_code": code, "description": description}
+    if params:
+        body["parameters"] = params
+    return Response(code, json.dumps(body).encode("utf-8"), "application/json")
+
+
+def _parse_params(req) -> dict:
+    """PTB шлёт form-urlencoded (значения — JSON) или multipart с файлами; httpx-клиенты — JSON."""
+    ctype = req.headers.get("content-type", "")
+    raw = {}
+    if ctype.startswith("multipart/"):
+        msg = BytesParser().parsebytes(b"Content-Type: " + ctype.encode() + b"\r\n\r\n" + req.body)
+        for part in msg.get_payload():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename():
+                raw[name] = {"__file__": part.get_filename(), "size": len(part.get_payload(decode=True) or b"")}
+            else:
+                raw[name] = part.get_payload(decode=True).decode("utf-8")
+    elif ctype.startswith("application/json"):
+        return json.loads(req.body or b"{}")
+    elif req.body:
+        raw = {k: v[0] for k, v in parse_qs(req.body.decode("utf-8")).items()}
+    elif req.query:
+        raw = {k: v[0] for k, v in parse_qs(req.query).items()}
+    params = {}
+    for k, v in raw.items():
+        if isinstance(v, str):
+            try:
+                v = json.loads(v)
+            except ValueError:
+                pass
+        params[k] = v
+    return params
+
+
+class FakeBotAPI:
+    def __init__(self, token: str, latency: float = 0.03, upload_latency: float = None,
+                 method_latency: dict = None, retry_after_rate: float = 0.0, retry_after: int = 1,
+                 webhook_connections: int = 40, seed: int = 1):
+        self.token = token
+        self.latency = latency
+        self.method_latency = dict(method_latency or {})
+        if upload_latency is not None:
+            for m in UPLOAD_METHODS:
+                self.method_latency.setdefault(m, upload_latency)
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.webhook_connections = webhook_connections
+        self._rnd = random.Random(seed)
+        self._server = HttpServer(host="127.0.0.1", port=0)
+        self._updates = deque()
+        self._has_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1000)
+        self._file_ids = itertools.count(1)
+        self.messages = {}             # chat_id → последнее сообщение бота (JSON-объект)
+        self.calls = Counter()
+        self.throttled = 0
+        self.pushed = {}               # update_id → момент постановки (time.perf_counter)
+        self.first_call = {}           # метод → момент первого вызова
+        self.first_message = {}        # chat_id → момент первого сообщения бота в чат
+        self.webhook_url = None
+        self.webhook_secret = None
+        self._delivery = None
+        self._client = None
+        handlers = {
+            "getMe": self._get_me, "getUpdates": self._get_updates,
+            "setWebhook": self._set_webhook, "deleteWebhook": self._delete_webhook,
+            "sendMessage": self._send_message, "sendPhoto": self._send_photo,
+            "sendDocument": self._send_document, "editMessageText": self._edit_text,
+            "editMessageCaption": self._edit_caption, "editMessageReplyMarkup": self._edit_markup,
+            "deleteMessage": self._true, "answerCallbackQuery": self._true,
+            "getChatMember": self._get_chat_member,
+        }
+        for name, fn in handlers.items():
+            for method in ("GET", "POST"):
+                self._server.route(method, f"/bot{token}/{name}", self._wrap(name, fn))
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.port}"
+
+    async def start(self):
+        await self._server.start()
+
+    async def stop(self):
+        if self._delivery is not None:
+            self._delivery.cancel()
+            await asyncio.gather(self._delivery, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+        await self._server.stop()
+
+    # ─────────── апдейты ───────────
+    def push_update(self, update: dict) -> int:
+        update_id = next(self._update_ids)
+        update = {"update_id": update_id, **update}
+        self.pushed[update_id] = time.perf_counter()
+        self._updates.append(update)
+        self._has_updates.set()
+        return update_id
+
+    def user(self, uid: int) -> dict:
+        return {"id": uid, "is_bot": False, "first_name": f"User{uid}"}
+
+    def command(self, uid: int, text: str) -> int:
+        return self.push_update({"message": {
+            "message_id": next(self._message_ids), "date": int(time.time()), "from": self.user(uid),
+            "chat": {"id": uid, "type": "private"}, "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+            if text.startswith("/") else []}})
+
+    def callback(self, uid: int, data: str) -> int:
+        message = self.messages.get(uid) or {
+            "message_id": next(self._message_ids), "date": int(time.time()),
+            "chat": {"id": uid, "type": "private"}, "text": "menu"}
+        return self.push_update({"callback_query": {
+            "id": str(next(self._file_ids)), "from": self.user(uid), "chat_instance": str(uid),
+            "data": data, "message": message}})
+
+    async def _get_updates(self, p):
+        offset = int(p.get("offset") or 0)
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates:
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), timeout=float(p.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(p.get("limit") or 100)
+        return list(itertools.islice(self._updates, 0, limit))
+
+    async def set_webhook(self, url: str, secret: str = None):
+        """Вебхук, который у Telegram уже стоит до запуска бота (холодный старт)."""
+        return await self._set_webhook({"url": url, "secret_token": secret})
+
+    async def _set_webhook(self, p):
+        self.webhook_url = p.get("url")
+        self.webhook_secret = p.get("secret_token")
+        if self._delivery is None:
+            self._client = httpx.AsyncClient(timeout=30, limits=httpx.Limits(
+                max_connections=self.webhook_connections))
+            self._delivery = asyncio.create_task(self._deliver_loop())
+        return True
+
+    async def _delete_webhook(self, p):
+        self.webhook_url = None
+        return True
+
+    async def _deliver_loop(self):
+        slots = asyncio.Semaphore(self.webhook_connections)
+
+        async def post(update):
+            try:
+                headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret or ""}
+                for attempt in range(200):  # как Telegram: сервер ещё не поднялся — повторить позже
+                    try:
+                        await self._client.post(self.webhook_url, json=update, headers=headers)
+                        return
+                    except httpx.TransportError:
+                        await asyncio.sleep(0.05)
+            finally:
+                slots.release()
+
+        while True:
+            if not self._updates or not self.webhook_url:
+                self._has_updates.clear()
+                await self._has_updates.wait()
+                continue
+            await slots.acquire()
+            asyncio.create_task(post(self._updates.popleft()))
+
+    # ─────────── методы ───────────
+    def _wrap(self, name, fn):
+        async def handle(req):
+            self.calls[name] += 1
+            self.first_call.setdefault(name, time.perf_counter())
+            params = _parse_params(req)
+            delay = self.method_latency.get(name, self.latency)
+            if delay and name != "getUpdates":
+                await asyncio.sleep(delay)
+            if name in SEND_METHODS and self.retry_after_rate and self._rnd.random() < self.retry_after_rate:
+                self.throttled += 1
+                return _error(429, f"Too Many Requests: retry after {self.retry_after}",
+                              retry_after=self.retry_after)
+            result = await fn(params)
+            if isinstance(result, Response):
+                return result
+            return _ok(result)
+        return handle
+
+    async def _get_me(self, p):
+        return {"id": int(self.token.split(":")[0]), "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+    async def _true(self, p):
+        return True
+
+    def _message(self, p, **fields):
+        chat_id = int(p["chat_id"]) if str(p.get("chat_id", "")).lstrip("-").isdigit() else p.get("chat_id")
+        msg = {"message_id": next(self._message_ids), "date": int(time.time()),
+               "chat": {"id": chat_id, "type": "private"}, **fields}
+        if isinstance(p.get("reply_markup"), dict) and "inline_keyboard" in p["reply_markup"]:
+            msg["reply_markup"] = p["reply_markup"]  # в Message Telegram возвращает только inline-клавиатуру
+        self.messages[chat_id] = msg
+        self.first_message.setdefault(chat_id, time.perf_counter())
+        return msg
+
+    def _file(self, p, field) -> str:
+        value = p.get(field)
+        if isinstance(value, dict):  # загрузка файла → новый file_id
+            return f"file-{next(self._file_ids)}"
+        return value
+
+    async def _send_message(self, p):
+        if not p.get("text", "").strip():
+            return _error(400, "Bad Request: message text is empty")
+        return self._message(p, text=p["text"])
+
+    async def _send_photo(self, p):
+        fid = self._file(p, "photo")
+        return self._message(p, caption=p.get("caption", ""), photo=[
+            {"file_id": fid, "file_unique_id": fid, "width": 800, "height": 600}])
+
+    async def _send_document(self, p):
+        fid = self._file(p, "document")
+        return self._message(p, caption=p.get("caption", ""), document={"file_id": fid, "file_unique_id": fid})
+
+    def _edit(self, p, **fields):
+        chat_id = int(p["chat_id"])
+        msg = dict(self.messages.get(chat_id) or {
+            "message_id": int(p["message_id"]), "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}})
+        msg["message_id"] = int(p["message_id"])
+        msg.update(fields)
+        msg["edit_date"] = int(time.time())
+        if isinstance(p.get("reply_markup"), dict) and "inline_keyboard" in p["reply_markup"]:
+            msg["reply_markup"] = p["reply_markup"]
+        self.messages[chat_id] = msg
+        self.first_message.setdefault(chat_id, time.perf_counter())
+        return msg
+
+    async def _edit_text(self, p):
+        return self._edit(p, text=p.get("text", ""))
+
+    async def _edit_caption(self, p):
+        return self._edit(p, caption=p.get("caption", ""))
+
+    async def _edit_markup(self, p):
+        return self._edit(p)
+
+    async def _get_chat_member(self, p):
+        return {"status": "member", "user": self.user(int(p["user_id"]))}
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный тест bot.py целиком: настоящий Application, настоящие хендлеры, локальный Bot API (fake_api.py).
+Сессии берутся из events.csv (start → mentoring_view → guides_view → guide_download, …) и размножаются.
+
+    python bench/loadtest.py [--users 100] [--mode polling|webhook] [--latency 0.03] [--upload-latency 0.3]
+                             [--retry-after-rate 0] [--think 0.05] [--compare bench/results/<файл>.json]
+
+Каждый пользователь проходит свою сессию по замкнутому циклу: следующий шаг — после обработки предыдущего
+и паузы think. Отчёт: задержка хендлеров (process_update) и от постановки в Bot API до конца обработки
+(p50/p95/p99), апдейтов в секунду, вызовов API на апдейт. Результат пишется в
+bench/results/<коммит>-<режим>-u<users>.json; --compare сравнивает с прошлым прогоном и возвращает
+код 1, если p95 или пропускная способность хуже больше чем на --threshold.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import _fakes  # noqa: F401  (sys.path + BOT_TOKEN)
+from fake_api import FakeBotAPI  # noqa: E402
+
+from eventlog import EventLog, parse_row  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "results")
+SESSION_GAP = 300.0  # секунд тишины между сессиями одного пользователя
+
+# событие из events.csv → шаг сессии
+STEPS = {
+    "start":             ("command", "/start"),
+    "mentoring_view":    ("callback", "nav:mentorship"),
+    "consultation_view": ("callback", "nav:consultation"),
+    "guides_view":       ("callback", "nav:guides"),
+    "guide_download":    ("callback", "guide:"),       # ключ гайда — по названию из details
+    "insight_view":      ("callback", "nav:qod"),
+    "contact_view":      ("callback", "nav:contact"),
+    "donate_view":       ("callback", "nav:support"),
+    "reviews_view":      ("callback", "nav:reviews"),
+    "daily_subscribe":   ("callback", "qod:remind"),
+    "daily_unsubscribe": ("command", "/stopremind"),
+}
+
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+def load_sessions(path: str, guide_keys: dict, gap: float = SESSION_GAP) -> list:
+    """[[(kind, payload), ...], ...] — сессии из журнала событий: по пользователю, разрыв > gap секунд
+    начинает новую сессию."""
+    import csv
+    log = EventLog(path)
+    per_user = defaultdict(list)
+    for name in log.files():
+        with open(os.path.join(log.dir, name), "r", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                parsed = parse_row(row)
+                if parsed is None or parsed[2] not in STEPS:
+                    continue
+                per_user[parsed[1]].append(parsed)
+    sessions = []
+    for rows in per_user.values():
+        rows.sort(key=lambda r: r[0])
+        steps, last = [], None
+        for ts, _, event, details in rows:
+            try:
+                at = datetime.fromisoformat(ts).timestamp()
+            except ValueError:
+                at = last or 0.0
+            if steps and last is not None and at - last > gap:
+                sessions.append(steps)
+                steps = []
+            last = at
+            kind, payload = STEPS[event]
+            if payload == "guide:":
+                payload = guide_keys.get(details.strip(), next(iter(guide_keys.values())))
+            steps.append((kind, payload))
+        if steps:
+            sessions.append(steps)
+    for steps in sessions:
+        if steps[0] != STEPS["start"]:
+            steps.insert(0, STEPS["start"])
+    return sessions or [[STEPS["start"], STEPS["guides_view"]]]
+
+
+def git_commit() -> tuple:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=HERE, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, cwd=HERE).stdout.strip())
+        return sha, dirty
+    except Exception:
+        return "unknown", False
+
+
+async def run(args) -> dict:
+    api = FakeBotAPI(os.environ["BOT_TOKEN"], latency=args.latency, upload_latency=args.upload_latency,
+                     retry_after_rate=args.retry_after_rate)
+    await api.start()
+    tmp = tempfile.mkdtemp()
+    os.environ.update(BOT_API_URL=api.url, BOT_MODE=args.mode, PORT="0", STATE_BACKEND="memory",
+                      MEDIA_CACHE_FILE=os.path.join(tmp, "media_cache.json"),
+                      EVENTS_FILE=os.path.join(tmp, "events.csv"),
+                      USER_RATE="0", TAP_DEBOUNCE="0")  # сессии без пауз — нагрузка, а не флуд
+    import bot  # после настройки окружения: бот читает его при импорте
+
+    timings = {}             # update_id → (начало обработки, конец)
+    waiters = {}             # update_id → future
+
+    class TimedApplication(bot.CountingApplication):
+        async def process_update(self, update):
+            started = time.perf_counter()
+            try:
+                await super().process_update(update)
+            finally:
+                uid = getattr(update, "update_id", None)
+                timings[uid] = (started, time.perf_counter())
+                fut = waiters.pop(uid, None)
+                if fut is not None and not fut.done():
+                    fut.set_result(None)
+
+    bot.CountingApplication = TimedApplication
+    app = bot.build_app()
+    if args.mode == "webhook":
+        bot.HTTP.route("POST", bot.WEBHOOK_PATH, bot.webhook_handler(app))
+    await app.initialize()
+    await bot.post_init(app)
+    if args.mode == "webhook":
+        await app.bot.set_webhook(f"http://127.0.0.1:{bot.HTTP.port}{bot.WEBHOOK_PATH}",
+                                  secret_token=bot.WEBHOOK_SECRET)
+    else:
+        await app.updater.start_polling(poll_interval=0.0, timeout=1)
+    await app.start()
+
+    guide_keys = {g.title: g.callback_data for g in bot.GUIDES.current}
+    sessions = load_sessions(args.events, guide_keys)
+    loop = asyncio.get_running_loop()
+
+    async def user(i: int):
+        await asyncio.sleep(args.ramp * i / max(1, args.users))
+        uid = 10_000_000 + i
+        for kind, payload in sessions[i % len(sessions)]:
+            update_id = api.command(uid, payload) if kind == "command" else api.callback(uid, payload)
+            fut = waiters[update_id] = loop.create_future()
+            if update_id in timings:  # успели обработать раньше, чем встали в ожидание
+                waiters.pop(update_id, None)
+            else:
+                await asyncio.wait_for(fut, args.step_timeout)
+            if args.think:
+                await asyncio.sleep(args.think)
+
+    from transport import API_STATS
+    calls_before = API_STATS.calls
+    updates_before = API_STATS.updates
+    started = time.perf_counter()
+    results = await asyncio.gather(*(user(i) for i in range(args.users)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    errors = [r for r in results if isinstance(r, Exception)]
+
+    if args.mode != "webhook":
+        await app.updater.stop()
+    await app.stop()
+    await bot.post_shutdown(app)
+    await app.shutdown()
+    await api.stop()
+
+    handler = [end - start for start, end in timings.values()]
+    e2e = [timings[u][1] - api.pushed[u] for u in timings if u in api.pushed]
+    updates = len(timings)
+    api_updates = API_STATS.updates - updates_before
+    return {
+        "updates": updates,
+        "users": args.users,
+        "sessions": len(sessions),
+        "elapsed": round(elapsed, 3),
+        "updates_per_s": round(updates / elapsed, 1) if elapsed else 0.0,
+        "handler_ms": {p: round(_pct(handler, q) * 1000, 2) for p, q in (("p50", .5), ("p95", .95), ("p99", .99))},
+        "e2e_ms": {p: round(_pct(e2e, q) * 1000, 2) for p, q in (("p50", .5), ("p95", .95), ("p99", .99))},
+        "api_calls_per_update": round((API_STATS.calls - calls_before) / api_updates, 3) if api_updates else 0.0,
+        "api_calls": dict(api.calls),
+        "throttled": api.throttled,
+        "errors": len(errors),
+        "first_error": repr(errors[0]) if errors else None,
+    }
+
+
+def compare(old: dict, new: dict, threshold: float) -> bool:
+    """Печатает разницу; True — есть регрессия."""
+    regress = False
+    rows = [("updates/s", old["updates_per_s"], new["updates_per_s"], True),
+            ("handler p95 ms", old["handler_ms"]["p95"], new["handler_ms"]["p95"], False),
+            ("e2e p50 ms", old["e2e_ms"]["p50"], new["e2e_ms"]["p50"], False),
+            ("e2e p95 ms", old["e2e_ms"]["p95"], new["e2e_ms"]["p95"], False),
+            ("api calls/update", old["api_calls_per_update"], new["api_calls_per_update"], False)]
+    for name, a, b, higher_is_better in rows:
+        change = (b - a) / a if a else 0.0
+        worse = change < -threshold if higher_is_better else change > threshold
+        regress |= worse
+        print(f"  {name:<17} {a:>10} → {b:<10} {change:+.1%}{'  ← REGRESSION' if worse else ''}")
+    return regress
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    ap.add_argument("--latency", type=float, default=0.03, help="задержка Bot API, с")
+    ap.add_argument("--upload-latency", type=float, default=0.3, help="задержка sendPhoto/sendDocument, с")
+    ap.add_argument("--retry-after-rate", type=float, default=0.0, help="доля отправок, получающих 429")
+    ap.add_argument("--think", type=float, default=0.05, help="пауза пользователя между шагами, с")
+    ap.add_argument("--ramp", type=float, default=1.0, help="за сколько секунд подключаются все пользователи")
+    ap.add_argument("--step-timeout", type=float, default=120.0)
+    ap.add_argument("--events", default=os.path.join(os.path.dirname(HERE), "events.csv"))
+    ap.add_argument("--compare", help="JSON прошлого прогона")
+    ap.add_argument("--threshold", type=float, default=0.10)
+    ap.add_argument("--no-save", action="store_true")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    for name in ("mindmeld_bot", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    result = asyncio.run(run(args))
+    sha, dirty = git_commit()
+    record = {"commit": sha, "dirty": dirty, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "params": {k: v for k, v in vars(args).items() if k not in ("compare", "no_save", "events")},
+              "results": result}
+
+    r = result
+    print(f"{r['updates']} updates from {r['users']} users ({r['sessions']} recorded sessions), "
+          f"{args.mode}, {r['elapsed']}s → {r['updates_per_s']} updates/s")
+    print(f"  handler   p50 {r['handler_ms']['p50']}ms  p95 {r['handler_ms']['p95']}ms  p99 {r['handler_ms']['p99']}ms")
+    print(f"  end-2-end p50 {r['e2e_ms']['p50']}ms  p95 {r['e2e_ms']['p95']}ms  p99 {r['e2e_ms']['p99']}ms")
+    print(f"  API calls per update {r['api_calls_per_update']}, 429 injected {r['throttled']}, errors {r['errors']}")
+    if r["first_error"]:
+        print(f"  first error: {r['first_error']}")
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{sha}{'-dirty' if dirty else ''}-{args.mode}-u{args.users}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        print(f"  saved {os.path.relpath(path)}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        print(f"vs {old['commit']} ({old['timestamp']}):")
+        if compare(old["results"], result, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
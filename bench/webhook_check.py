@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная проверка вебхука: поднимает HTTP-сервер бота на случайном порту
+и шлёт синтетические апдейты (без сети и без Telegram).
+
+    python bench/webhook_check.py
+
+Проверяет: 403 без/с неверным секретом, 400 на мусор, 200 + апдейт в update_queue,
+/ и /health на том же порту, keep-alive между запросами.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+
+import _fakes  # noqa: F401  (sys.path + BOT_TOKEN)
+
+os.environ.setdefault("STATE_BACKEND", "memory")
+os.environ.setdefault("EVENTS_FILE", os.path.join(tempfile.mkdtemp(), "events.csv"))
+import httpx  # noqa: E402
+from telegram.ext import Application  # noqa: E402
+
+import bot  # noqa: E402
+from http_server import HttpServer  # noqa: E402
+
+
+def _callback_update(update_id: int, uid: int, data: str) -> dict:
+    user = {"id": uid, "is_bot": False, "first_name": "Test"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id), "from": user, "chat_instance": "1", "data": data,
+            "message": {"message_id": 1, "date": 0, "chat": {"id": uid, "type": "private"}, "text": "menu"},
+        },
+    }
+
+
+async def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    app = Application.builder().token(bot.BOT_TOKEN).build()  # не initialize(): сеть не нужна
+    server = HttpServer(host="127.0.0.1", port=0)
+    for path in ("/", "/health"):
+        server.route("GET", path, bot.home if path == "/" else bot.health)
+    server.route("POST", bot.WEBHOOK_PATH, bot.webhook_handler(app))
+    await server.start()
+    base = f"http://127.0.0.1:{server.port}"
+    secret = {"X-Telegram-Bot-Api-Secret-Token": bot.WEBHOOK_SECRET}
+    body = _callback_update(1, 42, "nav:guides")
+
+    async with httpx.AsyncClient(base_url=base) as client:
+        r = await client.get("/health")
+        assert (r.status_code, r.text) == (200, "ok"), r
+        r = await client.get("/")
+        assert r.status_code == 200, r
+
+        r = await client.post(bot.WEBHOOK_PATH, json=body)
+        assert r.status_code == 403, f"no secret → {r.status_code}"
+        r = await client.post(bot.WEBHOOK_PATH, json=body, headers={"X-Telegram-Bot-Api-Secret-Token": "nope"})
+        assert r.status_code == 403, f"wrong secret → {r.status_code}"
+        r = await client.post(bot.WEBHOOK_PATH, content=b"{not json", headers=secret)
+        assert r.status_code == 400, f"garbage → {r.status_code}"
+        assert app.update_queue.empty()
+
+        n = 200
+        for i in range(n):
+            r = await client.post(bot.WEBHOOK_PATH, content=json.dumps(_callback_update(i + 1, 42, "nav:menu")),
+                                  headers={**secret, "Content-Type": "application/json"})
+            assert r.status_code == 200, r
+        assert app.update_queue.qsize() == n, app.update_queue.qsize()
+        first = app.update_queue.get_nowait()
+        assert first.callback_query.data == "nav:menu" and first.effective_user.id == 42
+
+        r = await client.get("/nope")
+        assert r.status_code == 404
+        r = await client.get(bot.WEBHOOK_PATH)
+        assert r.status_code == 405
+
+    await server.stop()
+    print(f"webhook check OK: {n} synthetic updates accepted, {server.requests} HTTP requests served")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,35 +2,77 @@
 """
 MindMeld Bot — финальная сборка
 - Приветственное фото без кнопок + отдельное текстовое меню (inline) → фото не затирается
-- Flask keep-alive (/ , /health) + внутренний self-ping к /health
+- Один asyncio HTTP-сервер (http_server.py): вебхук Telegram + / + /health на PORT
+- BOT_MODE=webhook — апдейты по вебхуку; BOT_MODE=polling (по умолчанию) — long polling + self-ping к /health
+- Апдейты разных пользователей обрабатываются параллельно, одного — по порядку (update_processor.py);
+  несколько процессов с разбиением пользователей по шардам — shard.py (здесь BOT_MODE=shard)
 - «Поддержать» (QR), «Отзывы», «Связаться», «Диагностика»
-- «Гайды»: 1 PDF после проверки подписки
+- Заявки (наставничество/консультация) при ADMIN_ID — текстом в боте: «Принял» сразу, админу — через
+  outbox.jsonl фоном, с повторами и дайджестом (outbox.py)
+- «Гайды»: 1 PDF после проверки подписки; одновременные нажатия делят одну выдачу (delivery.py);
+  список — все guide_*.pdf из GUIDES_DIR, индекс и клавиатура в памяти, пересборка по mtime папки (guides.py)
+- Состояние пользователей переживает рестарты (state_store.py, SQLite WAL + write-behind)
+- Проверка подписки кэшируется (membership.py): TTL, single-flight, сброс по chat_member
+- Медиа шлём по кэшированному file_id (media_cache.py) — загрузка на сервер Telegram только один раз
+- Лишних запросов нет (ui_state.py): старая reply-клавиатура снимается один раз на чат,
+  правка сразу нужным методом, правка «на то же самое» не отправляется; счётчик вызовов на апдейт — transport.py
+- Все send*/edit* — через планировщик (outbound.py): лимиты Telegram, нажатия вперёд напоминаний
+- Повтор того же нажатия и флуд отсекаются до хендлеров (guard.py): debounce + token bucket на пользователя
+- GET /metrics — метрики Prometheus (metrics.py): хендлеры, маршруты колбэков, методы Bot API
+- События экранов (start, guides_view, guide_download, …) → events-YYYY-MM-DD.csv пачками в фоне (eventlog.py);
+  /stats [диапазон] для ADMIN_ID — из дневных сводок (rollups.py), а не из сырых строк
+- Тексты экранов, инсайты и вопросы дня — из каталога (content.py): читаются один раз,
+  перечитываются по mtime, экраны пересобираются целиком
 - «Вопрос дня 2.0»: варианты + свободный ответ + ежедневное напоминание 09:00 (Europe/Moscow)
+  через один диспетчер с корзинами по времени/поясу (reminders.py), а не job на каждого;
+  ответы сохраняются (answers.py): «так же ответили N%», серия дней подряд, /answers — история
 """
 
+import asyncio
+import hashlib
+import hmac
+import html
+import json
 import logging
 import os
-import threading
-import time
-import urllib.request
-from threading import Thread
-from datetime import datetime, time as dtime
-
-import pytz
-from flask import Flask
+import signal
+from datetime import date
+
+import httpx
 from telegram import (
-    Update, InlineKeyboardMarkup, InlineKeyboardButton, InputFile, ReplyKeyboardRemove
+    Update, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove
 )
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 from telegram.ext import (
-    Application, CommandHandler, MessageHandler, CallbackQueryHandler,
+    Application, CommandHandler, MessageHandler, CallbackQueryHandler, ChatMemberHandler, TypeHandler,
     ContextTypes, filters
 )
 
+from answers import open_answers
+from asset_manifest import AssetManifest
+from content import PICK_PREFIX, ContentCatalog
+from delivery import DONE, DeliveryClaims
+from eventlog import open_event_writer
+from guides import GuideCatalog
+from guard import UpdateGuard
+from rollups import Rollups, default_path as rollups_default_path, parse_range
+from http_server import HttpServer, Response
+from media_cache import MediaCache
+from membership import MembershipCache
+from metrics import CALLBACK_SECONDS, CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, SAFE_EDIT, instrument
+from reminders import ReminderDispatcher
+from state_store import open_store
+from outbound import OutboundScheduler, ScheduledRequest, bulk_lane
+from outbox import application_text, open_outbox
+from transport import API_STATS, POOLS, CountingApplication, TunedRequest
+from update_processor import PerUserUpdateProcessor
+from ui_state import CAPTION_LIMIT, UIState
+
 # ────────────── ЛОГИ ──────────────
 logging.basicConfig(
     format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    level=logging.INFO,
+    level=getattr(logging, (os.getenv("LOG_LEVEL") or "INFO").strip().upper(), logging.INFO),
 )
 log = logging.getLogger("mindmeld_bot")
 
@@ -41,6 +83,7 @@ if not BOT_TOKEN:
 
 CHANNEL_USERNAME = "@vse_otvety_vnutri_nas"  # канал для проверки подписки
 CHANNEL_ID = ""  # можно numeric id; если пусто — используем username
+ADMIN_ID = int((os.getenv("ADMIN_ID") or "0").strip() or 0)  # кому доступен /stats и кому идут заявки
 
 # Ссылки
 REVIEWS_CHANNEL_URL = "https://t.me/+4Ov29pR6uj9iYjgy"
@@ -49,15 +92,69 @@ TRIBUTE_URL         = "https://t.me/tribute/app?startapp=dq3J"
 CONTACT_TG_URL      = "https://t.me/R_V_Bodonenkov4"
 DIAGNOSTIC_URL      = "https://t.me/m/0JIRBvZ_NmQy"
 
-# Файлы
-WELCOME_PHOTO = "assets/welcome.jpg"
-QR_PHOTO      = "assets/qr.png"
-GUIDE_FILES = {
-    "path_to_self":      "guide_path_to_self.pdf",
-    "know_but_dont_do":  "guide_know_but_dont_do.pdf",
-    "self_acceptance":   "guide_self_acceptance.pdf",
-    "shut_the_mind":     "guide_shut_the_mind.pdf",
+# Файлы: в коде — исходники, отправляются облегчённые копии из манифеста (build_assets.py), если он собран
+ASSETS = AssetManifest.load(os.getenv("ASSETS_MANIFEST", "dist/manifest.json"))
+WELCOME_PHOTO = ASSETS.path_for("assets/welcome.jpg")
+QR_PHOTO      = ASSETS.path_for("assets/qr.png")
+# Гайды — все guide_<ключ>.pdf из GUIDES_DIR (guides.py); здесь только названия и порядок кнопок.
+# Файл без названия тоже появится в меню — с названием из имени файла
+GUIDES_DIR = os.getenv("GUIDES_DIR", ".")
+GUIDE_TITLES = {
+    "path_to_self":      "Путь к себе",
+    "know_but_dont_do":  "Знаю, но не делаю",
+    "self_acceptance":   "Принятие себя",
+    "shut_the_mind":     "Заткнуть мозг",
 }
+MISSING_ASSETS = set()  # заполняется проверкой на старте (post_init)
+GUIDE_MISSING_TEXT = "PDF пока недоступен на сервере — проверь, что файл лежит рядом с ботом."
+GUIDE_RECEIVED_TEXT = "Кажется, ты уже получил свой гайд. Закрой текущий цикл — и приходи за следующим."
+INSIGHTS_FILE  = os.getenv("INSIGHTS_FILE", "insights.json")
+QUESTIONS_FILE = os.getenv("QUESTIONS_FILE", "questions.json")
+TEXTS_FILE     = os.getenv("TEXTS_FILE", "texts.json")  # необязательный: переопределение текстов экранов
+MEDIA_CACHE_FILE = os.getenv("MEDIA_CACHE_FILE", "media_cache.json")
+MEDIA_WARM_CHAT_ID = os.getenv("MEDIA_WARM_CHAT_ID", "").strip()  # куда прогревать file_id на старте (необязательно)
+
+# Режим работы и HTTP
+BOT_MODE = (os.getenv("BOT_MODE") or "polling").strip().lower()  # webhook | polling | shard (воркер shard.py)
+PORT = int(os.getenv("PORT", "10000"))
+PUBLIC_URL = (os.getenv("WEBHOOK_URL") or os.getenv("BASE_URL") or os.getenv("RENDER_EXTERNAL_URL") or "").strip().rstrip("/")
+WEBHOOK_PATH = "/" + (os.getenv("WEBHOOK_PATH") or "telegram").strip().strip("/")
+# секрет для заголовка X-Telegram-Bot-Api-Secret-Token; если не задан — выводим из токена
+WEBHOOK_SECRET = (os.getenv("WEBHOOK_SECRET") or "").strip() or hashlib.sha256(
+    ("webhook:" + BOT_TOKEN).encode()).hexdigest()[:48]
+# свой Bot API сервер (self-hosted telegram-bot-api или bench/fake_api.py); пусто — api.telegram.org
+BOT_API_URL = (os.getenv("BOT_API_URL") or "").strip().rstrip("/")
+SELF_PING_INTERVAL = 240  # раз в 4 минуты (только polling)
+
+# Соединения с Bot API: свой пул у исходящих и у long-poll getUpdates (transport.py)
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "64"))                 # ≥ UPDATE_WORKERS + всплеск планировщика
+API_POLL_POOL_SIZE = int(os.getenv("API_POLL_POOL_SIZE", "1"))
+API_KEEPALIVE = int(os.getenv("API_KEEPALIVE", "32"))                 # сколько простаивающих соединений держать
+API_KEEPALIVE_EXPIRY = float(os.getenv("API_KEEPALIVE_EXPIRY", "30"))  # и сколько секунд
+API_POOL_TIMEOUT = float(os.getenv("API_POOL_TIMEOUT", "1"))          # предел ожидания соединения (очередь + пул), потом TimedOut
+API_HTTP2 = os.getenv("API_HTTP2", "0").strip().lower() in ("1", "true", "yes")  # нужен python-telegram-bot[http2]
+
+# Напоминания «Вопрос дня»
+REMIND_TZ = os.getenv("REMIND_TZ", "Europe/Moscow")
+REMIND_AT = os.getenv("REMIND_AT", "09:00")
+REMIND_RATE = float(os.getenv("REMIND_RATE", "20"))      # сообщений в секунду на все корзины
+REMIND_WINDOW = float(os.getenv("REMIND_WINDOW", "120"))  # за сколько секунд растянуть одну корзину
+
+# Кэш проверки подписки (секунды)
+MEMBER_TTL_POSITIVE = float(os.getenv("MEMBER_TTL_POSITIVE", "600"))
+MEMBER_TTL_NEGATIVE = float(os.getenv("MEMBER_TTL_NEGATIVE", "30"))
+
+# Повторные нажатия и флуд (guard.py)
+TAP_DEBOUNCE = float(os.getenv("TAP_DEBOUNCE", "0.8"))  # то же нажатие в течение стольких секунд — повтор
+USER_RATE = float(os.getenv("USER_RATE", "2"))          # апдейтов в секунду на пользователя
+USER_BURST = float(os.getenv("USER_BURST", "10"))
+
+# Исходящие запросы (outbound.py): общий лимит и лимит на чат, сообщений в секунду
+OUTBOUND_RATE = float(os.getenv("OUTBOUND_RATE", "30"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+
+# Сколько апдейтов обрабатывать одновременно (разные пользователи; у одного — всегда по очереди)
+UPDATE_WORKERS = max(1, int(os.getenv("UPDATE_WORKERS", "32")))
 
 # ────────────── ТЕКСТЫ ─────────────
 WELCOME_TEXT = (
@@ -128,192 +225,355 @@ DIAG_TEXT = (
     "👉 Записаться на диагностику: по кнопке ниже."
 )
 
+MENU_TEXT = "Выбирай раздел 👇"
+
 GUIDES_HEADER = (
     "<b>Выбери один гайд</b>\n"
     "⚠️ Можно получить <b>только один</b>, чтобы сфокусироваться и дойти до результата.\n\n"
     "Перед скачиванием бот проверит подписку на канал."
 )
 
-QUESTION_INTROS = [
-    ("Сколько времени сегодня ты уделишь себе (чистому присутствию)?", ["2 мин","5 мин","10 мин","20+ мин"]),
-    ("Что сегодня даст тебе больше энергии?", ["Сон","Движение","Тишина/медитация","Вода/питание"]),
-    ("Где сегодня нужен один честный шаг?", ["Здоровье","Дело","Отношения","Дом/быт"]),
-    ("Что ты готов отпустить сегодня?", ["Сомнения","Спешку","Контроль","Оправдания"]),
-    ("Какой минимум сделаешь при любой погоде?", ["1 действие","3 действия","5 действий","Сначала 1 — потом ещё"]),
-]
-
-# ─────────── KEEP‑ALIVE HTTP + SELF‑PING ───────────
-http = Flask(__name__)
 
-@http.get("/")
-def home():
-    return "Bot is running", 200
-
-@http.get("/health")
-def health():
-    return "ok", 200
-
-def _run_http():
-    port = int(os.getenv("PORT", "10000"))
-    http.run(host="0.0.0.0", port=port)
+# Встроенные тексты; любой можно переопределить в texts.json ({"ключ": "текст"}) без рестарта
+DEFAULT_TEXTS = {
+    "welcome":          WELCOME_TEXT,
+    "mentorship":       MENTORSHIP_TEXT,
+    "consultation":     CONSULTATION_TEXT,
+    "diagnostics":      DIAG_TEXT,
+    "guides_header":    GUIDES_HEADER,
+    "reviews":          "Отзывы:",
+    "contact":          "Связаться со мной:",
+    "req_mentorship":   "Оставить заявку на наставничество — напиши мне в личку:",
+    "req_consultation": "Оставить заявку на консультацию — напиши мне в личку:",
+    "req_form":         "Напиши одним сообщением: твой запрос + контакт (ник/телефон). Передам сразу.",
+}
 
-def _self_ping_loop():
-    base = os.getenv("BASE_URL", "").strip()
-    if not base:
-        return
-    url = base.rstrip("/") + "/health"
-    while True:
+# ─────────── HTTP: ВЕБХУК + KEEP‑ALIVE ───────────
+# воркер shard.py принимает апдейты только от приёмника на этой же машине
+HTTP = HttpServer(host="127.0.0.1" if BOT_MODE == "shard" else "0.0.0.0", port=PORT)
+BACKGROUND_TASKS = []
+
+async def home(req):
+    return Response.text("Bot is running")
+
+async def health(req):
+    return Response.text("ok")
+
+async def cache_stats(req):
+    return Response.json(json.dumps({"media": MEDIA.stats(), "membership": MEMBERSHIP.stats(),
+                                     "ui": UI.stats(), "api": API_STATS.stats(), "outbound": OUTBOUND.stats(),
+                                     "pools": {name: pool.stats() for name, pool in POOLS.items()},
+                                     "content": CONTENT.stats(),
+                                     "guides": {**GUIDES.stats(), "delivery": GUIDE_DELIVERY.stats()},
+                                     "updates": UPDATES.stats(), "guard": GUARD.stats(), "events": EVENTS.stats(), "answers": ANSWERS.stats(),
+                                     "outbox": OUTBOX.stats(),
+                                     "assets": {**ASSETS.stats(), "missing": sorted(MISSING_ASSETS)}}))
+
+HTTP.route("GET", "/", home)
+HTTP.route("GET", "/health", health)
+HTTP.route("GET", "/cache", cache_stats)
+
+async def metrics(req):
+    return Response(200, REGISTRY.render().encode("utf-8"), METRICS_CONTENT_TYPE)
+
+HTTP.route("GET", "/metrics", metrics)
+
+def webhook_handler(app: Application):
+    async def handle(req):
+        token = req.headers.get("x-telegram-bot-api-secret-token", "")
+        if not hmac.compare_digest(token.encode(), WEBHOOK_SECRET.encode()):
+            return Response.text("forbidden", 403)
         try:
-            with urllib.request.urlopen(url, timeout=10) as r:
-                r.read()
+            update = Update.de_json(json.loads(req.body), app.bot)
         except Exception:
-            pass
-        time.sleep(240)  # раз в 4 минуты
-
-def keep_alive():
-    Thread(target=_run_http, daemon=True).start()
-    threading.Thread(target=_self_ping_loop, daemon=True).start()
+            return Response.text("bad update", 400)
+        if update is None:
+            return Response.text("bad update", 400)
+        await app.update_queue.put(update)
+        return Response.text("ok")
+    return handle
+
+async def _self_ping_loop(url: str):
+    async with httpx.AsyncClient(timeout=10) as client:
+        while True:
+            try:
+                await client.get(url)
+            except Exception:
+                pass
+            await asyncio.sleep(SELF_PING_INTERVAL)
 
 # ─────────── КНОПКИ ───────────
-def menu_inline_kb() -> InlineKeyboardMarkup:
+# Клавиатуры собираются один раз при импорте: InlineKeyboardMarkup неизменяемый, его можно переиспользовать.
+def _back_row():
+    return [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
+
+BACK_KB = InlineKeyboardMarkup([_back_row()])
+
+MENU_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🎯 Наставничество", callback_data="nav:mentorship"),
+     InlineKeyboardButton("💬 Консультация", callback_data="nav:consultation")],
+    [InlineKeyboardButton("🧭 Диагностика (30 мин, бесплатно)", callback_data="nav:diagnostics")],
+    [InlineKeyboardButton("📚 Гайды", callback_data="nav:guides"),
+     InlineKeyboardButton("🔮 Вопрос дня", callback_data="nav:qod")],
+    [InlineKeyboardButton("💎 Отзывы", callback_data="nav:reviews"),
+     InlineKeyboardButton("💛 Поддержать", callback_data="nav:support")],
+    [InlineKeyboardButton("📞 Связаться", callback_data="nav:contact")]
+])
+
+REVIEWS_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Открыть канал с отзывами", url=REVIEWS_CHANNEL_URL)],
+    [InlineKeyboardButton("Пост‑подборка", url=REVIEWS_POST_URL)],
+    _back_row()
+])
+
+SUPPORT_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Открыть Tribute", url=TRIBUTE_URL)],
+    _back_row()
+])
+
+CONTACT_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Написать в Telegram", url=CONTACT_TG_URL)],
+    _back_row()
+])
+
+DIAGNOSTICS_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✅ Записаться на диагностику", url=DIAGNOSTIC_URL)],
+    _back_row()
+])
+
+def guides_kb(guides) -> InlineKeyboardMarkup:
+    """Собирается один раз на версию каталога гайдов (GuideIndex.keyboard)."""
+    return InlineKeyboardMarkup([[InlineKeyboardButton(g.title, callback_data=g.callback_data)] for g in guides] +
+                                [_back_row()])
+
+def _request_kb(kind: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([
-        [InlineKeyboardButton("🎯 Наставничество", callback_data="nav:mentorship"),
-         InlineKeyboardButton("💬 Консультация", callback_data="nav:consultation")],
-        [InlineKeyboardButton("🧭 Диагностика (30 мин, бесплатно)", callback_data="nav:diagnostics")],
-        [InlineKeyboardButton("📚 Гайды", callback_data="nav:guides"),
-         InlineKeyboardButton("🔮 Вопрос дня", callback_data="nav:qod")],
-        [InlineKeyboardButton("💎 Отзывы", callback_data="nav:reviews"),
-         InlineKeyboardButton("💛 Поддержать", callback_data="nav:support")],
-        [InlineKeyboardButton("📞 Связаться", callback_data="nav:contact")]
+        [InlineKeyboardButton("✅ Оставить заявку", callback_data=f"req:{kind}")],
+        [InlineKeyboardButton("🧭 Записаться на диагностику", url=DIAGNOSTIC_URL)],
+        _back_row()
     ])
 
-def reviews_kb() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("Открыть канал с отзывами", url=REVIEWS_CHANNEL_URL)],
-        [InlineKeyboardButton("Пост‑подборка", url=REVIEWS_POST_URL)],
-        [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-    ])
-
-def support_kb() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("Открыть Tribute", url=TRIBUTE_URL)],
-        [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-    ])
-
-def contact_kb() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("Написать в Telegram", url=CONTACT_TG_URL)],
-        [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-    ])
+MENTORSHIP_KB = _request_kb("mentorship")
+CONSULTATION_KB = _request_kb("consultation")
+
+QOD_ENTRY_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Ответить сейчас", callback_data="qod:start")],
+    _back_row()
+])
+QOD_MODE_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Выбрать из вариантов", callback_data="qod:variants")],
+    [InlineKeyboardButton("Свободный ответ", callback_data="qod:free")],
+    _back_row()
+])
+def _variants_kb(options) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton(opt, callback_data=PICK_PREFIX + opt)] for opt in options] +
+                                [_back_row()])
+QOD_AFTER_PICK_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Добавить свободный комментарий", callback_data="qod:add_comment")],
+    [InlineKeyboardButton("Готово", callback_data="qod:done")],
+    _back_row()
+])
+QOD_REMIND_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Поставить напоминание на завтра", callback_data="qod:remind")],
+    _back_row()
+])
+ANSWER_MAX_LEN = 1000  # свободный ответ длиннее — обрезается при сохранении
+QOD_REMINDER_KB = InlineKeyboardMarkup([[InlineKeyboardButton("Ответить сейчас", callback_data="qod:start")]])
+
+# ─────────── ЭКРАНЫ (реестр) ───────────
+# Статичный экран = текст из каталога (texts.json или встроенный) + готовая клавиатура.
+# Новый экран — одна строка в SCREEN_SPECS, маршрут для него появится автоматически (см. ROUTES ниже).
+class Screen:
+    __slots__ = ("text", "markup")
+
+    def __init__(self, text: str, markup: InlineKeyboardMarkup):
+        self.text = text
+        self.markup = markup
+
+SCREEN_SPECS = {
+    "nav:mentorship":   ("mentorship", MENTORSHIP_KB),
+    "nav:consultation": ("consultation", CONSULTATION_KB),
+    "nav:guides":       ("guides_header", None),  # клавиатура — из каталога гайдов
+    "nav:reviews":      ("reviews", REVIEWS_KB),
+    "nav:contact":      ("contact", CONTACT_KB),
+    "nav:diagnostics":  ("diagnostics", DIAGNOSTICS_KB),
+    "req:mentorship":   ("req_mentorship", CONTACT_KB),
+    "req:consultation": ("req_consultation", CONTACT_KB),
+}
 
-def diagnostics_kb() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("✅ Записаться на диагностику", url=DIAGNOSTIC_URL)],
-        [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-    ])
-
-def guides_kb() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("Путь к себе", callback_data="guide:path_to_self")],
-        [InlineKeyboardButton("Знаю, но не делаю", callback_data="guide:know_but_dont_do")],
-        [InlineKeyboardButton("Принятие себя", callback_data="guide:self_acceptance")],
-        [InlineKeyboardButton("Заткнуть мозг", callback_data="guide:shut_the_mind")],
-        [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-    ])
+# Всё, что зависит от каталогов (контент, гайды), собирается разом и подменяется одной ссылкой (VIEW)
+class ContentView:
+    __slots__ = ("catalog", "guides", "screens", "variants_kb")
+
+    def __init__(self, catalog, guides):
+        self.catalog = catalog
+        self.guides = guides
+        self.screens = {key: Screen(catalog.text(name), markup or guides.keyboard(guides_kb))
+                        for key, (name, markup) in SCREEN_SPECS.items()}
+        self.variants_kb = tuple(_variants_kb(options) for _, options in catalog.questions)
+
+def _on_content(catalog):
+    global VIEW
+    VIEW = ContentView(catalog, GUIDES.current)
+    log.info("content v%d: %d insights, %d questions", catalog.version, len(catalog.insights), len(catalog.questions))
+
+def _on_guides(guides):
+    global VIEW
+    VIEW = ContentView(CONTENT.current, guides)
+    MISSING_ASSETS.difference_update(g.path for g in guides)  # файл вернули — снова выдаём
+
+CONTENT = ContentCatalog(INSIGHTS_FILE, QUESTIONS_FILE, TEXTS_FILE, defaults={"texts": DEFAULT_TEXTS})
+GUIDES = GuideCatalog(GUIDES_DIR, titles=GUIDE_TITLES, resolve=ASSETS.path_for)  # сканирует в post_init, не при импорте
+VIEW = ContentView(CONTENT.current, GUIDES.current)
+CONTENT.add_listener(_on_content)
+GUIDES.add_listener(_on_guides)
 
 # ─────────── Служебные хранилища ───────────
-USER_STATE = {}
-USER_GUIDE_RECEIVED = set()
-LEGACY_BUTTON_TEXTS = {
-    "Наставничество","Консультация","Гайды","Вопрос дня",
-    "Отзывы","Поддержать","Диагностика (30 мин, бесплатно)","Связаться"
-}
+STORE = open_store()  # STATE_BACKEND=sqlite|memory, STATE_DB=state.db
+USER_STATE = STORE.dict("user_state")
+USER_GUIDE_RECEIVED = STORE.set("guide_received")
+ANSWERS = open_answers()  # ANSWERS_DB=answers.db: ответы на «Вопрос дня», распределения, серии
+OUTBOX = open_outbox()  # OUTBOX_FILE=outbox.jsonl: заявки админу — сначала на диск, доставка фоном
+OUTBOUND = OutboundScheduler(rate=OUTBOUND_RATE, chat_rate=OUTBOUND_CHAT_RATE)
+UPDATES = PerUserUpdateProcessor(UPDATE_WORKERS)  # параллельно по пользователям, по порядку внутри
+EVENTS = open_event_writer()  # EVENTS_FILE=events.csv (по дням), EVENTS_FLUSH_INTERVAL, EVENTS_FSYNC
+ROLLUPS = Rollups(EVENTS.log, os.getenv("ROLLUPS_FILE") or rollups_default_path(EVENTS.log.path))
+UI = UIState(STORE)  # убрана ли старая reply-клавиатура + что сейчас в наших сообщениях
+MEDIA = MediaCache(MEDIA_CACHE_FILE, bot_id=BOT_TOKEN.split(":", 1)[0])
+MEDIA_ASSETS = [(WELCOME_PHOTO, "photo"), (QR_PHOTO, "photo")]  # + гайды из каталога (warm_up)
+GUIDE_DELIVERY = DeliveryClaims(USER_GUIDE_RECEIVED)  # гайд — один раз: claim → commit/rollback
+MEMBERSHIP = MembershipCache(positive_ttl=MEMBER_TTL_POSITIVE, negative_ttl=MEMBER_TTL_NEGATIVE)
+GUARD = UpdateGuard(debounce=TAP_DEBOUNCE, rate=USER_RATE, burst=USER_BURST)
+REMINDERS = ReminderDispatcher(STORE, default_tz=REMIND_TZ, default_at=REMIND_AT,
+                               rate=REMIND_RATE, window=REMIND_WINDOW)
+
+# Gauge'и читаются только при GET /metrics
+REGISTRY.gauge("mindmeld_reminder_subscribers", "Подписчики напоминаний", lambda: len(REMINDERS))
+REGISTRY.gauge("mindmeld_reminder_lag_seconds", "Опоздание последней рассылки напоминаний",
+               lambda: REMINDERS.last_lag)
+REGISTRY.gauge("mindmeld_reminder_running_buckets", "Корзины напоминаний, рассылаемые сейчас",
+               lambda: REMINDERS.running_buckets)
+REGISTRY.gauge("mindmeld_reminders_total", "Напоминания: отправлено/ошибок",
+               lambda: {"sent": REMINDERS.sent, "failed": REMINDERS.failed}, ("result",), kind="counter")
+REGISTRY.gauge("mindmeld_outbound_queue_depth", "Запросы в очереди исходящих", OUTBOUND.depth, ("lane",))
+REGISTRY.gauge("mindmeld_api_calls_per_update", "Среднее число вызовов Bot API на апдейт",
+               lambda: API_STATS.stats()["per_update"])
+REGISTRY.gauge("mindmeld_api_pool_in_use", "Запросы к Bot API, занявшие или ждущие соединение, по пулам",
+               lambda: {name: pool.in_use for name, pool in POOLS.items()}, ("pool",))
+REGISTRY.gauge("mindmeld_guard_dropped_total", "Апдейты, отсечённые до хендлеров: повтор нажатия / лимит",
+               lambda: {"debounce": GUARD.debounced, "throttle": GUARD.throttled}, ("reason",), kind="counter")
+REGISTRY.gauge("mindmeld_guide_deliveries_total", "Выдачи гайда: отправлено / присоединились к идущей / откат",
+               lambda: {"sent": GUIDE_DELIVERY.sent, "joined": GUIDE_DELIVERY.joined,
+                        "rollback": GUIDE_DELIVERY.rollbacks}, ("result",), kind="counter")
+REGISTRY.gauge("mindmeld_updates_running", "Апдейты, обрабатываемые прямо сейчас", lambda: UPDATES.running)
+REGISTRY.gauge("mindmeld_updates_backlog", "Апдейты, ждущие предыдущий апдейт своего пользователя",
+               UPDATES.backlog)
+REGISTRY.gauge("mindmeld_state_pending_writes", "Изменения состояния, ещё не сброшенные на диск",
+               lambda: STORE.pending)
+REGISTRY.gauge("mindmeld_answers_pending_writes", "Ответы на вопрос дня, ещё не сброшенные на диск",
+               lambda: ANSWERS.pending)
+REGISTRY.gauge("mindmeld_events_pending", "События в очереди на запись", lambda: EVENTS.pending)
+REGISTRY.gauge("mindmeld_outbox_backlog", "Заявки админу, ещё не доставленные", lambda: OUTBOX.backlog)
+REGISTRY.gauge("mindmeld_outbox_oldest_seconds", "Сколько ждёт самая старая недоставленная заявка",
+               OUTBOX.oldest_age)
+REGISTRY.gauge("mindmeld_outbox_total", "Заявки админу: доставлено / неудачных попыток",
+               lambda: {"delivered": OUTBOX.delivered, "failed": OUTBOX.failures}, ("result",), kind="counter")
+REGISTRY.gauge("mindmeld_events_total", "События: записано/потеряно (переполнение очереди)",
+               lambda: {"written": EVENTS.written, "dropped": EVENTS.dropped}, ("result",), kind="counter")
 
 # ─────────── Универсальная правка ───────────
+# Метод выбирается по тому, что сейчас в сообщении (UI), — с первой попытки;
+# правка «на то же самое» не отправляется вовсе.
 async def safe_edit(q, text, reply_markup=None, parse_mode=ParseMode.HTML):
-    try:
-        msg = q.message
-        if getattr(msg, "photo", None):
-            return await msg.edit_caption(caption=text, parse_mode=parse_mode, reply_markup=reply_markup)
-        if msg.text:
-            return await msg.edit_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
-        return await msg.reply_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
-    except Exception:
-        return await q.message.reply_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+    msg = q.message
+    if UI.is_unchanged(msg, text, reply_markup):
+        SAFE_EDIT.inc("skipped")
+        return msg
+    kind = UI.kind(msg)
+    if kind == "text" or (kind == "photo" and len(text) <= CAPTION_LIMIT):
+        try:
+            if kind == "photo":
+                sent = await msg.edit_caption(caption=text, parse_mode=parse_mode, reply_markup=reply_markup)
+            else:
+                sent = await msg.edit_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                SAFE_EDIT.inc("not_modified")
+                UI.remember(msg, kind, text, reply_markup)
+                return msg
+            log.warning("edit failed, sending new message: %s", e)
+        except Exception:
+            pass
+        else:
+            SAFE_EDIT.inc("edited")
+            UI.remember(sent if hasattr(sent, "message_id") else msg, kind, text, reply_markup)
+            return sent
+        result = "fallback"
+    else:
+        result = "sent"  # подпись не влезет / править нечего: новое сообщение, старое остаётся как было
+    sent = await msg.reply_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+    SAFE_EDIT.inc(result)
+    UI.remember(sent, "text", text, reply_markup)  # под id нового сообщения, не того, по которому нажали
+    return sent
+
+async def send_menu(bot, chat_id):
+    msg = await bot.send_message(chat_id, MENU_TEXT, reply_markup=MENU_KB)
+    UI.remember(msg, "text", MENU_TEXT, MENU_KB)
+    return msg
 
 # ─────────── Экраны ───────────
 async def start(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
+    EVENTS.emit(update.effective_user.id, "start")
+    # у приветствия нет inline-кнопок → старую reply-клавиатуру снимаем им же, без отдельного сообщения
+    remove_kb = ReplyKeyboardRemove() if UI.needs_kb_removal(chat_id) else None
+    welcome = VIEW.catalog.text("welcome")
     try:
-        await ctx.bot.send_message(chat_id, " ", reply_markup=ReplyKeyboardRemove())
-    except Exception:
-        pass
-
-    try:
-        with open(WELCOME_PHOTO, "rb") as f:
-            await ctx.bot.send_photo(chat_id, photo=f, caption=WELCOME_TEXT, parse_mode=ParseMode.HTML)
+        await MEDIA.send(WELCOME_PHOTO, "photo", lambda photo: ctx.bot.send_photo(
+            chat_id, photo=photo, caption=welcome, parse_mode=ParseMode.HTML, reply_markup=remove_kb))
     except Exception as e:
         log.warning("WELCOME_PHOTO send failed: %s", e)
-        await ctx.bot.send_message(chat_id, WELCOME_TEXT, parse_mode=ParseMode.HTML)
+        await ctx.bot.send_message(chat_id, welcome, parse_mode=ParseMode.HTML, reply_markup=remove_kb)
+    if remove_kb is not None:
+        UI.mark_kb_removed(chat_id)
 
-    await ctx.bot.send_message(chat_id, "Выбирай раздел 👇", reply_markup=menu_inline_kb())
+    await send_menu(ctx.bot, chat_id)
 
 async def hidekeyboard(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Клавиатура скрыта.", reply_markup=ReplyKeyboardRemove())
+    UI.mark_kb_removed(update.effective_chat.id)
 
 async def callbacks(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     await q.answer()
     data = q.data or ""
 
-    if data == "nav:menu":
-        try:
-            await q.message.edit_text("Выбирай раздел 👇", reply_markup=menu_inline_kb())
-        except Exception:
-            await q.message.reply_text("Выбирай раздел 👇", reply_markup=menu_inline_kb())
+    key = data
+    route = ROUTES.get(data)
+    if route is None:
+        head, sep, _ = data.partition(":")
+        key = head + sep
+        route = PREFIX_ROUTES.get(key)
+    if route is not None:
+        event = SCREEN_EVENTS.get(key)
+        if event is not None:
+            EVENTS.emit(q.from_user.id, event)
+        with CALLBACK_SECONDS.time(key):  # метка — ключ маршрута, а не сырые данные: число серий ограничено
+            await route(update, ctx)
+
+async def show_menu(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+    q = update.callback_query
+    if UI.kind(q.message) == "photo":
+        # «Назад» под фото (QR): фото оставляем, меню — новым сообщением
+        await send_menu(ctx.bot, q.message.chat_id)
         return
+    await safe_edit(q, MENU_TEXT, reply_markup=MENU_KB, parse_mode=None)
 
-    if data == "nav:mentorship":
-        await safe_edit(q, MENTORSHIP_TEXT, reply_markup=InlineKeyboardMarkup([
-            [InlineKeyboardButton("✅ Оставить заявку", callback_data="req:mentorship")],
-            [InlineKeyboardButton("🧭 Записаться на диагностику", url=DIAGNOSTIC_URL)],
-            [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-        ])); return
-
-    if data == "nav:consultation":
-        await safe_edit(q, CONSULTATION_TEXT, reply_markup=InlineKeyboardMarkup([
-            [InlineKeyboardButton("✅ Оставить заявку", callback_data="req:consultation")],
-            [InlineKeyboardButton("🧭 Записаться на диагностику", url=DIAGNOSTIC_URL)],
-            [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-        ])); return
-
-    if data == "nav:guides":
-        await safe_edit(q, GUIDES_HEADER, reply_markup=guides_kb()); return
-
-    if data == "nav:qod":
-        await send_qod_entry(update, ctx, edit=True); return
-
-    if data == "nav:reviews":
-        await safe_edit(q, "Отзывы:", reply_markup=reviews_kb()); return
-
-    if data == "nav:support":
-        await send_support(update, ctx, via_callback=True); return
-
-    if data == "nav:contact":
-        await safe_edit(q, "Связаться со мной:", reply_markup=contact_kb()); return
-
-    if data == "nav:diagnostics":
-        await safe_edit(q, DIAG_TEXT, reply_markup=diagnostics_kb()); return
-
-    if data == "req:mentorship":
-        await safe_edit(q, "Оставить заявку на наставничество — напиши мне в личку:", reply_markup=contact_kb()); return
-    if data == "req:consultation":
-        await safe_edit(q, "Оставить заявку на консультацию — напиши мне в личку:", reply_markup=contact_kb()); return
-
-    if data.startswith("guide:"):
-        await handle_guide(update, ctx); return
-    if data.startswith("qod:"):
-        await qod_callbacks(update, ctx); return
+def screen_route(key: str):
+    async def show(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+        screen = VIEW.screens[key]  # текущая версия каталога
+        await safe_edit(update.callback_query, screen.text, reply_markup=screen.markup)
+    return show
 
 # ─────────── Поддержать / QR ───────────
 async def send_support(update: Update, ctx: ContextTypes.DEFAULT_TYPE, via_callback: bool = False):
@@ -330,9 +590,8 @@ async def send_support(update: Update, ctx: ContextTypes.DEFAULT_TYPE, via_callb
         "Благодарю за вклад — он помогает делать больше ценного контента 🙌"
     )
     try:
-        with open(QR_PHOTO, "rb") as f:
-            await ctx.bot.send_photo(chat_id, photo=f, caption=caption,
-                                     parse_mode=ParseMode.HTML, reply_markup=support_kb())
+        await MEDIA.send(QR_PHOTO, "photo", lambda photo: ctx.bot.send_photo(
+            chat_id, photo=photo, caption=caption, parse_mode=ParseMode.HTML, reply_markup=SUPPORT_KB))
         if via_callback:
             try:
                 await update.callback_query.message.delete()
@@ -343,60 +602,91 @@ async def send_support(update: Update, ctx: ContextTypes.DEFAULT_TYPE, via_callb
         log.warning("QR send failed: %s", e)
 
     if via_callback:
-        await safe_edit(update.callback_query, caption, reply_markup=support_kb())
+        await safe_edit(update.callback_query, caption, reply_markup=SUPPORT_KB)
     else:
-        await ctx.bot.send_message(chat_id, caption, parse_mode=ParseMode.HTML, reply_markup=support_kb())
+        await ctx.bot.send_message(chat_id, caption, parse_mode=ParseMode.HTML, reply_markup=SUPPORT_KB)
 
 # ─────────── Гайды ───────────
 async def handle_guide(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     uid = q.from_user.id
 
-    if uid in USER_GUIDE_RECEIVED:
-        await safe_edit(q,
-            "Кажется, ты уже получил свой гайд. Закрой текущий цикл — и приходи за следующим.",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("← Назад", callback_data="nav:menu")]]))
+    if uid in GUIDE_DELIVERY:
+        await safe_edit(q, GUIDE_RECEIVED_TEXT, reply_markup=BACK_KB)
         return
 
-    key = (q.data or "").split(":", 1)[1]
-    filename = GUIDE_FILES.get(key)
-    if not filename:
+    guide = GUIDES.current.get((q.data or "").split(":", 1)[1])
+    if guide is None:  # кнопка из старого меню, гайд уже убрали из папки
         await safe_edit(q, "Файл не найден.",
-                        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("← Назад", callback_data="nav:menu")]]))
+                        reply_markup=BACK_KB)
+        return
+    filename = guide.path
+    if filename in MISSING_ASSETS:
+        await safe_edit(q, GUIDE_MISSING_TEXT, reply_markup=BACK_KB)
         return
 
-    allow = True
-    try:
-        channel = CHANNEL_ID or CHANNEL_USERNAME
-        member = await ctx.bot.get_chat_member(chat_id=channel, user_id=uid)
-        status = getattr(member, "status", "left")
-        allow = status in ("member", "administrator", "creator")
-    except Exception as e:
-        log.warning("Channel check failed: %s", e)
+    async def fetch_status():
+        member = await ctx.bot.get_chat_member(chat_id=CHANNEL_ID or CHANNEL_USERNAME, user_id=uid)
+        return getattr(member, "status", "left")
 
-    if not allow:
-        await safe_edit(q, "Подпишись на канал, и доступ к гайдам откроется 👍",
-                        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("← Назад", callback_data="nav:menu")]]))
-        return
+    async def deliver() -> bool:
+        allow = True
+        try:
+            allow = await MEMBERSHIP.is_member(uid, fetch_status)
+        except Exception as e:
+            log.warning("Channel check failed: %s", e)
 
-    try:
-        with open(filename, "rb") as f:
-            await q.message.reply_document(
-                InputFile(f, filename=filename),
+        if not allow:
+            EVENTS.emit(uid, "guide_locked", guide.title)
+            await safe_edit(q, "Подпишись на канал, и доступ к гайдам откроется 👍",
+                            reply_markup=BACK_KB)
+            return False
+
+        try:
+            await MEDIA.send(filename, "document", lambda document: q.message.reply_document(
+                document,
                 caption="Держи! Пусть зайдёт в работу сегодня.",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("← Назад", callback_data="nav:menu")]])
-            )
-        USER_GUIDE_RECEIVED.add(uid)
-    except FileNotFoundError:
-        await safe_edit(q, "PDF пока недоступен на сервере — проверь, что файл лежит рядом с ботом.",
-                        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("← Назад", callback_data="nav:menu")]]))
+                reply_markup=BACK_KB
+            ))
+        except FileNotFoundError:  # файл пропал уже после проверки на старте
+            MISSING_ASSETS.add(filename)
+            await safe_edit(q, GUIDE_MISSING_TEXT, reply_markup=BACK_KB)
+            return False
+        EVENTS.emit(uid, "guide_download", guide.title)
+        return True
+
+    # Одновременные нажатия делят одну выдачу: PDF уходит один раз, остальные ждут её итога
+    if await GUIDE_DELIVERY.run(uid, deliver) == DONE:
+        await safe_edit(q, GUIDE_RECEIVED_TEXT, reply_markup=BACK_KB)
+
+# ─────────── Заявки ───────────
+# Текст заявки — следующим сообщением (message_router); админу — через outbox, пользователю — «Принял» сразу
+APPLICATION_SECTIONS = {"req:mentorship": "Наставничество", "req:consultation": "Консультация"}
+
+async def request_application(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+    q = update.callback_query
+    USER_STATE[q.from_user.id] = {"stage": "await_application", "section": APPLICATION_SECTIONS[q.data]}
+    await safe_edit(q, VIEW.catalog.text("req_form"), reply_markup=CONTACT_KB)
+
+async def submit_application(update: Update, section: str):
+    u = update.effective_user
+    try:
+        await OUTBOX.put(ADMIN_ID, application_text(section, u.id, u.username, update.message.text))
+    except OSError as e:  # не сохранили — не делаем вид, что приняли
+        log.error("application from %s not saved: %s", u.id, e)
+        await update.message.reply_text("Не получилось сохранить заявку 😔 Напиши мне напрямую:",
+                                        reply_markup=CONTACT_KB)
+        return
+    EVENTS.emit(u.id, "application_sent", section)
+    await update.message.reply_text("Принял 🙌 Отвечу в личке в ближайшее время.", reply_markup=BACK_KB)
+
+async def send_to_admin(bot, chat_id, text):
+    with bulk_lane():  # админу не к спеху — живые нажатия вперёд
+        await bot.send_message(chat_id, text)
 
 # ─────────── ВОПРОС ДНЯ 2.0 ───────────
 async def send_qod_entry(update: Update, ctx: ContextTypes.DEFAULT_TYPE, edit: bool = False):
-    kb = InlineKeyboardMarkup([
-        [InlineKeyboardButton("Ответить сейчас", callback_data="qod:start")],
-        [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-    ])
+    kb = QOD_ENTRY_KB
     text = ("<b>Вопрос дня</b>\n"
             "Маленький шаг сегодня — большой сдвиг за месяц. "
             "Отвечай честно для себя: займёт 30–60 секунд. (Есть и свободный ответ.)")
@@ -405,119 +695,350 @@ async def send_qod_entry(update: Update, ctx: ContextTypes.DEFAULT_TYPE, edit: b
     else:
         await ctx.bot.send_message(update.effective_chat.id, text, parse_mode=ParseMode.HTML, reply_markup=kb)
 
+def _today_question() -> str:
+    question = VIEW.catalog.question()
+    return question[0] if question else ""
+
+def _answer_footer(summary: dict) -> str:
+    """«Так же ответили N%» (если передан вариант) + серия дней подряд."""
+    lines = []
+    if summary["choice"] is not None:
+        if summary["others"]:
+            lines.append(f"Так же ответили {summary['percent']}% остальных ({summary['same']} из {summary['others']}).")
+        else:
+            lines.append("Это первый ответ на этот вопрос ✨")
+    if summary["streak"] > 1:
+        lines.append(f"🔥 {summary['streak']} дн. подряд")
+    return "\n".join(lines)
+
 async def qod_callbacks(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     data = q.data or ""
     uid = q.from_user.id
 
     if data == "qod:start":
+        EVENTS.emit(uid, "qod_start")
         USER_STATE[uid] = {"stage": "choose_mode"}
-        kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("Выбрать из вариантов", callback_data="qod:variants")],
-            [InlineKeyboardButton("Свободный ответ", callback_data="qod:free")],
-            [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-        ])
-        await safe_edit(q, "Как ответишь?\n• выбери вариант;\n• или напиши свой свободный ответ.", reply_markup=kb); return
+        await safe_edit(q, "Как ответишь?\n• выбери вариант;\n• или напиши свой свободный ответ.",
+                        reply_markup=QOD_MODE_KB); return
 
     if data == "qod:variants":
-        USER_STATE[uid] = {"stage": "variants"}
-        idx = datetime.now().weekday() % len(QUESTION_INTROS)
-        question, options = QUESTION_INTROS[idx]
-        USER_STATE[uid]["question"] = question
-        kb = InlineKeyboardMarkup([[InlineKeyboardButton(opt, callback_data=f"qod:pick:{opt}")] for opt in options] +
-                                  [[InlineKeyboardButton("← Назад", callback_data="nav:menu")]])
-        await safe_edit(q, question, reply_markup=kb); return
-
-    if data.startswith("qod:pick:"):
+        view = VIEW
+        idx = view.catalog.question_index()
+        if idx < 0:
+            await safe_edit(q, "Вопросы скоро появятся — загляни позже.", reply_markup=BACK_KB); return
+        question, _ = view.catalog.questions[idx]
+        EVENTS.emit(uid, "qod_variants")
+        USER_STATE[uid] = {"stage": "variants", "question": question}
+        await safe_edit(q, question, reply_markup=view.variants_kb[idx]); return
+
+    if data.startswith(PICK_PREFIX):
         choice = data.split(":", 2)[2]
+        EVENTS.emit(uid, "qod_answer", choice)
         st = USER_STATE.get(uid, {})
         st["choice"] = choice
         st["stage"] = "after_pick"
+        st.setdefault("question", _today_question())
         USER_STATE[uid] = st
-        kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("Добавить свободный комментарий", callback_data="qod:add_comment")],
-            [InlineKeyboardButton("Готово", callback_data="qod:done")],
-            [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-        ])
-        await safe_edit(q, f"Принято ✅\nСохрани для себя: {choice}.\nХочешь добавить пару слов?", reply_markup=kb); return
+        footer = _answer_footer(ANSWERS.record(uid, st["question"], choice=choice))
+        await safe_edit(q, f"Принято ✅\nСохрани для себя: {choice}.\n{footer}\n\nХочешь добавить пару слов?",
+                        reply_markup=QOD_AFTER_PICK_KB); return
+
+    if data == "qod:free":
+        question = _today_question()
+        if not question:
+            await safe_edit(q, "Вопросы скоро появятся — загляни позже.", reply_markup=BACK_KB); return
+        EVENTS.emit(uid, "qod_free")
+        USER_STATE[uid] = {"stage": "await_comment", "question": question}
+        await safe_edit(q, f"{question}\n\nНапиши свой ответ — 1–2 предложения.", reply_markup=BACK_KB); return
 
     if data == "qod:add_comment":
-        USER_STATE[uid]["stage"] = "await_comment"
+        EVENTS.emit(uid, "qod_add_comment")
+        st = USER_STATE.get(uid, {})
+        st["stage"] = "await_comment"
+        USER_STATE[uid] = st
         await safe_edit(q, "Напиши коротко (1–2 предложения). Что важного для тебя на сегодня?",
-                        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("← Назад", callback_data="nav:menu")]])); return
+                        reply_markup=BACK_KB); return
 
     if data == "qod:done":
-        await safe_edit(q, "Главное — маленький реальный шаг. Увидимся завтра ✌️",
-                        reply_markup=InlineKeyboardMarkup([
-                            [InlineKeyboardButton("Поставить напоминание на завтра", callback_data="qod:remind")],
-                            [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-                        ]))
+        EVENTS.emit(uid, "qod_done")
+        await safe_edit(q, "Главное — маленький реальный шаг. Увидимся завтра ✌️", reply_markup=QOD_REMIND_KB)
         USER_STATE.pop(uid, None); return
 
     if data == "qod:remind":
-        tz = pytz.timezone("Europe/Moscow")
-        job_name = f"qodremind_{uid}"
-        for job in ctx.job_queue.get_jobs_by_name(job_name):
-            job.schedule_removal()
-        ctx.job_queue.run_daily(qod_reminder, dtime(hour=9, minute=0, tzinfo=tz), name=job_name, data=uid)
-        await safe_edit(q, "Напомню завтра в 09:00. Можно отключить командой /stopremind.",
-                        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("← Назад", callback_data="nav:menu")]])); return
-
-async def qod_reminder(ctx: ContextTypes.DEFAULT_TYPE):
-    uid = ctx.job.data
-    kb = InlineKeyboardMarkup([[InlineKeyboardButton("Ответить сейчас", callback_data="qod:start")]])
-    await ctx.bot.send_message(uid, "Вопрос дня ✨", reply_markup=kb)
+        sub = REMINDERS.subscription(uid) or REMINDERS.subscribe(uid)
+        EVENTS.emit(uid, "daily_subscribe")
+        await safe_edit(q, f"Напомню в {sub['at']}. Можно отключить командой /stopremind.",
+                        reply_markup=BACK_KB); return
+
+# /answers — свои последние ответы
+async def answers_history(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    rows = await ANSWERS.history(uid, limit=10)
+    if not rows:
+        await update.message.reply_text("Ответов пока нет. Начни с «Вопроса дня» в меню.")
+        return
+    profile = ANSWERS.profile(uid)
+    lines = [f"<b>Твои ответы</b> (дней с ответом: {profile['days']}, серия: {profile['streak']}, "
+             f"лучшая: {profile['best']})"]
+    for r in rows:
+        answer = " — ".join(html.escape(x) for x in (r["choice"], r["comment"]) if x)
+        lines.append(f"\n<i>{r['day']}</i> {html.escape(r['question'])}\n{answer}")
+    await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+
+async def qod_reminder(bot, uid):
+    with bulk_lane():  # напоминания не должны задерживать живые нажатия
+        await bot.send_message(uid, "Вопрос дня ✨", reply_markup=QOD_REMINDER_KB)
 
 # ─────────── Обработчик текстов ───────────
 async def message_router(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     uid = update.effective_user.id if update.effective_user else None
     st = USER_STATE.get(uid or -1)
-    text = (update.message.text or "").strip() if update.message else ""
 
-    try:
-        await ctx.bot.send_message(chat_id, " ", reply_markup=ReplyKeyboardRemove())
-    except Exception:
-        pass
+    if UI.needs_kb_removal(chat_id):
+        # чат ещё со старой reply-клавиатурой (не было /start после перехода на inline) — снимаем один раз
+        try:
+            await ctx.bot.send_message(chat_id, "Меню обновилось 👇", reply_markup=ReplyKeyboardRemove())
+            UI.mark_kb_removed(chat_id)
+        except Exception as e:
+            log.warning("reply keyboard removal failed: %s", e)
+
+    if st and st.get("stage") == "await_application":
+        USER_STATE.pop(uid, None)
+        await submit_application(update, st.get("section") or "Не указано")
+        return
 
     if st and st.get("stage") == "await_comment":
         USER_STATE.pop(uid, None)
+        EVENTS.emit(uid, "qod_comment")
+        summary = ANSWERS.record(uid, st.get("question") or _today_question(),
+                                 comment=(update.message.text or "")[:ANSWER_MAX_LEN])
+        streak = f"\n🔥 {summary['streak']} дн. подряд" if summary["streak"] > 1 else ""
         await update.message.reply_text(
-            "Спасибо, записал ✅\nВозвращайся завтра — будет новый вопрос.",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("Поставить напоминание на завтра", callback_data="qod:remind")],
-                [InlineKeyboardButton("← Назад", callback_data="nav:menu")]
-            ])
+            f"Спасибо, записал ✅{streak}\nВозвращайся завтра — будет новый вопрос.",
+            reply_markup=QOD_REMIND_KB
         )
         return
 
-    if text in LEGACY_BUTTON_TEXTS:
-        await update.message.reply_text("Выбирай раздел 👇", reply_markup=menu_inline_kb())
-        return
+    await send_menu(ctx.bot, chat_id)
 
-    await update.message.reply_text("Выбирай раздел 👇", reply_markup=menu_inline_kb())
+# ─────────── Подписка на канал: обновление кэша ─────────
+def _is_our_channel(chat) -> bool:
+    if CHANNEL_ID and str(chat.id) == str(CHANNEL_ID):
+        return True
+    return bool(chat.username) and chat.username.lower() == CHANNEL_USERNAME.lstrip("@").lower()
+
+async def on_channel_member(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+    cm = update.chat_member
+    if not cm or not _is_our_channel(cm.chat):
+        return
+    MEMBERSHIP.update_status(cm.new_chat_member.user.id, cm.new_chat_member.status)
 
 # ─────────── Отключение напоминаний ─────────
 async def stopremind(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
-    uid = update.effective_user.id
-    job_name = f"qodremind_{uid}"
-    for job in ctx.job_queue.get_jobs_by_name(job_name):
-        job.schedule_removal()
+    REMINDERS.unsubscribe(update.effective_user.id)
+    EVENTS.emit(update.effective_user.id, "daily_unsubscribe")
     await update.message.reply_text("Напоминания отключены (если были).")
 
+# ─────────── /stats (только ADMIN_ID) ─────────
+STATS_USAGE = "Пример: /stats, /stats today, /stats 30, /stats all, /stats 2025-08-01 2025-08-31"
+FUNNEL_LABELS = {"start": "/start", "view": "открыл раздел", "goal": "гайд или заявка"}
+
+def _stats_text(r: dict) -> str:
+    span = "всё время" if r["from"] is None else (
+        str(r["from"]) if r["from"] == r["to"] else f"{r['from']} — {r['to']}")
+    lines = [f"<b>Статистика: {span}</b>", f"Пользователей: {r['users']} (новых {r['new_users']}), событий: {r['rows']}", ""]
+    if r["funnel"] and r["funnel"][0][1]:
+        top = r["funnel"][0][1]
+        lines.append("<b>Воронка</b>")
+        lines += [f"{FUNNEL_LABELS[step]}: {n} ({n * 100 // top}%)" for step, n in r["funnel"]]
+        lines.append("")
+    kept = [f"D{n}: {k * 100 // size}% из {size}" for n, (k, size) in r["retention"].items() if size]
+    if kept:
+        lines += ["<b>Удержание</b>", ", ".join(kept), ""]
+    if r["events"]:
+        lines.append("<b>События</b> (раз / пользователей)")
+        lines += [f"{html.escape(event)}: {n} / {users}" for event, (n, users) in r["events"].items()]
+    else:
+        lines.append("Событий за период нет.")
+    lines.append(f"\n<i>{r['ms']:.1f} мс</i>")
+    return "\n".join(lines)
+
+async def stats(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+    try:
+        start_day, end_day = parse_range(ctx.args or [], date.today())
+    except ValueError:
+        await update.message.reply_text(STATS_USAGE)
+        return
+    report = await asyncio.to_thread(ROLLUPS.report, start_day, end_day)
+    await update.message.reply_text(_stats_text(report), parse_mode=ParseMode.HTML)
+
+# /remind [ЧЧ:ММ] [Часовой/Пояс] — своё время и пояс для «Вопроса дня»
+async def remind(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+    args = ctx.args or []
+    at = next((a for a in args if ":" in a and "/" not in a), None)
+    tz = next((a for a in args if "/" in a or a.upper() == "UTC"), None)
+    try:
+        sub = REMINDERS.subscribe(update.effective_user.id, tz=tz, at=at)
+    except Exception:
+        await update.message.reply_text("Не понял. Пример: /remind 08:30 Europe/Moscow")
+        return
+    await update.message.reply_text(
+        f"Напомню в {sub['at']} ({sub['tz']}). Отключить — /stopremind.")
+
+# ─────────── Маршруты колбэков ───────────
+# Точные ключи → O(1) поиск в словаре; всё, что с параметром, — по префиксу до первого ":".
+ROUTES = {key: screen_route(key) for key in SCREEN_SPECS}
+ROUTES.update({
+    "nav:menu":    show_menu,
+    "nav:qod":     lambda update, ctx: send_qod_entry(update, ctx, edit=True),
+    "nav:support": lambda update, ctx: send_support(update, ctx, via_callback=True),
+})
+if ADMIN_ID:  # без ADMIN_ID заявку пересылать некому — остаётся экран «напиши мне в личку»
+    ROUTES.update(dict.fromkeys(APPLICATION_SECTIONS, request_application))
+PREFIX_ROUTES = {
+    "guide:": handle_guide,
+    "qod:":   qod_callbacks,
+}
+
+# Событие на показ экрана — словарь events.csv (utils.get_stats, bench/loadtest.py);
+# гайды и «Вопрос дня» пишут свои события сами (с деталями)
+SCREEN_EVENTS = {
+    "nav:menu":         "menu_view",
+    "nav:mentorship":   "mentoring_view",
+    "nav:consultation": "consultation_view",
+    "nav:guides":       "guides_view",
+    "nav:reviews":      "reviews_view",
+    "nav:contact":      "contact_view",
+    "nav:diagnostics":  "diagnostics_view",
+    "nav:support":      "donate_view",
+    "nav:qod":          "insight_view",
+    "req:mentorship":   "mentoring_request",
+    "req:consultation": "consultation_request",
+}
+
 # ─────────── MAIN ───────────
-def main():
-    keep_alive()
+async def check_assets():
+    """Один раз на старте: все ли медиа на месте — вместо FileNotFoundError в момент нажатия."""
+    problems = await asyncio.to_thread(ASSETS.validate)
+    for path, problem in problems.items():
+        log.error("asset %s: %s", path, problem)
+        if problem == "missing":
+            MISSING_ASSETS.add(path)
+    if not problems:
+        log.info("assets ok: %d files, %d KB%s", len(ASSETS.resolved), ASSETS.stats()["bytes"] // 1024,
+                 " (optimized build)" if ASSETS.entries else "")
+
+async def warm_up(app: Application):
+    """Всё, что не нужно первому апдейту, — фоном после старта (холодный старт на free-плане Render)."""
+    await check_assets()
+    with bulk_lane():  # догрузка медиа не обгоняет ответы живым пользователям
+        await MEDIA.warm(app.bot, MEDIA_ASSETS + [(g.path, "document") for g in GUIDES.current], chat_id=MEDIA_WARM_CHAT_ID or None)
+    if ADMIN_ID:  # первый /stats не дочитывает весь журнал
+        await asyncio.to_thread(ROLLUPS.refresh)
+
+async def post_init(app: Application):
+    await HTTP.start()  # в webhook/shard порт уже открыт в run_webhook — тогда no-op
+    if BOT_MODE == "polling" and PUBLIC_URL:
+        BACKGROUND_TASKS.append(asyncio.create_task(_self_ping_loop(PUBLIC_URL + "/health")))
+    await STORE.start()
+    await ANSWERS.start()
+    await OUTBOX.start(lambda chat_id, text: send_to_admin(app.bot, chat_id, text))
+    await EVENTS.start()
+    await REMINDERS.start(lambda uid: qod_reminder(app.bot, uid))
+    await CONTENT.start()
+    await GUIDES.start()
+    BACKGROUND_TASKS.append(asyncio.create_task(warm_up(app), name="warm-up"))
+
+async def post_shutdown(app: Application):
+    for task in BACKGROUND_TASKS:
+        task.cancel()
+    await asyncio.gather(*BACKGROUND_TASKS, return_exceptions=True)
+    BACKGROUND_TASKS.clear()
+    await HTTP.stop()
+    await REMINDERS.stop()
+    await CONTENT.stop()
+    await GUIDES.stop()
+    await EVENTS.close()
+    await ANSWERS.close()
+    await OUTBOX.stop()
+    await asyncio.to_thread(ROLLUPS.close)
+    await STORE.close()
+
+async def run_webhook(app: Application, register: bool = True):
+    """register=False — воркер shard.py: вебхук у Telegram держит приёмник, сюда апдейты шлёт он."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
 
-    app = Application.builder().token(BOT_TOKEN).build()
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("menu", start))
-    app.add_handler(CommandHandler("hide", hidekeyboard))
-    app.add_handler(CommandHandler("hidekeyboard", hidekeyboard))
-    app.add_handler(CommandHandler("stopremind", stopremind))
+    # Порт — до getMe и остального старта: апдейт, разбудивший сервис, принимается сразу
+    # и ждёт в update_queue, пока приложение не запустится
+    HTTP.route("POST", WEBHOOK_PATH, webhook_handler(app))
+    await HTTP.start()
+    await app.initialize()
+    await post_init(app)
+    try:
+        await app.start()
+        if register:  # вебхук у Telegram обычно уже стоит — перерегистрация не держит обработку
+            await app.bot.set_webhook(PUBLIC_URL + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET,
+                                      allowed_updates=Update.ALL_TYPES)
+        if register:
+            log.info("Bot started (inline menu, webhook %s%s).", PUBLIC_URL, WEBHOOK_PATH)
+        else:
+            log.info("Shard worker %s/%s started on 127.0.0.1:%s.", os.getenv("SHARD_INDEX", "0"),
+                     os.getenv("SHARD_COUNT", "1"), HTTP.port)
+        await stop.wait()
+    finally:
+        if app.running:
+            await app.stop()
+        await post_shutdown(app)
+        await app.shutdown()
+
+def build_app() -> Application:
+    builder = (Application.builder().token(BOT_TOKEN)
+               .application_class(CountingApplication)
+               .request(ScheduledRequest(OUTBOUND, pool="send", pool_size=API_POOL_SIZE, keepalive=API_KEEPALIVE,
+                                         keepalive_expiry=API_KEEPALIVE_EXPIRY, http2=API_HTTP2,
+                                         timeouts={"pool": API_POOL_TIMEOUT}))
+               .get_updates_request(TunedRequest(pool="poll", pool_size=API_POLL_POOL_SIZE,
+                                                 keepalive_expiry=API_KEEPALIVE_EXPIRY, http2=API_HTTP2,
+                                                 timeouts={"pool": API_POOL_TIMEOUT}))
+               .concurrent_updates(UPDATES)
+               .post_init(post_init).post_shutdown(post_shutdown))
+    if BOT_API_URL:
+        builder = builder.base_url(f"{BOT_API_URL}/bot").base_file_url(f"{BOT_API_URL}/file/bot")
+    app = builder.build()
+    app.add_handler(TypeHandler(Update, GUARD.check), group=-1)    # до хендлеров: повтор/флуд → стоп
+    app.add_handler(TypeHandler(Update, GUARD.release), group=1)   # после: окно повтора — от конца обработки
+    app.add_handler(CommandHandler("start", instrument("start", start)))
+    app.add_handler(CommandHandler("menu", instrument("menu", start)))
+    app.add_handler(CommandHandler("hide", instrument("hide", hidekeyboard)))
+    app.add_handler(CommandHandler("hidekeyboard", instrument("hide", hidekeyboard)))
+    app.add_handler(CommandHandler("stopremind", instrument("stopremind", stopremind)))
+    app.add_handler(CommandHandler("remind", instrument("remind", remind)))
+    app.add_handler(CommandHandler("answers", instrument("answers", answers_history)))
+    app.add_handler(CommandHandler("stats", instrument("stats", stats), filters=filters.User(user_id=ADMIN_ID)))
+
+    app.add_handler(CallbackQueryHandler(instrument("callbacks", callbacks)))
+    app.add_handler(ChatMemberHandler(instrument("chat_member", on_channel_member), ChatMemberHandler.CHAT_MEMBER))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, instrument("message_router", message_router)))
+    return app
 
-    app.add_handler(CallbackQueryHandler(callbacks))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_router))
+def main():
+    app = build_app()
+    if BOT_MODE == "shard":
+        asyncio.run(run_webhook(app, register=False))
+        return
+    if BOT_MODE == "webhook":
+        if not PUBLIC_URL:
+            raise RuntimeError("BOT_MODE=webhook, но не задан WEBHOOK_URL/BASE_URL (или RENDER_EXTERNAL_URL).")
+        asyncio.run(run_webhook(app))
+        return
 
     log.info("Bot started (inline menu + keep‑alive + self‑ping, polling).")
     app.run_polling(allowed_updates=Update.ALL_TYPES)
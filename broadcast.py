@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Рассылка по списку пользователей
+- Параллельно (N воркеров) под общим token bucket (~30 сообщений/с — лимит Telegram)
+- RetryAfter → пауза всего ведра и повтор того же пользователя
+- Заблокировавшие бота попадают в blocked.txt и дальше пропускаются
+- Прогресс пишется в <campaign>.done (append-only) → прерванная рассылка продолжается с места остановки
+- Живой отчёт: отправлено/осталось, сообщений в секунду, ETA
+
+Не зависит от библиотеки: send(uid) — любая корутина (aiogram или python-telegram-bot).
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+
+from ratelimit import TokenBucket
+
+# имена исключений aiogram 2 и python-telegram-bot, означающие «этому пользователю больше не писать»
+_GONE_ERRORS = {
+    "Forbidden", "Unauthorized", "BotBlocked", "BotKicked", "UserDeactivated",
+    "ChatNotFound", "CantInitiateConversation", "CantTalkWithBots",
+}
+
+
+def campaign_id_for(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _retry_after(err):
+    if type(err).__name__ != "RetryAfter":
+        return None
+    value = getattr(err, "retry_after", None) or getattr(err, "timeout", None)
+    return float(value) if value else 1.0
+
+
+def _is_gone(err) -> bool:
+    if any(cls.__name__ in _GONE_ERRORS for cls in type(err).__mro__):
+        return True
+    return "chat not found" in str(err).lower()
+
+
+def _read_ids(path: str) -> set:
+    ids = set()
+    if not os.path.exists(path):
+        return ids
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.lstrip("-").isdigit():
+                ids.add(int(line))
+    return ids
+
+
+@dataclass
+class BroadcastResult:
+    total: int = 0
+    sent: int = 0          # доставлено за эту кампанию (включая прошлые запуски)
+    skipped: int = 0       # уже были доставлены до возобновления
+    blocked: int = 0
+    failed: int = 0
+    retries: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return (self.sent - self.skipped) / self.elapsed if self.elapsed else 0.0
+
+
+class Broadcast:
+    def __init__(self, send, user_ids, campaign_id: str, state_dir: str = "broadcasts",
+                 rate: float = 30.0, concurrency: int = 16, max_attempts: int = 5,
+                 report_every: float = 5.0, report=print):
+        self._send = send
+        self.user_ids = list(dict.fromkeys(user_ids))
+        self.campaign_id = campaign_id
+        self.state_dir = state_dir
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.report_every = report_every
+        self._report = report
+        self._bucket = TokenBucket(rate, burst=rate)
+        self._done_path = os.path.join(state_dir, f"{campaign_id}.done")
+        self._blocked_path = os.path.join(state_dir, "blocked.txt")
+        self.result = BroadcastResult()
+
+    async def run(self) -> BroadcastResult:
+        os.makedirs(self.state_dir, exist_ok=True)
+        done = await asyncio.to_thread(_read_ids, self._done_path)
+        blocked = await asyncio.to_thread(_read_ids, self._blocked_path)
+        pending = [uid for uid in self.user_ids if uid not in done and uid not in blocked]
+
+        res = self.result
+        res.total = len(self.user_ids)
+        res.skipped = res.sent = len(done)
+        if done:
+            self._report(f"[broadcast {self.campaign_id}] resuming: {len(done)} already sent, {len(pending)} left")
+
+        queue = asyncio.Queue()
+        for uid in pending:
+            queue.put_nowait(uid)
+
+        started = time.monotonic()
+        # построчная буферизация: после падения потеряем максимум одну строку
+        with open(self._done_path, "a", encoding="utf-8", buffering=1) as done_f, \
+                open(self._blocked_path, "a", encoding="utf-8", buffering=1) as blocked_f:
+            workers = [asyncio.create_task(self._worker(queue, done_f, blocked_f))
+                       for _ in range(max(1, min(self.concurrency, len(pending))))]
+            reporter = asyncio.create_task(self._reporter(started, len(pending)))
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for w in workers:
+                    w.cancel()
+                reporter.cancel()
+        res.elapsed = time.monotonic() - started
+        self._report(f"[broadcast {self.campaign_id}] finished: sent {res.sent}/{res.total}, "
+                     f"blocked {res.blocked}, failed {res.failed}, retries {res.retries}, "
+                     f"{res.rate:.1f} msg/s, {res.elapsed:.1f}s")
+        return res
+
+    async def _worker(self, queue, done_f, blocked_f):
+        res = self.result
+        while True:
+            try:
+                uid = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            for attempt in range(self.max_attempts):
+                await self._bucket.acquire()
+                try:
+                    await self._send(uid)
+                except Exception as e:
+                    wait = _retry_after(e)
+                    if wait is not None and attempt + 1 < self.max_attempts:
+                        res.retries += 1
+                        self._bucket.pause(wait)
+                        continue
+                    if _is_gone(e):
+                        res.blocked += 1
+                        blocked_f.write(f"{uid}\n")
+                    else:
+                        res.failed += 1
+                        self._report(f"[broadcast] fail to {uid}: {e}")
+                    break
+                else:
+                    res.sent += 1
+                    done_f.write(f"{uid}\n")
+                    break
+
+    async def _reporter(self, started: float, pending: int):
+        res = self.result
+        while True:
+            await asyncio.sleep(self.report_every)
+            elapsed = time.monotonic() - started
+            progressed = res.sent - res.skipped + res.blocked + res.failed
+            rate = progressed / elapsed if elapsed else 0.0
+            left = max(0, pending - progressed)
+            eta = left / rate if rate else float("inf")
+            self._report(f"[broadcast {self.campaign_id}] {res.sent}/{res.total} sent, "
+                         f"{rate:.1f} msg/s, left {left}, ETA {eta:.0f}s")
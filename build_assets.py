@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Сборка медиа для отправки: из исходников в репо → облегчённые копии в dist/ + dist/manifest.json
+
+    python build_assets.py [--out dist] [--max-side 1280] [--jpeg-quality 85] [--pdf-dpi 150] [исходники...]
+
+- Фото (Pillow): не больше 1280 px по длинной стороне — это всё равно предел Telegram для photo,
+  JPEG progressive/optimize, PNG — optimize (QR остаётся PNG: чёткие края)
+- PDF (pikepdf + Pillow): картинки внутри пережимаются в JPEG и уменьшаются до --pdf-dpi на странице,
+  потоки пересжимаются, файл линеаризуется (первая страница открывается до конца загрузки)
+- PDF (fontTools): Word встраивает шрифты целиком (Times New Roman — 250–400 KB), в гайдах это основной вес;
+  остаются только нарисованные глифы, номера глифов те же → содержимое страниц не переписывается
+- Берётся меньший из вариантов: если оптимизация не выиграла, в dist/ кладётся копия исходника
+- Без Pillow/pikepdf/fontTools скрипт тоже работает — просто копирует (манифест и проверка на старте остаются)
+- Имена файлов сохраняются (dist/guide_self_acceptance.pdf) — пользователь видит то же имя документа
+- Манифест: sha256 и размер исходника и копии; bot.py берёт пути через asset_manifest.py
+"""
+
+import argparse
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+
+from asset_manifest import MANIFEST_VERSION, file_sha256
+
+try:
+    from PIL import Image
+except ImportError:  # необязательная зависимость
+    Image = None
+
+try:
+    import pikepdf
+except ImportError:  # необязательная зависимость
+    pikepdf = None
+
+try:
+    from fontTools import subset as ft_subset
+    from fontTools.ttLib import TTFont
+except ImportError:  # необязательная зависимость
+    ft_subset = TTFont = None
+else:
+    logging.getLogger("fontTools").setLevel(logging.ERROR)  # «meta NOT subset…» на каждую таблицу
+
+DEFAULT_SOURCES = ("assets/*.jpg", "assets/*.jpeg", "assets/*.png", "guide_*.pdf")
+PHOTO_EXT = (".jpg", ".jpeg", ".png")
+
+
+def default_sources() -> list:
+    found = []
+    for pattern in DEFAULT_SOURCES:
+        found.extend(sorted(glob.glob(pattern)))
+    return found
+
+
+# ─────────── фото ───────────
+def optimize_photo(src: str, max_side: int, quality: int):
+    """→ bytes или None (нет Pillow)."""
+    if Image is None:
+        return None
+    with Image.open(src) as im:
+        im.load()
+        fmt = (im.format or "").upper()
+        if max(im.size) > max_side:
+            im.thumbnail((max_side, max_side), Image.LANCZOS)
+        out = io.BytesIO()
+        if fmt == "PNG" or src.lower().endswith(".png"):
+            if im.mode not in ("1", "L", "P", "RGB", "RGBA", "LA"):
+                im = im.convert("RGBA")
+            im.save(out, "PNG", optimize=True)
+        else:
+            if im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            im.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+# ─────────── PDF ───────────
+def _downsample_pdf_images(pdf, dpi: int, quality: int) -> int:
+    """Картинки, которые больше нужного для dpi на странице, → JPEG нужного размера. → сколько пережато."""
+    if Image is None:
+        return 0
+    done = 0
+    seen = set()
+    for page in pdf.pages:
+        box = [float(v) for v in page.mediabox]
+        page_w, page_h = (box[2] - box[0]) / 72.0, (box[3] - box[1]) / 72.0  # дюймы
+        limit = int(max(page_w, page_h) * dpi)
+        for raw in page.get_images().values() if hasattr(page, "get_images") else page.images.values():
+            if raw.objgen in seen:
+                continue
+            seen.add(raw.objgen)
+            try:
+                pdfimage = pikepdf.PdfImage(raw)
+                if pdfimage.bits_per_component != 8 or "/SMask" in raw or "/Mask" in raw:
+                    continue  # прозрачность/маски оставляем как есть
+                im = pdfimage.as_pil_image()
+            except Exception:
+                continue
+            if im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            if max(im.size) > limit:
+                im.thumbnail((limit, limit), Image.LANCZOS)
+            out = io.BytesIO()
+            im.save(out, "JPEG", quality=quality, optimize=True)
+            data = out.getvalue()
+            if len(data) >= len(raw.read_raw_bytes()):
+                continue
+            raw.write(data, filter=pikepdf.Name.DCTDecode)
+            raw.Width, raw.Height = im.size
+            raw.ColorSpace = pikepdf.Name.DeviceGray if im.mode == "L" else pikepdf.Name.DeviceRGB
+            raw.BitsPerComponent = 8
+            for key in ("/DecodeParms", "/Decode"):
+                if key in raw:
+                    del raw[key]
+            done += 1
+    return done
+
+
+def _used_glyphs(pdf) -> dict:
+    """Какие глифы реально нарисованы: objgen потока FontFile2 → {gid}. Только Type0 + Identity-H
+    с CIDToGIDMap /Identity (так Word встраивает полные шрифты): код в строке = CID = GID."""
+    used = {}
+    shared = set()   # потоки шрифтов, на которые ссылаются и простые шрифты — не трогаем
+
+    def font_file(font):
+        if font.get("/Subtype") != "/Type0" or font.get("/Encoding") != "/Identity-H":
+            desc = font.get("/FontDescriptor")
+            if desc is not None and "/FontFile2" in desc:
+                shared.add(desc.FontFile2.objgen)
+            return None
+        cid = font.DescendantFonts[0]
+        if cid.get("/CIDToGIDMap", pikepdf.Name.Identity) != "/Identity":
+            return None
+        desc = cid.get("/FontDescriptor")
+        return desc.FontFile2 if desc is not None and "/FontFile2" in desc else None
+
+    def walk(content, resources, depth=0):
+        fonts = resources.get("/Font") or {}
+        current = None
+        for operands, op in pikepdf.parse_content_stream(content):
+            op = str(op)
+            if op == "Tf":
+                font = fonts.get(str(operands[0]))
+                stream = font_file(font) if font is not None else None
+                current = used.setdefault(stream.objgen, {0}) if stream is not None else None
+            elif current is not None and op in ("Tj", "'", '"', "TJ"):
+                for item in (operands[-1] if op == "TJ" else operands[-1:]):
+                    if isinstance(item, pikepdf.String):
+                        raw = bytes(item)
+                        current.update(int.from_bytes(raw[i:i + 2], "big") for i in range(0, len(raw) - 1, 2))
+        for _, xobj in (resources.get("/XObject") or {}).items():
+            if depth < 8 and xobj.get("/Subtype") == "/Form":
+                walk(xobj, xobj.get("/Resources") or resources, depth + 1)
+
+    for page in pdf.pages:
+        walk(page, page.get("/Resources") or {})
+    return {k: v for k, v in used.items() if k not in shared}
+
+
+def _subset_fonts(pdf) -> int:
+    """Полные встроенные TrueType → только использованные глифы (GID сохраняются, контент не меняется)."""
+    if ft_subset is None:
+        return 0
+    done = 0
+    by_objgen = {}   # поток FontFile2 → Type0-шрифты, которые его используют (для переименования)
+    for font in pdf.objects:
+        if not isinstance(font, pikepdf.Dictionary) or font.get("/Subtype") != "/Type0":
+            continue
+        desc = font.DescendantFonts[0].get("/FontDescriptor") if "/DescendantFonts" in font else None
+        if desc is not None and "/FontFile2" in desc:
+            by_objgen.setdefault(desc.FontFile2.objgen, []).append(font)
+    for objgen, gids in _used_glyphs(pdf).items():
+        stream = pdf.get_object(objgen)
+        try:
+            ttf = TTFont(io.BytesIO(stream.read_bytes()))
+            options = ft_subset.Options()
+            options.retain_gids = True
+            options.notdef_outline = True
+            options.name_IDs = ["*"]
+            options.drop_tables += ["GSUB", "GPOS", "GDEF", "DSIG", "kern", "morx"]
+            subsetter = ft_subset.Subsetter(options)
+            subsetter.populate(gids=sorted(gids))
+            subsetter.subset(ttf)
+            out = io.BytesIO()
+            ttf.save(out)
+        except Exception as e:
+            print(f"[assets]   font subsetting skipped: {e}")
+            continue
+        data = out.getvalue()
+        if len(data) >= int(stream.get("/Length1", len(data) + 1)):
+            continue
+        stream.write(data)
+        stream.Length1 = len(data)
+        tag = "".join(chr(65 + b % 26) for b in hashlib.sha256(data).digest()[:6]) + "+"
+        for font in by_objgen.get(objgen, []):  # подмножество помечается тегом в имени (ISO 32000, 9.6.4)
+            for d in (font, font.DescendantFonts[0]):
+                if not str(d.BaseFont).lstrip("/")[6:7] == "+":
+                    d.BaseFont = pikepdf.Name("/" + tag + str(d.BaseFont).lstrip("/"))
+            desc = font.DescendantFonts[0].FontDescriptor
+            if not str(desc.FontName).lstrip("/")[6:7] == "+":
+                desc.FontName = pikepdf.Name("/" + tag + str(desc.FontName).lstrip("/"))
+        done += 1
+    return done
+
+
+def optimize_pdf(src: str, dpi: int, quality: int):
+    """→ bytes или None (нет pikepdf)."""
+    if pikepdf is None:
+        return None
+    with pikepdf.open(src) as pdf:
+        _downsample_pdf_images(pdf, dpi, quality)
+        _subset_fonts(pdf)
+        pdf.remove_unreferenced_resources()
+        out = io.BytesIO()
+        pdf.save(out, compress_streams=True, recompress_flate=True, linearize=True,
+                 object_stream_mode=pikepdf.ObjectStreamMode.generate)
+        return out.getvalue()
+
+
+# ─────────── сборка ───────────
+def build(sources, out_dir: str = "dist", max_side: int = 1280, jpeg_quality: int = 85, pdf_dpi: int = 150) -> dict:
+    assets = {}
+    for src in sources:
+        src = os.path.normpath(src).replace(os.sep, "/")
+        kind = "photo" if src.lower().endswith(PHOTO_EXT) else "document"
+        target = os.path.join(out_dir, src).replace(os.sep, "/")
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        try:
+            data = (optimize_photo(src, max_side, jpeg_quality) if kind == "photo"
+                    else optimize_pdf(src, pdf_dpi, jpeg_quality))
+        except Exception as e:
+            print(f"[assets] {src}: optimization failed ({e}) — copying as is")
+            data = None
+        source_size = os.path.getsize(src)
+        optimized = data is not None and len(data) < source_size
+        tmp = target + ".tmp"
+        if optimized:
+            with open(tmp, "wb") as f:
+                f.write(data)
+        else:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, target)
+        assets[src] = {
+            "path": target, "kind": kind,
+            "sha256": file_sha256(target), "size": os.path.getsize(target),
+            "source_sha256": file_sha256(src), "source_size": source_size,
+            "optimized": optimized,
+        }
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "tools": {"pillow": getattr(sys.modules.get("PIL"), "__version__", None) if Image else None,
+                  "pikepdf": getattr(pikepdf, "__version__", None)},
+        "options": {"max_side": max_side, "jpeg_quality": jpeg_quality, "pdf_dpi": pdf_dpi},
+        "assets": assets,
+    }
+    path = os.path.join(out_dir, "manifest.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+    return manifest
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Облегчённые копии фото и PDF-гайдов + манифест")
+    ap.add_argument("sources", nargs="*", help=f"по умолчанию: {' '.join(DEFAULT_SOURCES)}")
+    ap.add_argument("--out", default="dist")
+    ap.add_argument("--max-side", type=int, default=1280)
+    ap.add_argument("--jpeg-quality", type=int, default=85)
+    ap.add_argument("--pdf-dpi", type=int, default=150)
+    args = ap.parse_args()
+    if Image is None:
+        print("[assets] Pillow не установлен — фото и картинки в PDF копируются как есть")
+    if pikepdf is None:
+        print("[assets] pikepdf не установлен — PDF копируются как есть")
+    elif ft_subset is None:
+        print("[assets] fontTools не установлен — шрифты в PDF остаются целиком")
+
+    manifest = build(args.sources or default_sources(), args.out, args.max_side, args.jpeg_quality, args.pdf_dpi)
+    before = after = 0
+    for src, e in manifest["assets"].items():
+        before += e["source_size"]
+        after += e["size"]
+        mark = "optimized" if e["optimized"] else "copied"
+        print(f"[assets] {src}: {e['source_size'] / 1024:.0f} KB → {e['size'] / 1024:.0f} KB ({mark})")
+    if before:
+        print(f"[assets] total {before / 1024:.0f} KB → {after / 1024:.0f} KB ({(after - before) / before:+.0%}), "
+              f"manifest {os.path.join(args.out, 'manifest.json')}")
+
+
+if __name__ == "__main__":
+    main()
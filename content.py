@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Каталог контента: инсайты, вопросы дня, тексты экранов
+- Файлы читаются один раз; перечитываются, только если изменился mtime (или размер)
+- Каждая загрузка собирает новый неизменяемый снимок Catalog и подменяет ссылку целиком
+  → хендлеры видят либо старый каталог, либо новый, но никогда — наполовину загруженный
+- Битый файл при перезагрузке не ломает бота: остаётся предыдущий снимок
+- Фоновая проверка stat'ит и читает файлы в потоке (asyncio.to_thread); снимок подменяется в event loop
+- insights.json: {"insights": [...]} или просто [...]; questions.json: {"questions": [...]} или [...],
+  вопрос — {"question": "...", "options": [...]} или ["вопрос", [варианты]] (вариант, не влезающий
+  в callback_data кнопки — 64 байта с префиксом, — делает файл битым); texts.json — {"ключ": "текст"}
+  поверх встроенных текстов
+- Ротация на день посчитана заранее: вопрос — по дню недели, инсайт — по порядковому номеру даты
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import date
+from types import MappingProxyType
+
+log = logging.getLogger("mindmeld_bot.content")
+
+PICK_PREFIX = "qod:pick:"  # callback_data кнопки варианта = префикс + текст варианта
+_CALLBACK_LIMIT = 64       # байт в callback_data у Telegram
+
+
+def _unwrap(data, key: str) -> list:
+    if isinstance(data, dict):
+        data = data.get(key)
+    if not isinstance(data, list):
+        raise ValueError(f"expected a list or {{\"{key}\": [...]}}")
+    return data
+
+
+def parse_insights(data) -> tuple:
+    items = tuple(x.strip() for x in _unwrap(data, "insights") if isinstance(x, str) and x.strip())
+    if not items:
+        raise ValueError("no insights")
+    return items
+
+
+def parse_questions(data) -> tuple:
+    out = []
+    for item in _unwrap(data, "questions"):
+        if isinstance(item, dict):
+            question, options = item.get("question"), item.get("options")
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            question, options = item
+        else:
+            raise ValueError(f"bad question entry: {item!r}")
+        if not isinstance(question, str) or not isinstance(options, list) or not options:
+            raise ValueError(f"bad question entry: {item!r}")
+        options = tuple(str(o) for o in options)
+        for option in options:
+            if len((PICK_PREFIX + option).encode()) > _CALLBACK_LIMIT:
+                raise ValueError(f"option too long for a button (callback_data > {_CALLBACK_LIMIT} bytes): {option!r}")
+        out.append((question, options))
+    if not out:
+        raise ValueError("no questions")
+    return tuple(out)
+
+
+def parse_texts(data) -> dict:
+    if not isinstance(data, dict):
+        raise ValueError("texts must be an object")
+    return {str(k): v for k, v in data.items() if isinstance(v, str)}
+
+
+class Catalog:
+    """Снимок контента. Не меняется после создания."""
+    __slots__ = ("insights", "questions", "texts", "version", "_by_weekday")
+
+    def __init__(self, insights=(), questions=(), texts=None, version: int = 0):
+        self.insights = tuple(insights)
+        self.questions = tuple(questions)
+        self.texts = MappingProxyType(dict(texts or {}))
+        self.version = version
+        n = len(self.questions)
+        self._by_weekday = tuple(wd % n for wd in range(7)) if n else ()
+
+    def question_index(self, day: date = None) -> int:
+        """Индекс вопроса дня (-1, если вопросов нет)."""
+        if not self._by_weekday:
+            return -1
+        return self._by_weekday[(day or date.today()).weekday()]
+
+    def question(self, day: date = None):
+        idx = self.question_index(day)
+        return self.questions[idx] if idx >= 0 else None
+
+    def insight(self, day: date = None):
+        if not self.insights:
+            return None
+        return self.insights[(day or date.today()).toordinal() % len(self.insights)]
+
+    def text(self, key: str, default: str = None) -> str:
+        return self.texts.get(key, default)
+
+
+_PARSERS = {"insights": parse_insights, "questions": parse_questions, "texts": parse_texts}
+
+
+class ContentCatalog:
+    def __init__(self, insights: str = "insights.json", questions: str = "questions.json",
+                 texts: str = "texts.json", defaults: dict = None, check_interval: float = 5.0):
+        self.paths = {"insights": insights, "questions": questions, "texts": texts}
+        self.defaults = {"insights": (), "questions": (), "texts": {}, **(defaults or {})}
+        self.check_interval = check_interval
+        self.current = Catalog()
+        self.reloads = 0
+        self.errors = 0
+        self._stamps = {}
+        self._values = {}
+        self._checked = 0.0
+        self._listeners = []
+        self._task = None
+        self.refresh(force=True)
+
+    def add_listener(self, fn):
+        """fn(catalog) — после каждой успешной подмены (например, пересобрать экраны/клавиатуры)."""
+        self._listeners.append(fn)
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def refresh(self, force: bool = False) -> bool:
+        """Проверить mtime (не чаще check_interval без force) и при изменениях собрать новый снимок."""
+        catalog = self._check(force)
+        return catalog is not None and self._publish(catalog)
+
+    def _check(self, force: bool):
+        """Новый снимок или None (без изменений); только чтение файлов — фоновая проверка зовёт из потока."""
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return None
+        self._checked = now
+        stamps = {kind: self._stamp(path) for kind, path in self.paths.items() if path}
+        changed = [kind for kind, stamp in stamps.items() if self._stamps.get(kind, False) != stamp]
+        if not changed:
+            return None
+        self._stamps = stamps  # битый файл не перечитываем, пока его снова не поправят
+        values = dict(self._values)
+        for kind in changed:
+            value = self._load(kind, stamps[kind])
+            if value is not None:
+                values[kind] = value
+        if values == self._values:
+            return None
+        self._values = values
+        d = self.defaults
+        return Catalog(values.get("insights", d["insights"]), values.get("questions", d["questions"]),
+                       {**d["texts"], **values.get("texts", {})},  # недостающие ключи — встроенные
+                       version=self.current.version + 1)
+
+    def _publish(self, catalog: Catalog) -> bool:
+        self.current = catalog
+        self.reloads += 1
+        for fn in self._listeners:
+            fn(self.current)
+        return True
+
+    def _load(self, kind: str, stamp):
+        path = self.paths[kind]
+        if stamp is None:
+            return self.defaults[kind]  # файла нет — значения по умолчанию
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return _PARSERS[kind](json.load(f))
+        except Exception as e:
+            self.errors += 1
+            log.warning("content: %s not loaded, keeping previous version: %s", path, e)
+            return None
+
+    # ─────────── фоновая проверка ───────────
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                catalog = await asyncio.to_thread(self._check, True)
+                if catalog is not None:
+                    self._publish(catalog)
+            except Exception as e:
+                log.warning("content refresh failed: %s", e)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._watch(), name="content-watch")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        cat = self.current
+        return {"version": cat.version, "insights": len(cat.insights), "questions": len(cat.questions),
+                "texts": len(cat.texts), "reloads": self.reloads, "errors": self.errors}
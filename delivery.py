@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Выдача «один раз на пользователя» (гайд) по протоколу claim → commit / rollback
+- claim(uid) без await между проверкой и записью: из одновременных запросов одного пользователя
+  слот получает ровно один, остальные присоединяются к его результату (single-flight)
+- commit — отметка в постоянном наборе (USER_GUIDE_RECEIVED) и результат присоединившимся;
+  rollback — слот освобождается без отметки (не подписан, файла нет, загрузка упала),
+  следующее нажатие попробует заново
+- Апдейты пользователя и так идут по очереди (update_processor.py), но протокол не полагается
+  на порядок: хендлер, вызванный в обход очереди, тоже не отправит второй PDF
+"""
+
+import asyncio
+import logging
+from collections.abc import MutableSet
+
+log = logging.getLogger("mindmeld_bot.delivery")
+
+DONE = "done"        # уже выдано раньше — ни загрузки, ни проверки подписки
+SENT = "sent"        # выдано этим вызовом
+JOINED = "joined"    # выдал параллельный запрос, к результату которого присоединились
+FAILED = "failed"    # запрос-владелец не выдал (rollback) — можно нажать ещё раз
+
+
+class DeliveryClaims:
+    def __init__(self, done: MutableSet):
+        self.done = done      # постоянный набор получивших (commit пишет сюда)
+        self._inflight = {}   # uid → asyncio.Future (True — commit, False — rollback)
+        self.sent = 0
+        self.joined = 0
+        self.rollbacks = 0
+
+    def claim(self, uid):
+        """None — слот наш (дальше commit или rollback); Future — выдача уже идёт;
+        DONE — уже выдано."""
+        if uid in self.done:
+            return DONE
+        fut = self._inflight.get(uid)
+        if fut is not None:
+            self.joined += 1
+            return fut
+        self._inflight[uid] = asyncio.get_running_loop().create_future()
+        return None
+
+    def commit(self, uid):
+        self.done.add(uid)
+        self.sent += 1
+        self._resolve(uid, True)
+
+    def rollback(self, uid):
+        self.rollbacks += 1
+        self._resolve(uid, False)
+
+    def _resolve(self, uid, delivered: bool):
+        fut = self._inflight.pop(uid, None)
+        if fut is not None and not fut.done():
+            fut.set_result(delivered)
+
+    async def run(self, uid, deliver) -> str:
+        """deliver() — корутина выдачи, True — выдано (commit), False — нет (rollback).
+        Исключение и отмена — тоже rollback, исключение пробрасывается владельцу слота."""
+        claimed = self.claim(uid)
+        if claimed == DONE:
+            return DONE
+        if claimed is not None:
+            return JOINED if await asyncio.shield(claimed) else FAILED
+        delivered = False
+        try:
+            delivered = await deliver()
+        finally:
+            if delivered:
+                self.commit(uid)
+            else:
+                self.rollback(uid)
+        return SENT if delivered else FAILED
+
+    def __contains__(self, uid):
+        return uid in self.done
+
+    def stats(self) -> dict:
+        return {"inflight": len(self._inflight), "sent": self.sent, "joined": self.joined,
+                "rollbacks": self.rollbacks}
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Журнал событий (events.csv) + инкрементальный индекс
+- Журнал ротируется по дням: events-YYYY-MM-DD.csv рядом с исходным events.csv
+  (старый events.csv остаётся частью журнала и тоже индексируется)
+- Индекс (events.idx.json) хранит байтовое смещение по каждому файлу, множество user_id
+  и счётчики событий → refresh() читает только дописанные строки: O(новых строк), а не O(истории)
+- Битые строки пропускаются и считаются (bad_rows), незавершённая последняя строка ждёт следующего refresh()
+- Прошедший день «запечатывается» (файл больше не читается) только через seal_after после полуночи —
+  EventWriter дописывает вчерашние строки с задержкой flush_interval (и дольше — при повторах после сбоя);
+  печать хранит размер файла и проверяется им: файл вырос — печать снимается, хвост дочитывается
+- Запись из бота (EventWriter): emit() — только append в кольцевую очередь в памяти; фоновая задача
+  сбрасывает пачки по размеру или раз в flush_interval, сам диск — в отдельном потоке (+ fsync по желанию)
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+from datetime import date, datetime, time as dtime, timedelta
+
+HEADER = ["timestamp", "user_id", "event", "details"]
+
+log = logging.getLogger("mindmeld_bot.events")
+
+SEAL_AFTER = 3600.0  # с после полуночи, раньше вчерашний файл не запечатываем (>> flush_interval)
+
+
+def _csv_bytes(rows) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+_HEADER_BYTES = _csv_bytes([HEADER])
+
+
+class EventLog:
+    def __init__(self, path: str = "events.csv"):
+        self.path = path
+        self.dir = os.path.dirname(os.path.abspath(path))
+        self.stem, self.ext = os.path.splitext(os.path.basename(path))
+        self._day_re = re.compile(rf"^{re.escape(self.stem)}-(\d{{4}}-\d{{2}}-\d{{2}}){re.escape(self.ext)}$")
+
+    def day_path(self, day: date) -> str:
+        return os.path.join(self.dir, f"{self.stem}-{day.isoformat()}{self.ext}")
+
+    def day_of(self, name: str):
+        """Дата из имени ротированного файла (None — для исходного events.csv)."""
+        m = self._day_re.match(name)
+        return date.fromisoformat(m.group(1)) if m else None
+
+    def files(self) -> list:
+        """Имена файлов журнала по порядку: исходный events.csv, затем дни."""
+        names = []
+        if os.path.exists(self.path):
+            names.append(os.path.basename(self.path))
+        try:
+            rolled = sorted(n for n in os.listdir(self.dir) if self._day_re.match(n))
+        except OSError:
+            rolled = []
+        return names + rolled
+
+    def append_rows(self, rows, day: date = None, fsync: bool = False):
+        """rows — [(timestamp, user_id, event, details)] → в файл нужного дня (с заголовком для нового).
+        Пачка уходит одним write() в O_APPEND: строки процессов-шардов, пишущих в тот же день, не перемешиваются."""
+        path = self.day_path(day or date.today())
+        data = _csv_bytes(rows)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL, 0o644)
+            data = _HEADER_BYTES + data  # заголовок пишет только создавший файл
+        except FileExistsError:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            if fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def append(self, user_id, event: str, details: str = ""):
+        now = datetime.now()
+        self.append_rows([(now.isoformat(), user_id, event, details)], now.date())
+
+
+class EventWriter:
+    """Журнал событий для асинхронных хендлеров: emit() не ждёт диска никогда.
+    Очередь ограничена (capacity): если диск недоступен дольше, чем она успевает заполниться,
+    теряются самые старые события (счётчик dropped), а не память процесса."""
+
+    def __init__(self, log: EventLog, flush_interval: float = 1.0, max_batch: int = 500,
+                 capacity: int = 100_000, fsync: bool = False):
+        self.log = log
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self._queue = deque(maxlen=capacity)  # (datetime, user_id, event, details)
+        self._wakeup = None
+        self._task = None
+        self._flush_lock = None
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failures = 0
+
+    def emit(self, user_id, event: str, details: str = ""):
+        queue = self._queue
+        if len(queue) == queue.maxlen:
+            self.dropped += 1
+        queue.append((datetime.now(), user_id, event, details))
+        self.emitted += 1
+        if self._wakeup is not None and len(queue) >= self.max_batch:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._flusher(), name="events-flusher")
+
+    async def _flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                log.warning("events flush failed (will retry): %s", e)
+
+    def _write(self, day: date, batch):
+        rows = [(ts.isoformat(), uid, event, details) for ts, uid, event, details in batch]
+        self.log.append_rows(rows, day, fsync=self.fsync)
+
+    async def flush(self):
+        if not self._queue:
+            return
+        async with self._flush_lock or asyncio.Lock():
+            batch = list(self._queue)
+            self._queue.clear()
+            by_day = {}  # пачка через полночь — в два файла
+            for item in batch:
+                by_day.setdefault(item[0].date(), []).append(item)
+            for day in sorted(by_day):
+                try:
+                    await asyncio.to_thread(self._write, day, by_day[day])
+                except Exception:
+                    self.failures += 1
+                    self._requeue([item for d in sorted(by_day) if d >= day for item in by_day[d]])
+                    raise
+                self.written += len(by_day[day])
+            self.flushes += 1
+
+    def _requeue(self, items):
+        """Несохранённое — обратно в голову очереди; не влезает — отбрасываются самые старые."""
+        queue = self._queue
+        room = queue.maxlen - len(queue)
+        if len(items) > room:
+            self.dropped += len(items) - room
+            items = items[len(items) - room:]
+        queue.extendleft(reversed(items))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            log.error("events lost on shutdown: %d (%s)", len(self._queue), e)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._queue), "emitted": self.emitted, "written": self.written,
+                "dropped": self.dropped, "flushes": self.flushes, "failures": self.failures}
+
+
+def open_event_writer() -> EventWriter:
+    return EventWriter(EventLog(os.getenv("EVENTS_FILE", "events.csv").strip()),
+                       flush_interval=float(os.getenv("EVENTS_FLUSH_INTERVAL", "1.0")),
+                       capacity=int(os.getenv("EVENTS_QUEUE", "100000")),
+                       fsync=os.getenv("EVENTS_FSYNC", "0").strip().lower() in ("1", "true", "yes"))
+
+
+def parse_row(row):
+    """(timestamp, user_id, event, details) или None для битой строки."""
+    if len(row) < 3:
+        return None
+    try:
+        uid = int(row[1])
+    except (TypeError, ValueError):
+        return None
+    event = row[2].strip()
+    if not event:
+        return None
+    return row[0], uid, event, row[3] if len(row) > 3 else ""
+
+
+class EventIndex:
+    VERSION = 1
+
+    def __init__(self, log: EventLog, sidecar: str = None, seal_after: float = SEAL_AFTER):
+        self.log = log
+        self.seal_after = seal_after
+        self.sidecar = sidecar or os.path.join(log.dir, f"{log.stem}.idx.json")
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.offsets = {}      # имя файла → байтовое смещение
+        self.sealed = {}       # прошедшие дни, дочитанные до конца: имя → размер (только stat, без чтения)
+        self.users = set()
+        self.counts = {}
+        self.rows = 0
+        self.bad_rows = 0
+
+    def _load(self):
+        if not os.path.exists(self.sidecar):
+            return
+        try:
+            with open(self.sidecar, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != self.VERSION:
+                return
+            self.offsets = {k: int(v) for k, v in data["offsets"].items()}
+            self.sealed = self.load_sealed(data.get("sealed"))
+            self.users = set(data["users"])
+            self.counts = dict(data["counts"])
+            self.rows = int(data.get("rows", 0))
+            self.bad_rows = int(data.get("bad_rows", 0))
+        except Exception as e:
+            log.warning("event index unreadable, rebuilding: %s", e)
+            self._reset()
+
+    def _save(self):
+        data = {
+            "version": self.VERSION, "offsets": self.offsets, "sealed": self.sealed,
+            "users": sorted(self.users), "counts": self.counts,
+            "rows": self.rows, "bad_rows": self.bad_rows,
+        }
+        tmp = self.sidecar + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.sidecar)
+
+    @staticmethod
+    def load_sealed(data) -> dict:
+        """Печати из sidecar; старый формат (список имён, без размеров) не проверить — запечатаем заново."""
+        return {k: int(v) for k, v in data.items()} if isinstance(data, dict) else {}
+
+    def _sealable(self, day: date, now: datetime) -> bool:
+        return now >= datetime.combine(day + timedelta(days=1), dtime.min) + timedelta(seconds=self.seal_after)
+
+    def add_listener(self, fn):
+        """fn(rows) — получает каждую новую пачку распарсенных строк (для производных агрегатов)."""
+        self._listeners.append(fn)
+
+    def refresh(self) -> int:
+        """Дочитать новые строки во всех файлах журнала. Возвращает число новых строк."""
+        with self._lock:
+            new_rows = self._scan()
+            if new_rows is None:
+                # файл обрезали/подменили — счётчики уже не вычесть, пересобираем с нуля
+                self._reset()
+                new_rows = self._scan() or []
+        if new_rows:
+            for fn in self._listeners:
+                fn(new_rows)
+        return len(new_rows)
+
+    def _scan(self):
+        now = datetime.now()
+        new_rows = []
+        changed = False
+        for name in self.log.files():
+            path = os.path.join(self.log.dir, name)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            sealed = self.sealed.get(name)
+            if sealed == size:
+                continue
+            if sealed is not None:
+                log.warning("events: %s grew after it was sealed (%d → %d bytes), reading the tail", name, sealed, size)
+                del self.sealed[name]
+                changed = True
+            offset = self.offsets.get(name, 0)
+            if size < offset:
+                return None
+            if size > offset:
+                consumed = self._ingest(path, offset, new_rows)
+                if consumed:
+                    self.offsets[name] = offset + consumed
+                    changed = True
+            day = self.log.day_of(name)
+            if day is not None and self.offsets.get(name, 0) == size and self._sealable(day, now):
+                self.sealed[name] = size
+                changed = True
+        if changed:
+            self._save()
+        return new_rows
+
+    def _ingest(self, path: str, offset: int, out: list) -> int:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            return 0  # строка ещё дописывается
+        chunk = chunk[:end + 1]
+        text = chunk.decode("utf-8", errors="replace")
+        first = offset == 0
+        for row in csv.reader(io.StringIO(text)):
+            if not row:
+                continue
+            if first:
+                first = False
+                if row[:2] == HEADER[:2]:
+                    continue
+            parsed = parse_row(row)
+            if parsed is None:
+                self.bad_rows += 1
+                continue
+            _, uid, event, _ = parsed
+            self.users.add(uid)
+            self.counts[event] = self.counts.get(event, 0) + 1
+            self.rows += 1
+            out.append(parsed)
+        return len(chunk)
+
+    def user_ids(self) -> list:
+        return sorted(self.users)
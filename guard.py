@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Защита от повторных нажатий и флуда до хендлеров (TypeHandler в группе -1)
+- Повтор того же нажатия (те же callback_data на том же сообщении) в окне debounce после
+  обработки предыдущего — только пустой answer(), без get_chat_member, загрузки PDF и правок.
+  Окно считается от конца обработки: апдейты пользователя идут по очереди (update_processor.py),
+  и тройной тап, пока грузится гайд, дойдёт до проверки уже после первого
+- Token bucket на пользователя для нажатий и сообщений: сверх лимита первое нажатие получает
+  короткую подсказку, остальные до конца серии — пустой answer(), чтобы у кнопки не висели «часики»
+  (answerCallbackQuery идёт мимо планировщика outbound.py, без очереди); сообщения сверх лимита
+  отбрасываются без единого вызова API
+- rate <= 0 — без лимита, debounce = 0 — без отсечки повторов (нагрузочные бенчмарки)
+- Пользователи — в LRU на max_users записей: флуд с множества аккаунтов не раздувает память,
+  вытесненный просто начнёт с полного ведра
+"""
+
+import logging
+import time
+from collections import OrderedDict
+
+from telegram.ext import ApplicationHandlerStop
+
+from ratelimit import TokenBucket
+
+log = logging.getLogger("mindmeld_bot.guard")
+
+THROTTLED_TEXT = "Не так быстро 🙂 Секунду…"
+
+
+class _User:
+    __slots__ = ("bucket", "tap", "tap_at", "warned")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.tap = None        # (сообщение, callback_data) последнего нажатия
+        self.tap_at = 0.0      # когда оно закончило обрабатываться
+        self.warned = False    # подсказка о лимите уже показана в этой серии
+
+
+class UpdateGuard:
+    def __init__(self, debounce: float = 0.8, rate: float = 2.0, burst: float = 10.0,
+                 max_users: int = 50_000):
+        self.debounce = debounce
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self._users = OrderedDict()  # uid → _User (LRU)
+        self.passed = 0
+        self.debounced = 0
+        self.throttled = 0
+
+    def _user(self, uid) -> _User:
+        user = self._users.get(uid)
+        if user is None:
+            user = self._users[uid] = _User(TokenBucket(self.rate, burst=self.burst))
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(uid)
+        return user
+
+    @staticmethod
+    def _tap_key(q):
+        msg = q.message
+        return (msg.message_id if msg is not None else q.inline_message_id), q.data
+
+    async def check(self, update, ctx):
+        """Группа -1: пропустить апдейт дальше или остановить (ApplicationHandlerStop)."""
+        q = update.callback_query
+        if q is None and update.message is None:
+            return  # chat_member и прочее — не действия пользователя
+        sender = update.effective_user
+        if sender is None:
+            return
+        user = self._user(sender.id)
+        now = time.monotonic()
+        if q is not None:
+            tap = self._tap_key(q)
+            if tap == user.tap and now - user.tap_at < self.debounce:
+                self.debounced += 1
+                await self._answer(q)
+                raise ApplicationHandlerStop
+            user.tap, user.tap_at = tap, now
+        if self.rate > 0 and not user.bucket.try_acquire():
+            self.throttled += 1
+            if q is not None and not user.warned:
+                user.warned = True
+                await self._answer(q, THROTTLED_TEXT)
+            elif q is not None:
+                await self._answer(q)
+            raise ApplicationHandlerStop
+        user.warned = False
+        self.passed += 1
+
+    async def release(self, update, ctx):
+        """Группа 1 (после хендлеров): окно повтора отсчитывается от конца обработки нажатия."""
+        q = update.callback_query
+        if q is None or update.effective_user is None:
+            return
+        user = self._users.get(update.effective_user.id)
+        if user is not None and user.tap == self._tap_key(q):
+            user.tap_at = time.monotonic()
+
+    @staticmethod
+    async def _answer(q, text: str = None):
+        try:
+            await q.answer(text)
+        except Exception as e:  # устаревший query и т.п. — отбрасываем апдейт всё равно
+            log.debug("guard answer failed: %s", e)
+
+    def __len__(self):
+        return len(self._users)
+
+    def stats(self) -> dict:
+        return {"users": len(self._users), "passed": self.passed, "debounced": self.debounced,
+                "throttled": self.throttled}
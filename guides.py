@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Каталог PDF-гайдов: индекс в памяти вместо glob по папке на каждое открытие меню
+- Папка сканируется один раз — в start() (post_init), не при импорте; индекс — ключ (callback_data),
+  название, путь, размер, sha256
+- Фоновая проверка раз в check_interval: mtime папки (файл добавили/удалили/переименовали)
+  и mtime/размер файлов из индекса (файл заменили на месте) → пересканирование;
+  sha256 пересчитывается только у изменившихся файлов; stat/sha256 — в потоке (asyncio.to_thread),
+  подмена снимка и listeners — в event loop
+- Каждое сканирование с изменениями собирает новый неизменяемый снимок GuideIndex и подменяет ссылку;
+  клавиатуры кэшируются в снимке → открытие меню — ни одного системного вызова
+- Новый гайд — просто файл guide_<ключ>.pdf в папке: название из titles или из имени файла
+- resolve(путь) — что отправлять вместо исходника (AssetManifest.path_for: собранная копия)
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from asset_manifest import file_sha256
+
+log = logging.getLogger("mindmeld_bot.guides")
+
+CALLBACK_PREFIX = "guide:"
+_CALLBACK_LIMIT = 64  # байт в callback_data у Telegram
+
+
+class Guide:
+    __slots__ = ("key", "title", "name", "source", "path", "size", "sha256")
+
+    def __init__(self, key, title, name, source, path, size, sha256):
+        self.key = key
+        self.title = title
+        self.name = name        # имя файла в папке (guide_<ключ>.pdf)
+        self.source = source    # исходник
+        self.path = path        # что реально отправляем (копия из манифеста или исходник)
+        self.size = size
+        self.sha256 = sha256
+
+    @property
+    def callback_data(self) -> str:
+        return CALLBACK_PREFIX + self.key
+
+    def _fields(self):
+        return tuple(getattr(self, f) for f in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, Guide) and self._fields() == other._fields()
+
+    __hash__ = None
+
+
+class GuideIndex:
+    """Снимок каталога. Не меняется после создания (кроме кэша клавиатур)."""
+    __slots__ = ("guides", "version", "_by_key", "_by_name", "_keyboards")
+
+    def __init__(self, guides=(), version: int = 0):
+        self.guides = tuple(guides)
+        self.version = version
+        self._by_key = {g.key: g for g in self.guides}
+        self._by_name = {g.name: g for g in self.guides}
+        self._keyboards = {}
+
+    def get(self, key: str):
+        return self._by_key.get(key)
+
+    def find(self, name: str):
+        """По имени файла (старые callback_data вида guide::<файл>)."""
+        return self._by_name.get(name)
+
+    def keyboard(self, build):
+        """build(guides) → клавиатура; собирается один раз на снимок и builder."""
+        kb = self._keyboards.get(build)
+        if kb is None:
+            kb = self._keyboards[build] = build(self.guides)
+        return kb
+
+    def __iter__(self):
+        return iter(self.guides)
+
+    def __len__(self):
+        return len(self.guides)
+
+
+class GuideCatalog:
+    def __init__(self, directory: str = ".", prefix: str = "guide_", suffix: str = ".pdf",
+                 titles: dict = None, resolve=None, check_interval: float = 5.0):
+        self.directory = directory
+        self.prefix = prefix
+        self.suffix = suffix
+        self.titles = dict(titles or {})  # ключ → название; порядок ключей = порядок кнопок
+        self.resolve = resolve or (lambda path: path)
+        self.check_interval = check_interval
+        self.current = GuideIndex()
+        self.scans = 0
+        self.reloads = 0
+        self.errors = 0
+        self._dir_stamp = None
+        self._file_stamps = {}  # путь → (mtime_ns, size)
+        self._hashes = {}       # путь → (mtime_ns, size, sha256)
+        self._checked = 0.0
+        self._listeners = []
+        self._task = None
+
+    def add_listener(self, fn):
+        """fn(index) — после каждой подмены снимка (пересобрать экраны с клавиатурой гайдов)."""
+        self._listeners.append(fn)
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _changed(self) -> bool:
+        if self._stamp(self.directory) != self._dir_stamp:
+            return True
+        return any(self._stamp(path) != stamp for path, stamp in self._file_stamps.items())
+
+    def refresh(self, force: bool = False) -> bool:
+        """Проверить папку (не чаще check_interval без force) и при изменениях пересобрать индекс."""
+        index = self._check(force)
+        return index is not None and self._publish(index)
+
+    async def _refresh_in_thread(self) -> bool:
+        index = await asyncio.to_thread(self._check, True)
+        return index is not None and self._publish(index)
+
+    def _check(self, force: bool):
+        """Новый снимок или None (без изменений); только файловая система — можно из потока."""
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return None
+        self._checked = now
+        if not self._changed():
+            return None
+        guides = self._scan()
+        if guides == list(self.current.guides):
+            return None
+        return GuideIndex(guides, version=self.current.version + 1)
+
+    def _publish(self, index: GuideIndex) -> bool:
+        self.current = index
+        self.reloads += 1
+        log.info("guides v%d: %s", index.version, ", ".join(g.key for g in index) or "none")
+        for fn in self._listeners:
+            fn(index)
+        return True
+
+    def _scan(self) -> list:
+        self.scans += 1
+        self._dir_stamp = self._stamp(self.directory)
+        try:
+            names = sorted(e.name for e in os.scandir(self.directory)
+                           if e.name.startswith(self.prefix) and e.name.endswith(self.suffix) and e.is_file())
+        except OSError as e:
+            self.errors += 1
+            log.warning("guides: cannot list %s: %s", self.directory, e)
+            names = []
+        stamps, found = {}, {}
+        for name in names:
+            key = name[len(self.prefix):-len(self.suffix)]
+            if len((CALLBACK_PREFIX + key).encode()) > _CALLBACK_LIMIT:
+                log.warning("guides: %s skipped — key longer than callback_data allows", name)
+                continue
+            source = os.path.normpath(os.path.join(self.directory, name))
+            path = self.resolve(source)
+            try:
+                stamp = self._stamp(source)
+                size, sha = self._digest(path)
+            except OSError as e:
+                self.errors += 1
+                log.warning("guides: %s unreadable: %s", path, e)
+                continue
+            stamps[source] = stamp
+            if path != source:
+                stamps[path] = (self._hashes[path][0], size)
+            title = self.titles.get(key) or key.replace("_", " ").capitalize()
+            found[key] = Guide(key, title, name, source, path, size, sha)
+        self._file_stamps = stamps
+        self._hashes = {p: h for p, h in self._hashes.items() if p in stamps}
+        order = {key: i for i, key in enumerate(self.titles)}
+        return sorted(found.values(), key=lambda g: (order.get(g.key, len(order)), g.name))
+
+    def _digest(self, path):
+        st = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached is None or cached[:2] != (st.st_mtime_ns, st.st_size):
+            cached = self._hashes[path] = (st.st_mtime_ns, st.st_size, file_sha256(path))
+        return st.st_size, cached[2]
+
+    # ─────────── фоновая проверка ───────────
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self._refresh_in_thread()
+            except Exception as e:
+                log.warning("guides refresh failed: %s", e)
+
+    async def start(self):
+        """Первое сканирование (stat + sha256 всех PDF) — здесь, в потоке; затем фоновая проверка."""
+        try:
+            await self._refresh_in_thread()
+        except Exception as e:
+            log.warning("guides scan failed: %s", e)
+        self._task = asyncio.create_task(self._watch(), name="guides-watch")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"version": self.current.version, "guides": {g.key: g.size for g in self.current},
+                "scans": self.scans, "reloads": self.reloads, "errors": self.errors}
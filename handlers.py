@@ -3,10 +3,14 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, InputFile,
 from aiogram.dispatcher.filters import Text
 from pathlib import Path
 
+from outbox import application_text
+
 def register_handlers(dp, bot, ADMIN_ID, CHANNEL_USERNAME, WELCOME_PHOTO, DONATION_QR,
                       WELCOME_TEXT, MENTORING_TEXT, CONSULT_TEXT, GUIDES_INTRO,
                       REVIEWS_TEXT, DONATE_TEXT, CONTACT_TEXT, INSIGHT_HEADER,
-                      ASSETS, log_event, is_subscribed):
+                      GUIDES, OUTBOX, log_event, is_subscribed):
+    # GUIDES — guides.GuideCatalog: меню и выдача идут по индексу в памяти, без обхода папки
+    # OUTBOX — outbox.Outbox, запущенный с отправкой через этот bot: заявки админу доставляет он
 
     @dp.callback_query_handler(Text(startswith="menu_mentoring"))
     async def menu_mentoring(c: types.CallbackQuery):
@@ -24,14 +28,14 @@ def register_handlers(dp, bot, ADMIN_ID, CHANNEL_USERNAME, WELCOME_PHOTO, DONATI
 
     @dp.callback_query_handler(Text(startswith="menu_guides"))
     async def menu_guides(c: types.CallbackQuery):
-        await c.message.answer(GUIDES_INTRO, reply_markup=_guides_menu(ASSETS)); await c.answer()
+        await c.message.answer(GUIDES_INTRO, reply_markup=GUIDES.current.keyboard(_guides_menu)); await c.answer()
         log_event(c.from_user.id, "open_guides")
 
-    def _guides_menu(ASSETS):
+    def _guides_menu(guides):
         kb = InlineKeyboardMarkup(row_width=1)
-        # динамически выводим PDF из папки assets
-        for p in sorted(ASSETS.glob("*.pdf")):
-            kb.add(InlineKeyboardButton(p.stem.replace("_", " "), callback_data=f"guide::{p.name}"))
+        # собирается один раз на версию каталога (пересканирование по mtime папки)
+        for g in guides:
+            kb.add(InlineKeyboardButton(g.title, callback_data=f"guide::{g.name}"))
         kb.add(InlineKeyboardButton("Вопрос дня / Инсайт", callback_data="go_daily"))
         kb.add(InlineKeyboardButton("В меню", callback_data="go_menu"))
         return kb
@@ -39,7 +43,7 @@ def register_handlers(dp, bot, ADMIN_ID, CHANNEL_USERNAME, WELCOME_PHOTO, DONATI
     @dp.callback_query_handler(Text(startswith="guide::"))
     async def send_guide(c: types.CallbackQuery):
         _, fname = c.data.split("::", 1)
-        fpath = ASSETS / fname
+        guide = GUIDES.current.find(fname)
         if not await is_subscribed(c.from_user.id):
             kb = InlineKeyboardMarkup(row_width=1)
             kb.add(
@@ -50,8 +54,14 @@ def register_handlers(dp, bot, ADMIN_ID, CHANNEL_USERNAME, WELCOME_PHOTO, DONATI
             await c.message.answer("Чтобы скачать гайд — подпишись на канал и нажми «Проверить подписку».", reply_markup=kb)
             await c.answer(); return
 
-        if fpath.exists():
-            await bot.send_document(c.message.chat.id, InputFile(str(fpath)), caption="Гайд готов 🙌")
+        sent = False
+        if guide is not None:
+            try:
+                await bot.send_document(c.message.chat.id, InputFile(guide.path), caption="Гайд готов 🙌")
+                sent = True
+            except FileNotFoundError:  # убран из папки после последней проверки каталога
+                pass
+        if sent:
             log_event(c.from_user.id, f"download_guide:{fname}")
         else:
             await c.message.answer("Файл временно недоступен. Напиши мне в личку, пришлю 🙏")
@@ -100,10 +110,10 @@ def register_handlers(dp, bot, ADMIN_ID, CHANNEL_USERNAME, WELCOME_PHOTO, DONATI
     async def catch_application(m: types.Message):
         section = awaiting_application.pop(m.from_user.id, "Не указано")
         u = m.from_user
-        admin_msg = f"📥 Новая заявка\nРаздел: {section}\nОт: @{u.username or 'no_username'} (id {u.id})\n\nТекст:\n{m.text or '(без текста)'}"
-        try:
-            await bot.send_message(ADMIN_ID, admin_msg)
-        except Exception:
-            pass
+        try:  # на диск и сразу ответ; до админа доставит воркер outbox, с повторами
+            await OUTBOX.put(ADMIN_ID, application_text(section, u.id, u.username, m.text))
+        except OSError:
+            await m.answer("Не получилось сохранить заявку 😔 Напиши мне в личку.")
+            return
         await m.answer("Принял 🙌 Отвечу в личке в ближайшее время.", reply_markup=InlineKeyboardMarkup().add(InlineKeyboardButton("В меню", callback_data="go_menu")))
         log_event(m.from_user.id, f"send_application:{section}")
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Крошечный HTTP/1.1-сервер на asyncio (без Flask и отдельных потоков)
+- Маршруты: (метод, путь) → async handler(request) → Response
+- Keep-alive, Content-Length; chunked-тела не поддерживаются (Telegram их не шлёт)
+- Используется для вебхука Telegram, / и /health на одном порту
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+
+log = logging.getLogger("mindmeld_bot.http")
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 2 * 1024 * 1024
+IDLE_TIMEOUT = 75.0
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large", 429: "Too Many Requests",
+    500: "Internal Server Error", 501: "Not Implemented",
+}
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: str
+    headers: dict             # ключи в нижнем регистре
+    body: bytes = b""
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: dict = field(default_factory=dict)
+
+    @classmethod
+    def text(cls, text: str, status: int = 200):
+        return cls(status, text.encode("utf-8"))
+
+    @classmethod
+    def json(cls, payload: str, status: int = 200):
+        return cls(status, payload.encode("utf-8"), "application/json")
+
+
+class HttpServer:
+    def __init__(self, host: str = "0.0.0.0", port: int = 10000):
+        self.host = host
+        self.port = port
+        self._routes = {}
+        self._server = None
+        self._conns = set()
+        self.requests = 0
+
+    def route(self, method: str, path: str, handler):
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self):
+        if self._server is not None:  # уже слушаем (бот открывает порт заранее, до инициализации)
+            return
+        self._server = await asyncio.start_server(
+            self._serve, self.host, self.port, limit=MAX_HEADER_BYTES)
+        sock = self._server.sockets[0]
+        self.port = sock.getsockname()[1]  # актуально для port=0
+        log.info("HTTP server listening on %s:%s", self.host, self.port)
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        # keep-alive и долгие запросы (long poll) закрываем сами, а не оставляем на отмену при закрытии loop
+        for task in list(self._conns):
+            task.cancel()
+        await asyncio.gather(*self._conns, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._conns.add(task)
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._write(writer, Response.text("headers too large", 400), close=True)
+                    return
+                req, error = await self._parse(head, reader)
+                if error is not None:
+                    await self._write(writer, error, close=True)
+                    return
+                keep_alive = req.headers.get("connection", "").lower() != "close"
+                resp = await self._dispatch(req)
+                await self._write(writer, resp, close=not keep_alive, head_only=req.method == "HEAD")
+                if not keep_alive:
+                    return
+        except asyncio.CancelledError:
+            pass  # stop(): соединение закрывается ниже; задача соединения — конечная, отмену дальше не несём
+        except Exception as e:
+            log.warning("HTTP connection error: %s", e)
+        finally:
+            self._conns.discard(task)
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except (Exception, asyncio.CancelledError):
+                pass
+
+    async def _parse(self, head: bytes, reader):
+        try:
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            return None, Response.text("bad request line", 400)
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        path, _, query = target.partition("?")
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            return None, Response.text("chunked bodies are not supported", 501)
+        body = b""
+        length = headers.get("content-length")
+        if length:
+            try:
+                length = int(length)
+            except ValueError:
+                return None, Response.text("bad content-length", 400)
+            if length > MAX_BODY_BYTES:
+                return None, Response.text("payload too large", 413)
+            body = await reader.readexactly(length)
+        elif method.upper() == "POST":
+            return None, Response.text("content-length required", 411)
+        return Request(method.upper(), path, query, headers, body), None
+
+    async def _dispatch(self, req: Request) -> Response:
+        self.requests += 1
+        method = "GET" if req.method == "HEAD" else req.method
+        handler = self._routes.get((method, req.path))
+        if handler is None:
+            if any(p == req.path for _, p in self._routes):
+                return Response.text("method not allowed", 405)
+            return Response.text("not found", 404)
+        try:
+            return await handler(req)
+        except Exception as e:
+            log.exception("HTTP handler failed for %s %s: %s", req.method, req.path, e)
+            return Response.text("internal error", 500)
+
+    @staticmethod
+    async def _write(writer, resp: Response, close: bool = False, head_only: bool = False):
+        reason = _REASONS.get(resp.status, "OK")
+        headers = {
+            "Content-Type": resp.content_type,
+            "Content-Length": str(len(resp.body)),
+            "Connection": "close" if close else "keep-alive",
+            **resp.headers,
+        }
+        out = [f"HTTP/1.1 {resp.status} {reason}"] + [f"{k}: {v}" for k, v in headers.items()]
+        writer.write(("\r\n".join(out) + "\r\n\r\n").encode("latin-1"))
+        if not head_only:
+            writer.write(resp.body)
+        await writer.drain()
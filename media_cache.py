@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш file_id для медиа (приветственное фото, QR, PDF-гайды)
+- После первой загрузки Telegram отдаёт file_id → дальше шлём по нему, без повторного аплоада
+- Кэш лежит на диске (media_cache.json), ключ — sha256 содержимого файла
+- Хэш пересчитывается, только если у файла поменялись mtime/size, и всегда в потоке (asyncio.to_thread):
+  sha256 полмегабайтного PDF не держит event loop
+- warm() на старте заранее считает хэши и (если задан MEDIA_WARM_CHAT_ID) догружает недостающее
+- file_id сбрасывается и файл грузится заново, только если Telegram отверг именно file_id;
+  прочие BadRequest (подпись, разметка, чат) пробрасываются — повторная загрузка их не исправит
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+from telegram import InputFile
+from telegram.error import BadRequest
+
+log = logging.getLogger("mindmeld_bot.media")
+
+_CHUNK = 64 * 1024
+# BadRequest, после которых кэшированный file_id больше не годится
+_STALE_FILE_ID = ("wrong file identifier", "wrong remote file identifier", "file reference", "file_reference")
+
+
+def _is_stale_file_id(error: BadRequest) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in _STALE_FILE_ID)
+
+
+def _extract_file_id(msg, kind: str):
+    if kind == "photo":
+        photos = getattr(msg, "photo", None) or ()
+        return photos[-1].file_id if photos else None
+    media = getattr(msg, kind, None)
+    return getattr(media, "file_id", None)
+
+
+class MediaCache:
+    def __init__(self, path: str = "media_cache.json", bot_id: str = ""):
+        self.path = path
+        self.bot_id = bot_id      # file_id валиден только для того бота, который его получил
+        self._ids = {}            # sha256 → file_id
+        self._digests = {}        # путь → (mtime_ns, size, sha256)
+        self._locks = {}          # sha256 → asyncio.Lock (один аплоад на содержимое)
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    # ─────────── Диск ───────────
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            log.warning("media cache read error: %s", e)
+            return
+        if not isinstance(data, dict) or data.get("bot_id") != self.bot_id:
+            log.info("media cache belongs to another bot — starting clean")
+            return
+        files = data.get("files") or {}
+        self._ids = {sha: fid for sha, fid in files.items() if isinstance(fid, str)}
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"bot_id": self.bot_id, "files": self._ids}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    async def _persist(self):
+        try:
+            await asyncio.to_thread(self._save)
+        except Exception as e:
+            log.warning("media cache write error: %s", e)
+
+    # ─────────── Хэши ───────────
+    def digest(self, path: str) -> str:
+        st = os.stat(path)
+        cached = self._digests.get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK), b""):
+                h.update(chunk)
+        sha = h.hexdigest()
+        self._digests[path] = (st.st_mtime_ns, st.st_size, sha)
+        return sha
+
+    async def file_id(self, path: str):
+        try:
+            return self._ids.get(await asyncio.to_thread(self.digest, path))
+        except OSError:
+            return None
+
+    # ─────────── Отправка ───────────
+    async def send(self, path: str, kind: str, sender):
+        """sender(media) — корутина отправки; media — file_id или InputFile.
+        Возвращает Message. FileNotFoundError пробрасывается наверх."""
+        sha = await asyncio.to_thread(self.digest, path)
+        fid = self._ids.get(sha)
+        if fid:
+            try:
+                msg = await sender(fid)
+                self.hits += 1
+                return msg
+            except BadRequest as e:
+                if not _is_stale_file_id(e):
+                    raise
+                log.warning("cached file_id rejected for %s: %s — re-uploading", path, e)
+                if self._ids.get(sha) == fid:
+                    self._ids.pop(sha, None)
+
+        lock = self._locks.setdefault(sha, asyncio.Lock())
+        async with lock:
+            fid = self._ids.get(sha)
+            if fid:
+                self.hits += 1
+                return await sender(fid)
+            self.misses += 1
+            with open(path, "rb") as f:
+                msg = await sender(InputFile(f, filename=os.path.basename(path)))
+            fid = _extract_file_id(msg, kind)
+            if fid:
+                self._ids[sha] = fid
+                await self._persist()
+            return msg
+
+    async def warm(self, bot, assets, chat_id=None):
+        """assets — [(путь, kind)]. Считает хэши заранее; при chat_id — загружает то, чего нет в кэше."""
+        missing = []
+        for path, kind in assets:
+            try:
+                sha = await asyncio.to_thread(self.digest, path)
+            except OSError as e:
+                log.warning("media warm: %s", e)
+                continue
+            if sha not in self._ids:
+                missing.append((path, kind))
+
+        if missing and chat_id:
+            for path, kind in missing:
+                method = getattr(bot, f"send_{kind}")
+                try:
+                    msg = await self.send(path, kind, lambda media: method(chat_id, media, disable_notification=True))
+                    try:
+                        await msg.delete()
+                    except Exception:
+                        pass
+                except Exception as e:
+                    log.warning("media warm upload failed for %s: %s", path, e)
+            missing = [(p, k) for p, k in missing if not await self.file_id(p)]
+
+        log.info("media cache warm: %d assets, %d cached, %d pending first upload",
+                 len(assets), len(assets) - len(missing), len(missing))
+
+    def stats(self) -> dict:
+        return {"entries": len(self._ids), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш проверки подписки на канал (get_chat_member)
+- Разные TTL для «подписан» и «не подписан» (отписавшийся быстро увидит доступ после подписки)
+- Одновременные проверки одного пользователя делят один запрос (single-flight)
+- Событие chat_member по нашему каналу сразу обновляет запись
+- Ошибки API не кэшируются
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+log = logging.getLogger("mindmeld_bot.membership")
+
+MEMBER_STATUSES = ("member", "administrator", "creator")
+
+
+def is_member_status(status) -> bool:
+    return status in MEMBER_STATUSES
+
+
+class MembershipCache:
+    def __init__(self, positive_ttl: float = 600.0, negative_ttl: float = 30.0,
+                 max_entries: int = 50_000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # uid → (allowed, expires_at)
+        self._inflight = {}            # uid → asyncio.Future
+        self._gen = {}                 # uid → номер поколения (растёт при инвалидации)
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.errors = 0
+        self.invalidations = 0
+
+    def _store(self, uid, allowed: bool):
+        ttl = self.positive_ttl if allowed else self.negative_ttl
+        self._entries[uid] = (allowed, time.monotonic() + ttl)
+        self._entries.move_to_end(uid)
+        while len(self._entries) > self.max_entries:
+            old, _ = self._entries.popitem(last=False)
+            self._gen.pop(old, None)
+
+    async def is_member(self, uid, fetch) -> bool:
+        """fetch() — корутина, возвращающая статус участника.
+        Исключение API пробрасывается (решение fail-open — за вызывающим)."""
+        entry = self._entries.get(uid)
+        if entry and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+
+        fut = self._inflight.get(uid)
+        if fut is not None:
+            self.joined += 1
+            return await asyncio.shield(fut)
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[uid] = fut
+        gen = self._gen.get(uid, 0)
+        try:
+            allowed = is_member_status(await fetch())
+        except Exception as e:
+            self.errors += 1
+            fut.set_exception(e)
+            fut.exception()  # помечаем как прочитанное, если никто не присоединился
+            raise
+        else:
+            if self._gen.get(uid, 0) == gen:
+                self._store(uid, allowed)
+            fut.set_result(allowed)
+            return allowed
+        finally:
+            self._inflight.pop(uid, None)
+            if not fut.done():  # отмена — присоединившиеся получат CancelledError, а не зависнут
+                fut.cancel()
+
+    def invalidate(self, uid):
+        self.invalidations += 1
+        self._entries.pop(uid, None)
+        self._gen[uid] = self._gen.get(uid, 0) + 1
+
+    def update_status(self, uid, status):
+        """Свежий статус из chat_member-апдейта — записываем без запроса к API."""
+        self.invalidate(uid)
+        self._store(uid, is_member_status(status))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries), "inflight": len(self._inflight),
+            "hits": self.hits, "misses": self.misses, "joined": self.joined,
+            "errors": self.errors, "invalidations": self.invalidations,
+        }
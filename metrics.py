@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики в формате Prometheus (text exposition 0.0.4) без внешних зависимостей
+- Counter / Histogram с метками; Gauge — функция, которая читается только в момент GET /metrics
+- Запись — пара операций со словарём и bisect по фиксированным границам: можно держать включённым в проде
+- Всё в одном event loop, поэтому без блокировок
+- Здесь же набор метрик бота: апдейты по хендлерам, колбэки по маршрутам, Bot API по методам,
+  ожидание в очереди исходящих, исходы safe_edit
+"""
+
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value) -> str:
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value in (float("inf"), float("-inf")):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {_num(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # метки → [счётчики по корзинам..., +Inf], сумма
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def sum(self, *labels) -> float:
+        series = self._series.get(labels)
+        return series[1] if series else 0.0
+
+    def render(self):
+        les = [f'le="{bound}"' for bound in self.buckets] + ['le="+Inf"']
+        for labels, (counts, total) in sorted(self._series.items()):
+            running = 0
+            for le, n in zip(les, counts):
+                running += n
+                yield f"{self.name}_bucket{_labels(self.labels, labels, le)} {running}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {_num(total)}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {running}"
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "started")
+
+    def __init__(self, hist, labels):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, fn, labels=(), kind: str = "gauge"):
+        """fn() → число или {значения меток (tuple): число}. kind="counter" — для счётчиков,
+        которые и так ведёт другой объект (например, ReminderDispatcher.sent)."""
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.fn = fn
+
+    def render(self):
+        value = self.fn()
+        if isinstance(value, dict):
+            for labels, v in sorted(value.items()):
+                labels = labels if isinstance(labels, tuple) else (labels,)
+                yield f"{self.name}{_labels(self.labels, labels)} {_num(v)}"
+        elif value is not None:
+            yield f"{self.name} {_num(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, fn, labels=(), kind: str = "gauge") -> Gauge:
+        return self._add(Gauge(name, help, fn, labels, kind))
+
+    def render(self) -> str:
+        out = []
+        for m in self._metrics.values():
+            try:
+                lines = list(m.render())
+            except Exception as e:  # сломанный gauge не должен ронять весь /metrics
+                out.append(f"# {m.name} unavailable: {_escape(e)}")
+                continue
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ─────────── метрики бота ───────────
+UPDATE_SECONDS = REGISTRY.histogram(
+    "mindmeld_handler_seconds", "Время обработки апдейта хендлером", ("handler",))
+CALLBACK_SECONDS = REGISTRY.histogram(
+    "mindmeld_callback_seconds", "Время обработки колбэка по маршруту", ("route",))
+API_SECONDS = REGISTRY.histogram(
+    "mindmeld_api_request_seconds", "Длительность HTTP-запроса к Bot API по методу", ("method",))
+API_ERRORS = REGISTRY.counter(
+    "mindmeld_api_errors_total", "Ответы Bot API с кодом не 200 или сетевые ошибки", ("method", "code"))
+API_POOL_WAIT = REGISTRY.histogram(
+    "mindmeld_api_pool_wait_seconds", "Ожидание свободного соединения в пуле Bot API", ("pool",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+API_CONNECTIONS = REGISTRY.counter(
+    "mindmeld_api_connections_opened_total", "Новые соединения с Bot API (остальные — keep-alive)", ("pool",))
+API_POOL_TIMEOUTS = REGISTRY.counter(
+    "mindmeld_api_pool_timeouts_total", "Запросы, не дождавшиеся соединения (не отправлены)", ("pool",))
+OUTBOUND_WAIT = REGISTRY.histogram(
+    "mindmeld_outbound_wait_seconds", "Ожидание в очереди исходящих до отправки", ("lane",))
+SAFE_EDIT = REGISTRY.counter(
+    "mindmeld_safe_edit_total", "Исходы safe_edit: edited, skipped, not_modified, sent, fallback", ("result",))
+
+
+def instrument(name: str, handler):
+    """Обёртка хендлера PTB: время и число апдейтов под меткой handler=name."""
+    async def wrapped(update, ctx):
+        with UPDATE_SECONDS.time(name):
+            return await handler(update, ctx)
+    wrapped.__name__ = getattr(handler, "__name__", name)
+    return wrapped
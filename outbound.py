@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Планировщик исходящих запросов к Bot API
+- Все send*/edit*/copy/forward идут через одну очередь под лимитами Telegram:
+  общий token bucket (~30/с) и свой bucket на каждый чат (~1/с в личке, ~20/мин в группе)
+- Две полосы: interactive (ответы на нажатия, по умолчанию) и bulk (напоминания, рассылки).
+  interactive всегда забирается первой, а bulk не трогает последние bulk_reserve токенов
+  общего ведра → живое нажатие не ждёт за очередью рассылки
+- Чат без токенов не блокирует очередь: берётся первая задача, чей чат готов
+- Несколько правок одного и того же сообщения, ещё ждущих в очереди, склеиваются в одну (последнюю)
+- 429 от Telegram → пауза общего ведра на retry_after и повтор той же задачи (до max_attempts)
+- ScheduledRequest — TunedRequest (transport.py), который отдаёт такие методы планировщику; остальное идёт напрямую
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import time
+from collections import OrderedDict, deque
+
+from metrics import API_ERRORS, API_SECONDS, OUTBOUND_WAIT
+from ratelimit import TokenBucket
+from transport import API_STATS, TunedRequest
+
+log = logging.getLogger("mindmeld_bot.outbound")
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+LANE = contextvars.ContextVar("outbound_lane", default=INTERACTIVE)
+
+_LIMITED_PREFIXES = ("send", "edit", "copyMessage", "forwardMessage")
+_COALESCED = {"editMessageText", "editMessageCaption", "editMessageReplyMarkup", "editMessageMedia"}
+
+
+@contextlib.contextmanager
+def bulk_lane():
+    """with bulk_lane(): await bot.send_message(...) — запросы внутри блока идут фоновой полосой."""
+    token = LANE.set(BULK)
+    try:
+        yield
+    finally:
+        LANE.reset(token)
+
+
+def is_limited(api_method: str) -> bool:
+    return api_method.startswith(_LIMITED_PREFIXES)
+
+
+class _Job:
+    __slots__ = ("method", "chat_id", "key", "call", "lane", "waiters", "enqueued", "attempts")
+
+    def __init__(self, method, chat_id, key, call, lane):
+        self.method = method
+        self.chat_id = chat_id
+        self.key = key
+        self.call = call
+        self.lane = lane
+        self.waiters = [asyncio.get_running_loop().create_future()]
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+
+
+class _LaneStats:
+    __slots__ = ("sent", "waited", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.sent = 0
+        self.waited = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.waited += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+
+class OutboundScheduler:
+    def __init__(self, rate: float = 30.0, chat_rate: float = 1.0, chat_burst: float = 5.0,
+                 group_rate: float = 20 / 60, bulk_reserve: float = 5.0, max_attempts: int = 3,
+                 scan_limit: int = 64, max_chats: int = 10000):
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.bulk_reserve = bulk_reserve
+        self.max_attempts = max_attempts
+        self.scan_limit = scan_limit
+        self.max_chats = max_chats
+        self._global = TokenBucket(rate, burst=max(rate, bulk_reserve + 1))
+        self._chats = OrderedDict()          # chat_id → TokenBucket (LRU)
+        self._queues = {lane: deque() for lane in LANES}
+        self._pending_edits = {}             # ключ правки → ждущая задача
+        self._inflight = set()
+        self._wakeup = None
+        self._task = None
+        self.coalesced = 0
+        self.throttled = 0                   # сколько раз Telegram всё-таки ответил 429
+        self._stats = {lane: _LaneStats() for lane in LANES}
+
+    # ─────────── постановка ───────────
+    async def submit(self, method: str, chat_id, call, lane: str = None, key=None):
+        """call() → корутина самого запроса; результат/исключение вернётся вызывающему."""
+        self._ensure_running()
+        lane = lane or LANE.get()
+        if key is not None:
+            job = self._pending_edits.get(key)
+            if job is not None:
+                # правка ещё не ушла — отправим только последнюю версию, ответ получат все
+                job.call = call
+                fut = asyncio.get_running_loop().create_future()
+                job.waiters.append(fut)
+                self.coalesced += 1
+                return await fut
+        job = _Job(method, chat_id, key, call, lane)
+        if key is not None:
+            self._pending_edits[key] = job
+        self._queues[lane].append(job)
+        self._wakeup.set()
+        return await job.waiters[0]
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            # чистый контекст: воркер не должен унаследовать полосу/счётчики первого вызывающего
+            self._task = asyncio.create_task(self._run(), name="outbound-scheduler",
+                                             context=contextvars.Context())
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            group = str(chat_id).startswith(("-", "@"))  # группы/каналы: id < 0 или @username
+            rate = self.group_rate if group else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, burst=self.chat_burst)
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    # ─────────── выдача ───────────
+    def _pick(self):
+        """(задача, None) или (None, сколько подождать; None — пока не появится новая)."""
+        wait = None
+        for lane in LANES:
+            queue = self._queues[lane]
+            if not queue:
+                continue
+            need = 1.0 if lane == INTERACTIVE else 1.0 + self.bulk_reserve
+            g = self._global.delay(need)
+            if g > 0:
+                wait = g if wait is None else min(wait, g)
+                continue
+            for i, job in enumerate(queue):
+                if i >= self.scan_limit:
+                    break
+                bucket = self._chat_bucket(job.chat_id) if job.chat_id is not None else None
+                d = bucket.delay() if bucket is not None else 0.0
+                if d > 0:
+                    wait = d if wait is None else min(wait, d)
+                    continue
+                del queue[i]
+                if bucket is not None:
+                    bucket.try_acquire()
+                self._global.try_acquire()
+                if job.key is not None and self._pending_edits.get(job.key) is job:
+                    del self._pending_edits[job.key]
+                return job, None
+        return None, wait
+
+    async def _run(self):
+        while True:
+            job, wait = self._pick()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            waited = time.monotonic() - job.enqueued
+            self._stats[job.lane].record_wait(waited)
+            OUTBOUND_WAIT.observe(waited, job.lane)
+            task = asyncio.create_task(self._execute(job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _execute(self, job: _Job):
+        job.attempts += 1
+        try:
+            result = await job.call()
+        except asyncio.CancelledError:
+            for fut in job.waiters:
+                fut.cancel()
+            raise
+        except Exception as e:
+            for fut in job.waiters:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        retry_after = _retry_after(result)
+        if retry_after is not None and job.attempts < self.max_attempts:
+            self.throttled += 1
+            log.warning("outbound: 429 on %s (chat %s), pausing %.1fs", job.method, job.chat_id, retry_after)
+            self._global.pause(retry_after)
+            job.enqueued = time.monotonic()
+            self._queues[job.lane].appendleft(job)
+            self._wakeup.set()
+            return
+        self._stats[job.lane].sent += 1
+        for fut in job.waiters:
+            if not fut.done():
+                fut.set_result(result)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for queue in self._queues.values():
+            while queue:
+                for fut in queue.popleft().waiters:
+                    fut.cancel()
+        self._pending_edits.clear()
+
+    def depth(self) -> dict:
+        return {lane: len(q) for lane, q in self._queues.items()}
+
+    def stats(self) -> dict:
+        out = {"coalesced": self.coalesced, "throttled": self.throttled, "inflight": len(self._inflight),
+               "chats": len(self._chats)}
+        for lane, st in self._stats.items():
+            out[lane] = {"queued": len(self._queues[lane]), "sent": st.sent,
+                         "wait_avg": round(st.wait_total / st.waited, 4) if st.waited else 0.0,
+                         "wait_max": round(st.wait_max, 4)}
+        return out
+
+
+def _retry_after(result):
+    """retry_after из ответа 429 (do_request возвращает (код, тело)), иначе None."""
+    try:
+        code, payload = result
+    except (TypeError, ValueError):
+        return None
+    if code != 429:
+        return None
+    try:
+        return float(json.loads(payload)["parameters"]["retry_after"])
+    except Exception:
+        return 1.0
+
+
+class ScheduledRequest(TunedRequest):
+    """TunedRequest + учёт вызовов (как CountingRequest) + планировщик для send*/edit*."""
+
+    def __init__(self, scheduler: OutboundScheduler, **kwargs):
+        super().__init__(**kwargs)
+        self.scheduler = scheduler
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        API_STATS.record_call(api_method)  # в контексте вызывающего апдейта, а не воркера очереди
+
+        async def call():
+            started = time.perf_counter()
+            try:
+                code, payload = await TunedRequest.do_request(self, url, method, request_data, *args, **kwargs)
+            except Exception as e:
+                API_ERRORS.inc(api_method, type(e).__name__)
+                raise
+            finally:
+                API_SECONDS.observe(time.perf_counter() - started, api_method)
+            if code != 200:
+                API_ERRORS.inc(api_method, str(code))
+            return code, payload
+
+        if not is_limited(api_method):
+            return await call()
+        params = request_data.parameters if request_data is not None else {}
+        chat_id = params.get("chat_id")
+        key = None
+        if api_method in _COALESCED:
+            key = (api_method, chat_id, params.get("message_id"), params.get("inline_message_id"))
+        return await self.scheduler.submit(api_method, chat_id, call, key=key)
+
+    async def shutdown(self):
+        await self.scheduler.stop()
+        await super().shutdown()
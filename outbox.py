@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+Исходящие админу (заявки): сначала на диск, потом в Telegram
+- put() дописывает запись в outbox.jsonl и возвращается — пользователь получает «Принял» сразу,
+  не дожидаясь Telegram; одновременные put() пишутся одной пачкой (group commit, + fsync по желанию)
+- Фоновый воркер доставляет и дописывает ack; сбой или 429 — повтор с экспоненциальной задержкой
+  (RetryAfter — сколько сказал Telegram), запись не теряется и не выбрасывается
+- Пришло сразу digest_after и больше записей одному получателю — одно сообщение-дайджест
+  (режется по лимиту Telegram), а не пачка отдельных; запись длиннее лимита уходит частями «(1/3)…»
+  без обрезки, ack — только после последней части
+- После рестарта недоставленное (put без ack) досылается; доставка «хотя бы один раз»:
+  упали между отправкой и ack — админ получит запись повторно
+- Файл сжимается, когда всё доставлено (или на старте — до одних недоставленных)
+- path=None — только в памяти (STATE_BACKEND=memory, бенчмарки)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+
+from telegram.error import RetryAfter
+
+log = logging.getLogger("mindmeld_bot.outbox")
+
+MESSAGE_LIMIT = 4096  # символов в сообщении Telegram
+DIGEST_SEPARATOR = "\n\n— — —\n\n"
+_HEAD_RESERVE = 32    # заголовок дайджеста / «(2/3)» у части длинной записи
+
+
+def split_text(text: str, limit: int = MESSAGE_LIMIT - _HEAD_RESERVE) -> list:
+    """Кусками не длиннее limit, склейка = исходный текст; режем после последнего перевода строки/пробела."""
+    parts = []
+    while len(text) > limit:
+        cut = max(text.rfind("\n", 0, limit), text.rfind(" ", 0, limit)) + 1
+        if cut < limit // 2:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:]
+    parts.append(text)
+    return parts
+
+
+def application_text(section: str, user_id, username, text: str) -> str:
+    """Заявка так, как её видит админ (bot.py и handlers.py)."""
+    return (f"📥 Новая заявка\nРаздел: {section}\nОт: @{username or 'no_username'} (id {user_id})\n\n"
+            f"Текст:\n{text or '(без текста)'}")
+
+
+class _Item:
+    __slots__ = ("id", "chat_id", "text", "created", "attempts", "next_at", "parts_sent")
+
+    def __init__(self, id, chat_id, text, created):
+        self.id = id
+        self.chat_id = chat_id
+        self.text = text
+        self.created = created    # time.time() постановки
+        self.attempts = 0
+        self.next_at = 0.0        # monotonic: не раньше (backoff)
+        self.parts_sent = 0       # длинная запись: сколько частей уже доставлено (повтор — со следующей)
+
+
+class Outbox:
+    def __init__(self, path: str = None, digest_after: int = 3, batch_window: float = 0.5,
+                 base_backoff: float = 2.0, max_backoff: float = 300.0, fsync: bool = False,
+                 compact_after: int = 1000):
+        self.path = path
+        self.digest_after = digest_after
+        self.batch_window = batch_window    # подождать, не придут ли ещё (пачка → дайджест)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.fsync = fsync
+        self.compact_after = compact_after  # строк в файле, после которых он сжимается
+        self._pending = {}                  # id → _Item (порядок постановки)
+        self._wbuf = []                     # [(_Item, future)] — ждут group commit
+        self._writer = None
+        self._io = None                     # asyncio.Lock: запись, ack и сжатие файла — по очереди
+        self._wake = None
+        self._task = None
+        self._send = None
+        self._lines = 0
+        self.put_count = 0
+        self.delivered = 0
+        self.messages = 0
+        self.digests = 0
+        self.failures = 0
+        self.replayed = 0
+        self.writes = 0
+        self._load()
+
+    # ─────────── Диск ───────────
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                self._lines += 1
+                try:
+                    rec = json.loads(line)
+                except ValueError:  # оборванная последняя строка (упали посреди записи)
+                    continue
+                if rec.get("op") == "put":
+                    self._pending[rec["id"]] = _Item(rec["id"], rec["chat_id"], rec["text"], rec["at"])
+                elif rec.get("op") == "ack":
+                    self._pending.pop(rec["id"], None)
+        self.replayed = len(self._pending)
+        if self.replayed:
+            log.info("outbox: %d undelivered from %s", self.replayed, self.path)
+
+    def _append(self, lines):
+        data = "".join(lines).encode("utf-8")
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _rewrite(self, items):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(self._put_line(it) for it in items)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _put_line(it: _Item) -> str:
+        return json.dumps({"op": "put", "id": it.id, "chat_id": it.chat_id, "text": it.text, "at": it.created},
+                          ensure_ascii=False) + "\n"
+
+    async def _compact(self):
+        """Под self._io: в файле остаются только недоставленные."""
+        if not self.path or self._lines <= len(self._pending):
+            return
+        items = list(self._pending.values())
+        await asyncio.to_thread(self._rewrite, items)
+        self._lines = len(items)
+
+    # ─────────── Постановка ───────────
+    async def put(self, chat_id, text: str) -> str:
+        """Возвращается, когда запись уже на диске. OSError — сохранить не удалось."""
+        it = _Item(uuid.uuid4().hex[:16], chat_id, text, time.time())
+        if self.path:
+            fut = asyncio.get_running_loop().create_future()
+            self._wbuf.append((it, fut))
+            if self._writer is None or self._writer.done():
+                self._writer = asyncio.create_task(self._drain_writes(), name="outbox-write")
+            await fut
+        else:
+            self._accept([it])
+        return it.id
+
+    async def _drain_writes(self):
+        async with self._lock():
+            while self._wbuf:
+                batch, self._wbuf = self._wbuf, []
+                try:
+                    await asyncio.to_thread(self._append, [self._put_line(it) for it, _ in batch])
+                except Exception as e:
+                    log.error("outbox write failed: %s", e)
+                    for _, fut in batch:
+                        if not fut.done():
+                            fut.set_exception(e)
+                    continue
+                self.writes += 1
+                self._lines += len(batch)
+                self._accept([it for it, _ in batch])
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_result(None)
+
+    def _accept(self, items):
+        for it in items:
+            self._pending[it.id] = it
+        self.put_count += len(items)
+        if self._wake is not None:
+            self._wake.set()
+
+    def _lock(self) -> asyncio.Lock:
+        if self._io is None:
+            self._io = asyncio.Lock()
+        return self._io
+
+    # ─────────── Доставка ───────────
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    @staticmethod
+    def _parts(it: _Item) -> list:
+        """Длинная запись → [(текст, [it] на последней части, (it, номер части))], уже доставленные пропущены."""
+        chunks = split_text(it.text)
+        total = len(chunks)
+        return [(f"({n + 1}/{total})\n{chunk}", [it] if n == total - 1 else [], (it, n))
+                for n, chunk in enumerate(chunks) if n >= it.parts_sent]
+
+    def _messages(self, items):
+        """[(текст, [записи, доставленные этим сообщением], часть | None)], каждое — в пределах MESSAGE_LIMIT."""
+        out, parts, batch = [], [], []
+        budget = MESSAGE_LIMIT - _HEAD_RESERVE
+        single = len(items) < self.digest_after
+
+        def close():
+            if batch:
+                head = f"📬 Заявок: {len(batch)}" + DIGEST_SEPARATOR if len(batch) > 1 else ""
+                out.append((head + DIGEST_SEPARATOR.join(parts), list(batch), None))
+                parts.clear()
+                batch.clear()
+
+        size = 0
+        for it in items:
+            if it.parts_sent or len(it.text) > budget:
+                out.extend(self._parts(it))
+                continue
+            extra = len(it.text) + len(DIGEST_SEPARATOR)
+            if batch and (single or size + extra > budget):
+                close()
+                size = 0
+            parts.append(it.text)
+            batch.append(it)
+            size += extra
+        close()
+        return out
+
+    async def _deliver_round(self, ready):
+        by_chat = {}
+        for it in ready:
+            by_chat.setdefault(it.chat_id, []).append(it)
+        acked = []
+        for chat_id, items in by_chat.items():
+            messages = self._messages(items)
+            for n, (text, batch, part) in enumerate(messages):
+                try:
+                    await self._send(chat_id, text)
+                except Exception as e:
+                    self.failures += 1
+                    retry_after = e.retry_after if isinstance(e, RetryAfter) else None
+                    if isinstance(retry_after, (int, float)):
+                        retry_after = float(retry_after)
+                    elif retry_after is not None:  # timedelta в новых версиях PTB
+                        retry_after = retry_after.total_seconds()
+                    left = list({id(it): it for _, rest, p in messages[n:]
+                                 for it in rest + ([p[0]] if p else [])}.values())
+                    now = time.monotonic()
+                    for it in left:
+                        it.attempts += 1
+                        it.next_at = now + (retry_after if retry_after is not None else self._backoff(it.attempts))
+                    log.warning("outbox: %d for %s not delivered (attempt %d): %s",
+                                len(left), chat_id, left[0].attempts, e)
+                    break
+                self.messages += 1
+                if part is not None:
+                    part[0].parts_sent = part[1] + 1
+                if len(batch) > 1:
+                    self.digests += 1
+                acked.extend(batch)
+        if not acked:
+            return
+        for it in acked:
+            self._pending.pop(it.id, None)
+        self.delivered += len(acked)
+        if not self.path:
+            return
+        async with self._lock():
+            try:
+                await asyncio.to_thread(self._append, [json.dumps({"op": "ack", "id": it.id}) + "\n" for it in acked])
+                self._lines += len(acked)
+                if not self._pending and self._lines >= self.compact_after:
+                    await self._compact()
+            except Exception as e:  # не записали ack — после рестарта админ получит их повторно
+                log.error("outbox ack write failed: %s", e)
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            ready = [it for it in self._pending.values() if it.next_at <= now]
+            if not ready:
+                timeout = min(it.next_at for it in self._pending.values()) - now if self._pending else None
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                if self.batch_window:
+                    await asyncio.sleep(self.batch_window)  # следом за первой заявкой часто идут ещё
+                continue
+            try:
+                await self._deliver_round(ready)
+            except Exception as e:
+                log.exception("outbox round failed: %s", e)
+                await asyncio.sleep(self.base_backoff)
+
+    async def start(self, send):
+        """send(chat_id, text) — корутина отправки (bot.send_message)."""
+        self._send = send
+        self._wake = asyncio.Event()
+        if self.path:
+            async with self._lock():
+                await self._compact()
+        self._task = asyncio.create_task(self._run(), name="outbox")
+
+    async def stop(self):
+        if self._writer is not None:
+            await asyncio.gather(self._writer, return_exceptions=True)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ─────────── Наблюдаемость ───────────
+    @property
+    def backlog(self) -> int:
+        return len(self._pending)
+
+    def oldest_age(self) -> float:
+        """Сколько секунд ждёт самая старая недоставленная запись."""
+        if not self._pending:
+            return 0.0
+        return max(0.0, time.time() - min(it.created for it in self._pending.values()))
+
+    def stats(self) -> dict:
+        return {"backlog": self.backlog, "oldest_seconds": round(self.oldest_age(), 1),
+                "retrying": sum(1 for it in self._pending.values() if it.attempts),
+                "put": self.put_count, "delivered": self.delivered, "messages": self.messages,
+                "digests": self.digests, "failures": self.failures, "replayed": self.replayed,
+                "writes": self.writes, "file_lines": self._lines}
+
+
+def open_outbox() -> Outbox:
+    memory = os.getenv("STATE_BACKEND", "sqlite").strip().lower() == "memory"
+    path = os.getenv("OUTBOX_FILE", "outbox.jsonl").strip()
+    shard = os.getenv("SHARD_INDEX")
+    if shard and path:  # у каждого воркера shard.py свой файл: ack и сжатие без блокировок между процессами
+        stem, ext = os.path.splitext(path)
+        path = f"{stem}-{shard}{ext}"
+    return Outbox(None if memory else path,
+                  digest_after=int(os.getenv("OUTBOX_DIGEST_AFTER", "3")),
+                  fsync=os.getenv("OUTBOX_FSYNC", "0").strip().lower() in ("1", "true", "yes"))
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Token bucket для asyncio: rate токенов в секунду, запас до burst.
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = None
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def try_acquire(self, n: float = 1.0) -> bool:
+        self._refill(time.monotonic())
+        if self._tokens >= n:
+            self._tokens -= n
+            return True
+        return False
+
+    def delay(self, n: float = 1.0) -> float:
+        """Сколько ждать до n токенов (0 — можно сейчас)."""
+        self._refill(time.monotonic())
+        return max(0.0, (n - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Опустошить ведро на seconds (например, по RetryAfter)."""
+        self._refill(time.monotonic())
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+    async def acquire(self, n: float = 1.0):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:  # FIFO: ожидающие не обгоняют друг друга
+            while True:
+                wait = self.delay(n)
+                if wait <= 0:
+                    self._tokens -= n
+                    return
+                await asyncio.sleep(wait)
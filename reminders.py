@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Напоминания «Вопрос дня» — один диспетчер вместо job'а на каждого пользователя
+- Подписчики лежат в state_store (переживают рестарт), в памяти — индекс «корзина → uid'ы»
+- Корзина = часовой пояс + локальное время (например, "Europe/Moscow|09:00")
+- В момент срабатывания корзина рассылается пачками с паузами в пределах окна и под общим rate limit
+- Отписка — O(1): удаление из словаря и из множества корзины
+- Если бот перезапустился чуть позже времени рассылки — догоняем (в пределах catchup)
+- Корзина отмечается разосланной только после рассылки: прерванная (stop/падение) повторится
+  в пределах catchup — «хотя бы один раз», уже получившие могут получить повторно
+"""
+
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta, time as dtime
+
+import pytz
+from telegram.error import Forbidden
+
+from ratelimit import TokenBucket
+
+log = logging.getLogger("mindmeld_bot.reminders")
+
+
+def bucket_key(tz: str, at: str) -> str:
+    return f"{tz}|{at}"
+
+
+def parse_at(value: str) -> str:
+    """'9:00' → '09:00'; ValueError на мусор."""
+    hh, mm = value.strip().split(":")
+    return dtime(int(hh), int(mm)).strftime("%H:%M")
+
+
+class ReminderDispatcher:
+    def __init__(self, store, default_tz: str = "Europe/Moscow", default_at: str = "09:00",
+                 rate: float = 20.0, batch_size: int = 20, window: float = 120.0,
+                 catchup: float = 3600.0):
+        self._subs = store.dict("qod_reminders")        # uid → {"tz": ..., "at": "HH:MM"}
+        self._fired = store.dict("qod_reminders_fired")  # корзина → последняя локальная дата рассылки
+        self._buckets = None                             # корзина → set(uid), строится лениво
+        self.default_tz = default_tz
+        self.default_at = default_at
+        self.rate = rate
+        self.batch_size = batch_size
+        self.window = window
+        self.catchup = catchup
+        self._bucket = TokenBucket(rate, burst=batch_size)
+        self._send = None
+        self._task = None
+        self._firing = {}                                # корзина → задача рассылки
+        self._wakeup = None
+        self.sent = 0
+        self.failed = 0
+        self.last_lag = 0.0        # насколько позже расписания стартовала последняя рассылка, сек
+        self.running_buckets = 0
+
+    # ─────────── Подписки ───────────
+    def _index(self) -> dict:
+        if self._buckets is None:
+            buckets = {}
+            for uid, sub in self._subs.items():
+                buckets.setdefault(bucket_key(sub["tz"], sub["at"]), set()).add(uid)
+            self._buckets = buckets
+        return self._buckets
+
+    def subscribe(self, uid, tz: str = None, at: str = None) -> dict:
+        tz = tz or self.default_tz
+        pytz.timezone(tz)  # UnknownTimeZoneError — пусть вызывающий покажет ошибку
+        at = parse_at(at) if at else self.default_at
+        self.unsubscribe(uid)
+        sub = {"tz": tz, "at": at}
+        self._subs[uid] = sub
+        key = bucket_key(tz, at)
+        members = self._index().setdefault(key, set())
+        if not members and key not in self._firing:
+            # корзина была пустой: если сегодняшнее время уже прошло — начинаем с завтра, а не «догоняем»
+            now = datetime.now(pytz.utc)
+            today = now.astimezone(pytz.timezone(tz)).date()
+            if self._fire_time(key, today) <= now:
+                self._fired[key] = today.isoformat()
+        members.add(uid)
+        if self._wakeup is not None:
+            self._wakeup.set()  # могла появиться более ранняя корзина
+        return sub
+
+    def unsubscribe(self, uid) -> bool:
+        sub = self._subs.get(uid)
+        if sub is None:
+            return False
+        del self._subs[uid]
+        members = self._index().get(bucket_key(sub["tz"], sub["at"]))
+        if members is not None:
+            members.discard(uid)
+        return True
+
+    def subscription(self, uid):
+        return self._subs.get(uid)
+
+    def __len__(self):
+        return len(self._subs)
+
+    # ─────────── Расписание ───────────
+    @staticmethod
+    def _fire_time(key: str, day) -> datetime:
+        tz_name, at = key.split("|")
+        tz = pytz.timezone(tz_name)
+        hh, mm = map(int, at.split(":"))
+        return tz.localize(datetime.combine(day, dtime(hh, mm))).astimezone(pytz.utc)
+
+    def _due(self, key: str, now_utc: datetime):
+        """(локальная дата, момент срабатывания в UTC) — ближайшее срабатывание корзины,
+        либо сегодняшнее, если оно уже прошло, но ещё в пределах catchup и не разослано."""
+        day = now_utc.astimezone(pytz.timezone(key.split("|")[0])).date()
+        fire = self._fire_time(key, day)
+        if fire <= now_utc and (self._fired.get(key) == day.isoformat()
+                                or (now_utc - fire).total_seconds() > self.catchup):
+            day = day + timedelta(days=1)
+            fire = self._fire_time(key, day)
+        return day.isoformat(), fire
+
+    async def start(self, send):
+        """send(uid) — корутина отправки одного напоминания."""
+        self._send = send
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop(), name="qod-reminders")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        firing = list(self._firing.values())
+        for task in firing:
+            task.cancel()
+        await asyncio.gather(*firing, return_exceptions=True)
+
+    async def _loop(self):
+        while True:
+            now = datetime.now(pytz.utc)
+            next_fire = None
+            for key, members in list(self._index().items()):
+                if not members or key in self._firing:
+                    continue
+                day, fire = self._due(key, now)
+                if fire <= now:
+                    task = asyncio.create_task(self._fire(key, day, (now - fire).total_seconds()),
+                                               name=f"qod-reminders:{key}")
+                    self._firing[key] = task
+                    task.add_done_callback(lambda _t, k=key: self._firing.pop(k, None))
+                elif next_fire is None or fire < next_fire:
+                    next_fire = fire
+            sleep_for = 60.0 if next_fire is None else min(60.0, (next_fire - now).total_seconds())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.05, sleep_for))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, key: str, day: str, lag: float):
+        uids = list(self._index().get(key, ()))
+        batches = math.ceil(len(uids) / self.batch_size)
+        gap = max(self.batch_size / self.rate, self.window / batches) if batches > 1 else 0.0
+        self.last_lag = lag
+        self.running_buckets += 1
+        started = time.monotonic()
+        log.info("qod reminders: bucket %s → %d users in %d batches (gap %.2fs, lag %.1fs)",
+                 key, len(uids), batches, gap, lag)
+        try:
+            for i in range(batches):
+                batch_started = time.monotonic()
+                batch = [u for u in uids[i * self.batch_size:(i + 1) * self.batch_size] if u in self._subs]
+                await asyncio.gather(*(self._deliver(uid) for uid in batch))
+                if i + 1 < batches:
+                    await asyncio.sleep(max(0.0, gap - (time.monotonic() - batch_started)))
+            self._fired[key] = day
+        finally:
+            self.running_buckets -= 1
+            log.info("qod reminders: bucket %s done in %.1fs (sent %d, failed %d total)",
+                     key, time.monotonic() - started, self.sent, self.failed)
+
+    async def _deliver(self, uid, attempts: int = 3):
+        for _ in range(attempts):
+            await self._bucket.acquire()
+            try:
+                await self._send(uid)
+                self.sent += 1
+                return
+            except Exception as e:
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after:
+                    self._bucket.pause(float(retry_after))
+                    continue
+                if isinstance(e, Forbidden):  # пользователь заблокировал бота
+                    self.unsubscribe(uid)
+                else:
+                    log.warning("qod reminder to %s failed: %s", uid, e)
+                break
+        self.failed += 1
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subs), "buckets": sum(1 for m in self._index().values() if m),
+                "sent": self.sent, "failed": self.failed, "last_lag": round(self.last_lag, 3),
+                "running": self.running_buckets}
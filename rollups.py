@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Сводки по журналу событий для /stats
+- Кормятся новыми строками от своего EventIndex (listener) → дневные агрегаты:
+  счётчик каждого события и множество его пользователей за день
+- Запрос за диапазон дат складывает дни, а не строки журнала: события и уникальные пользователи,
+  воронка start → просмотр экрана → гайд/заявка, когорты по дню первого события и удержание на день N
+- Снимок (events.rollups.json) = агрегаты + смещения журнала одним файлом → после рестарта
+  дочитывается только хвост; пишется не чаще раза в save_interval и на остановке.
+  Журнал обрезали/подменили — одна пересборка с нуля
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from eventlog import EventIndex, EventLog
+
+log = logging.getLogger("mindmeld_bot.rollups")
+
+GOAL_EVENTS = {"guide_download", "mentoring_request", "consultation_request"}
+FUNNEL = ("start", "view", "goal")
+RETENTION_DAYS = (1, 7, 30)
+
+
+class _Index(EventIndex):
+    """EventIndex без своего sidecar: смещения лежат в снимке сводок, согласованно с агрегатами."""
+
+    def _load(self):
+        pass
+
+    def _save(self):
+        pass
+
+
+def funnel_step(event: str):
+    """Шаг воронки для события: start → *_view → гайд/заявка; None — событие вне воронки."""
+    if event == "start":
+        return "start"
+    if event.endswith("_view"):
+        return "view"
+    if event in GOAL_EVENTS or event.startswith("send_application"):
+        return "goal"
+    return None
+
+
+def default_path(events_file: str) -> str:
+    """events.csv → events.rollups.json (рядом с журналом)."""
+    return os.path.splitext(events_file)[0] + ".rollups.json"
+
+
+def parse_range(args, today: date):
+    """Аргументы /stats → (с, по) включительно; None — без границы.
+    ''→7 дней, 'today', '30' / '30d', 'all', 'YYYY-MM-DD', 'YYYY-MM-DD YYYY-MM-DD'."""
+    if not args:
+        return today - timedelta(days=6), today
+    if len(args) > 2:
+        raise ValueError("too many arguments")
+    head = args[0].strip().lower()
+    if len(args) == 1:
+        if head in ("today", "сегодня"):
+            return today, today
+        if head in ("all", "всё", "все"):
+            return None, None
+        if head.rstrip("d").isdigit():
+            days = int(head.rstrip("d"))
+            if days < 1:
+                raise ValueError("empty range")
+            return today - timedelta(days=days - 1), today
+        day = date.fromisoformat(head)
+        return day, day
+    start, end = date.fromisoformat(head), date.fromisoformat(args[1].strip())
+    if end < start:
+        raise ValueError("end before start")
+    return start, end
+
+
+class Rollups:
+    VERSION = 1
+
+    def __init__(self, log: EventLog, path: str, save_interval: float = 60.0):
+        self.log = log
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self.index = None
+        self._saved_at = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.days = {}         # date → {event: [count, {user_id}]}
+        self.active = {}       # date → {user_id} (любое событие)
+        self.first_seen = {}   # user_id → date первого события
+        self.cohorts = {}      # date когорты → {N: сколько её пользователей было активно на день N}
+        self.rows = 0
+        self._day_cache = {}
+        self._cohorts_stale = False
+        self._dirty = False
+
+    # ─────────── загрузка / снимок ───────────
+    def _open(self):
+        self.index = self._make_index()
+        self._load()
+
+    def _make_index(self) -> EventIndex:
+        index = _Index(self.log)
+        index.add_listener(self.ingest)
+        return index
+
+    def _rebuild(self):
+        self._reset()
+        self.index = self._make_index()
+        self._dirty = True
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != self.VERSION:
+                return
+            for day, events in data["days"].items():
+                self.days[date.fromisoformat(day)] = {e: [n, set(users)] for e, (n, users) in events.items()}
+            self.rows = self.index.rows = int(data["rows"])
+            self.index.offsets = {k: int(v) for k, v in data["offsets"].items()}
+            self.index.sealed = self.index.load_sealed(data["sealed"])
+        except Exception as e:
+            log.warning("rollups snapshot unreadable, rebuilding: %s", e)
+            self._rebuild()
+            return
+        for day in sorted(self.days):
+            self.active[day] = set().union(*(users for _, users in self.days[day].values()))
+        self._rebuild_cohorts()
+
+    def _save(self):
+        data = {"version": self.VERSION, "rows": self.rows,
+                "offsets": self.index.offsets, "sealed": self.index.sealed,
+                "days": {day.isoformat(): {e: [n, sorted(users)] for e, (n, users) in events.items()}
+                         for day, events in self.days.items()}}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    # ─────────── приём строк ───────────
+    def _day(self, ts: str):
+        key = ts[:10]
+        day = self._day_cache.get(key)
+        if day is None:
+            try:
+                day = self._day_cache[key] = date.fromisoformat(key)
+            except ValueError:
+                return None
+        return day
+
+    def ingest(self, rows):
+        """Listener EventIndex: [(timestamp, user_id, event, details)] → дневные агрегаты."""
+        for ts, uid, event, _ in rows:
+            self.rows += 1
+            day = self._day(ts)
+            if day is None:
+                continue
+            entry = self.days.setdefault(day, {}).setdefault(event, [0, set()])
+            entry[0] += 1
+            entry[1].add(uid)
+            self._touch(uid, day)
+        self._dirty = True
+
+    def _touch(self, uid, day: date):
+        active = self.active.setdefault(day, set())
+        if uid in active:
+            return
+        active.add(uid)
+        first = self.first_seen.get(uid)
+        if first is None:
+            self.first_seen[uid] = first = day
+        elif day < first:
+            # строка из прошлого (старый файл дочитан позже) — когорты пересчитаем перед запросом
+            self.first_seen[uid] = day
+            self._cohorts_stale = True
+            return
+        cohort = self.cohorts.setdefault(first, {})
+        offset = (day - first).days
+        cohort[offset] = cohort.get(offset, 0) + 1
+
+    def _rebuild_cohorts(self):
+        self.first_seen, self.cohorts = {}, {}
+        for day in sorted(self.active):
+            for uid in self.active[day]:
+                first = self.first_seen.setdefault(uid, day)
+                cohort = self.cohorts.setdefault(first, {})
+                offset = (day - first).days
+                cohort[offset] = cohort.get(offset, 0) + 1
+        self._cohorts_stale = False
+
+    def refresh(self) -> int:
+        """Дочитать журнал (только новые строки); снимок — если прошло save_interval с прошлого."""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> int:
+        if self.index is None:
+            self._open()
+        new = self.index.refresh()
+        if self.index.rows != self.rows:
+            # индекс пересобрался сам (файл обрезали) и отдал всё заново — агрегаты с двойным счётом
+            log.warning("event log rewritten — rebuilding rollups")
+            self._rebuild()
+            new = self.index.refresh()
+        if self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+            self._save()
+        return new
+
+    def close(self):
+        """На остановке: несохранённое — в снимок (иначе после рестарта хвост просто дочитается заново)."""
+        with self._lock:
+            if self.index is not None and self._dirty:
+                self._save()
+
+    # ─────────── запросы ───────────
+    def query(self, start: date = None, end: date = None) -> dict:
+        """Сводка за [start, end] (включительно; None — без границы) из дневных агрегатов."""
+        if self._cohorts_stale:
+            self._rebuild_cohorts()
+        days = [d for d in self.days if (start is None or d >= start) and (end is None or d <= end)]
+        counts, users, active = {}, {}, set()
+        for day in days:
+            for event, (n, who) in self.days[day].items():
+                counts[event] = counts.get(event, 0) + n
+                users.setdefault(event, set()).update(who)
+            active |= self.active.get(day, set())
+
+        steps = {step: set() for step in FUNNEL}
+        for event, who in users.items():
+            step = funnel_step(event)
+            if step is not None:
+                steps[step] |= who
+        reached = steps["start"]
+        funnel = []
+        for step in FUNNEL:
+            reached = reached & steps[step]
+            funnel.append((step, len(reached)))
+
+        last = max(self.days) if self.days else None
+        retention = {}
+        cohort_days = [d for d in self.cohorts if (start is None or d >= start) and (end is None or d <= end)]
+        for n in RETENTION_DAYS:
+            size = kept = 0
+            for day in cohort_days:
+                if day + timedelta(days=n) <= last:  # незрелые когорты не считаем
+                    size += self.cohorts[day].get(0, 0)
+                    kept += self.cohorts[day].get(n, 0)
+            retention[n] = (kept, size)
+
+        return {"from": min(days) if days else start, "to": max(days) if days else end, "days": len(days),
+                "rows": sum(counts.values()), "users": len(active),
+                "new_users": sum(self.cohorts[d].get(0, 0) for d in cohort_days),
+                "events": {e: (counts[e], len(users[e])) for e in sorted(counts, key=counts.get, reverse=True)},
+                "funnel": funnel, "retention": retention}
+
+    def report(self, start: date = None, end: date = None) -> dict:
+        """refresh + query под одним замком (вызывать из потока: refresh читает диск)."""
+        started = time.perf_counter()
+        with self._lock:
+            self._refresh()
+            result = self.query(start, end)
+        result["ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+    def stats(self) -> dict:
+        return {"days": len(self.days), "rows": self.rows, "users": len(self.first_seen)}
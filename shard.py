@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+Шардированный режим: приёмник апдейтов + N процессов bot.py на одной машине, без внешнего брокера
+
+    python shard.py --workers 4          # BOT_MODE=polling|webhook, PORT, BOT_TOKEN — как у bot.py
+
+- Приёмник (этот процесс) принимает апдейты сам: long polling getUpdates или вебхук на PORT
+- Апдейт уходит воркеру shard_of(user_id, N) — POST на 127.0.0.1:<порт воркера><WEBHOOK_PATH>,
+  тем же обработчиком, что и настоящий вебхук (внутренний секрет в заголовке)
+- В каждый шард — одна очередь и отправка строго по порядку → апдейты пользователя приходят к воркеру
+  в порядке Telegram, а внутри воркера порядок держит PerUserUpdateProcessor
+- Воркер — обычный bot.py в BOT_MODE=shard: своё состояние (state.shard-<i>.db), свой кэш file_id,
+  свои напоминания (подписчики лежат в состоянии шарда пользователя); вебхук у Telegram он не трогает
+- Лимиты исходящих (OUTBOUND_RATE, REMIND_RATE) делятся между воркерами: у Telegram лимит на бота, а не на процесс
+- Воркер упал → приёмник перезапускает его; апдейты шарда ждут в очереди
+- Первый запуск рядом с состоянием одиночного бота (state.db) раскладывает его по шардам;
+  при смене числа воркеров — явно: python shard.py --split --workers N
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+import sqlite3
+import sys
+import zlib
+
+import httpx
+
+from http_server import HttpServer, Response
+from rollups import default_path as rollups_default_path
+
+logging.basicConfig(
+    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    level=getattr(logging, (os.getenv("LOG_LEVEL") or "INFO").strip().upper(), logging.INFO),
+)
+log = logging.getLogger("mindmeld_bot.shard")
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py")
+ALLOWED_UPDATES = ["message", "edited_message", "channel_post", "edited_channel_post", "inline_query",
+                   "chosen_inline_result", "callback_query", "shipping_query", "pre_checkout_query", "poll",
+                   "poll_answer", "my_chat_member", "chat_member", "chat_join_request"]
+
+
+def shard_of(user_id, count: int) -> int:
+    """Стабильный шард пользователя (одинаковый во всех процессах и между рестартами)."""
+    if count <= 1 or user_id is None:
+        return 0
+    return zlib.crc32(str(user_id).encode()) % count
+
+
+def update_user_id(update: dict):
+    """user_id из сырого апдейта; для chat_member — тот, чьё членство изменилось (его кэш подписки)."""
+    for kind, obj in update.items():
+        if kind == "update_id" or not isinstance(obj, dict):
+            continue
+        if kind in ("chat_member", "my_chat_member"):
+            member = (obj.get("new_chat_member") or {}).get("user") or {}
+            if "id" in member:
+                return member["id"]
+        for field in ("from", "user", "chat"):
+            value = obj.get(field)
+            if isinstance(value, dict) and "id" in value:
+                return value["id"]
+        return None
+    return None
+
+
+def shard_path(path: str, index: int) -> str:
+    """state.db → state.shard-0.db"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.shard-{index}{ext}"
+
+
+def _shard_files(path: str) -> list:
+    stem, ext = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(stem)}.shard-*{ext}"))
+
+
+def split_state(path: str, count: int) -> dict:
+    """Разложить sqlite-состояние (state_store) по count шардам → {шард: строк}.
+    Источник — path и уже существующие шарды (смена числа воркеров); ключи-id идут в шард владельца,
+    остальные (например, даты рассылки корзин напоминаний) — во все шарды. path после разбиения
+    переименовывается в <path>.pre-shard."""
+    from state_store import SQLiteBackend
+    merged = {}
+    old = _shard_files(path)
+    for source in ([path] if os.path.exists(path) else []) + old:
+        db = sqlite3.connect(source)
+        try:
+            for ns, key, value in db.execute("SELECT ns, key, value FROM kv"):
+                merged[(ns, key)] = value
+        finally:
+            db.close()
+    for source in old:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(source + suffix):
+                os.remove(source + suffix)
+    if os.path.exists(path):
+        # состояние одиночного бота больше не источник правды — иначе удалённое в шардах вернулось бы
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.replace(path + suffix, f"{path}.pre-shard{suffix}")
+    parts = {i: [] for i in range(count)}
+    for (ns, key), value in merged.items():
+        try:
+            owner = json.loads(key)
+        except ValueError:
+            owner = None
+        if isinstance(owner, int) and not isinstance(owner, bool):
+            parts[shard_of(owner, count)].append((ns, key, value))
+        else:
+            for ops in parts.values():
+                ops.append((ns, key, value))
+    for i, ops in parts.items():
+        backend = SQLiteBackend(shard_path(path, i))
+        try:
+            backend.write(ops)
+        finally:
+            backend.close()
+    return {i: len(ops) for i, ops in parts.items()}
+
+
+# ─────────── доставка в шарды ───────────
+class ShardRouter:
+    def __init__(self, count: int, base_port: int, path: str, secret: str, queue_size: int = 10_000):
+        self.count = count
+        self.urls = [f"http://127.0.0.1:{base_port + i}{path}" for i in range(count)]
+        self.secret = secret
+        self._queues = [asyncio.Queue(maxsize=queue_size) for _ in range(count)]
+        self._senders = []
+        self._client = None
+        self.routed = [0] * count
+        self.retries = 0
+        self.dropped = 0
+
+    async def start(self):
+        self._client = httpx.AsyncClient(timeout=10, limits=httpx.Limits(max_connections=self.count * 2))
+        self._senders = [asyncio.create_task(self._sender(i), name=f"shard-sender-{i}")
+                         for i in range(self.count)]
+
+    async def route(self, update: dict):
+        """Поставить апдейт в очередь его шарда; при полной очереди ждёт (обратное давление на приём)."""
+        shard = shard_of(update_user_id(update), self.count)
+        self.routed[shard] += 1
+        await self._queues[shard].put(json.dumps(update, ensure_ascii=False).encode("utf-8"))
+
+    async def _sender(self, i: int):
+        queue, url = self._queues[i], self.urls[i]
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.secret, "Content-Type": "application/json"}
+        while True:
+            body = await queue.get()
+            delay = 0.1
+            try:
+                while True:
+                    try:
+                        r = await self._client.post(url, content=body, headers=headers)
+                        if r.status_code == 200:
+                            break
+                        if 400 <= r.status_code < 500:  # воркер отверг апдейт — повтор не поможет
+                            self.dropped += 1
+                            log.warning("shard %d rejected update: HTTP %d", i, r.status_code)
+                            break
+                    except httpx.TransportError:
+                        pass  # воркер ещё стартует или перезапускается
+                    self.retries += 1
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 5.0)
+            finally:
+                queue.task_done()
+
+    async def drain(self, timeout: float = 10.0):
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            log.warning("shard queues not drained: %s", [q.qsize() for q in self._queues])
+
+    async def stop(self):
+        for task in self._senders:
+            task.cancel()
+        await asyncio.gather(*self._senders, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+
+    def stats(self) -> dict:
+        return {"workers": self.count, "routed": list(self.routed), "queued": [q.qsize() for q in self._queues],
+                "retries": self.retries, "dropped": self.dropped}
+
+
+# ─────────── процессы-воркеры ───────────
+class WorkerPool:
+    def __init__(self, count: int, base_port: int, secret: str, env: dict = None, restart_delay: float = 1.0):
+        self.count = count
+        self.base_port = base_port
+        self.secret = secret
+        self.env = dict(os.environ if env is None else env)
+        self.restart_delay = restart_delay
+        self._procs = [None] * count
+        self._tasks = []
+        self._stopping = False
+        self.restarts = 0
+
+    def worker_env(self, i: int) -> dict:
+        env = dict(self.env)
+        env.update(BOT_MODE="shard", PORT=str(self.base_port + i), SHARD_INDEX=str(i),
+                   SHARD_COUNT=str(self.count), WEBHOOK_SECRET=self.secret)
+        env["STATE_DB"] = shard_path(self.env.get("STATE_DB") or "state.db", i)
+        env["MEDIA_CACHE_FILE"] = shard_path(self.env.get("MEDIA_CACHE_FILE") or "media_cache.json", i)
+        # журнал событий общий (пачки пишутся атомарно), снимок сводок /stats — у каждого свой
+        env["ROLLUPS_FILE"] = shard_path(self.env.get("ROLLUPS_FILE") or rollups_default_path(
+            self.env.get("EVENTS_FILE") or "events.csv"), i)
+        for name, default in (("OUTBOUND_RATE", 30.0), ("REMIND_RATE", 20.0)):
+            env[name] = str(float(self.env.get(name) or default) / self.count)
+        return env
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._supervise(i), name=f"shard-worker-{i}")
+                       for i in range(self.count)]
+
+    async def _supervise(self, i: int):
+        while not self._stopping:
+            proc = self._procs[i] = await asyncio.create_subprocess_exec(
+                sys.executable, BOT_SCRIPT, env=self.worker_env(i))
+            log.info("shard %d: worker pid %d on port %d", i, proc.pid, self.base_port + i)
+            code = await proc.wait()
+            if self._stopping:
+                return
+            self.restarts += 1
+            log.warning("shard %d: worker exited with %s, restarting in %.0fs", i, code, self.restart_delay)
+            await asyncio.sleep(self.restart_delay)
+
+    async def stop(self, timeout: float = 15.0):
+        self._stopping = True
+        procs = [p for p in self._procs if p is not None and p.returncode is None]
+        for p in procs:
+            p.terminate()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(p.wait() for p in procs)), timeout)
+        except asyncio.TimeoutError:
+            for p in procs:
+                if p.returncode is None:
+                    p.kill()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# ─────────── приём апдейтов ───────────
+class Receiver:
+    def __init__(self, router: ShardRouter, token: str, api_url: str = "https://api.telegram.org",
+                 mode: str = "polling", port: int = 10000, public_url: str = "", path: str = "/telegram",
+                 secret: str = ""):
+        self.router = router
+        self.api = f"{api_url.rstrip('/')}/bot{token}"
+        self.mode = mode
+        self.public_url = public_url
+        self.path = path
+        self.secret = secret
+        self.http = HttpServer(port=port)
+        self.http.route("GET", "/", self._home)
+        self.http.route("GET", "/health", self._home)
+        self.http.route("GET", "/shards", self._stats)
+        if mode == "webhook":
+            self.http.route("POST", path, self._webhook)
+        self._client = None
+        self._poller = None
+        self._offset = 0
+        self.received = 0
+
+    async def _home(self, req):
+        return Response.text("ok")
+
+    async def _stats(self, req):
+        return Response.json(json.dumps({"received": self.received, **self.router.stats()}))
+
+    async def _webhook(self, req):
+        token = req.headers.get("x-telegram-bot-api-secret-token", "")
+        if not hmac.compare_digest(token.encode(), self.secret.encode()):
+            return Response.text("forbidden", 403)
+        try:
+            update = json.loads(req.body)
+        except ValueError:
+            return Response.text("bad update", 400)
+        if not isinstance(update, dict):
+            return Response.text("bad update", 400)
+        self.received += 1
+        await self.router.route(update)
+        return Response.text("ok")
+
+    async def _call(self, method: str, **params):
+        r = await self._client.post(f"{self.api}/{method}", json=params)
+        payload = r.json()
+        if not payload.get("ok"):
+            raise RuntimeError(f"{method}: {payload.get('description')}")
+        return payload["result"]
+
+    async def start(self):
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(10, read=40))
+        await self.http.start()
+        if self.mode == "webhook":
+            await self._call("setWebhook", url=self.public_url + self.path, secret_token=self.secret,
+                             allowed_updates=ALLOWED_UPDATES)
+            log.info("receiver: webhook %s%s", self.public_url, self.path)
+        else:
+            await self._call("deleteWebhook")
+            self._poller = asyncio.create_task(self._poll(), name="shard-poller")
+            log.info("receiver: long polling")
+
+    async def _poll(self, timeout: int = 30):
+        delay = 1.0
+        while True:
+            try:
+                updates = await self._call("getUpdates", offset=self._offset, timeout=timeout,
+                                           allowed_updates=ALLOWED_UPDATES)
+                delay = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("getUpdates failed: %s (retry in %.0fs)", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            for update in updates:
+                self._offset = max(self._offset, update["update_id"] + 1)
+                self.received += 1
+                await self.router.route(update)
+
+    async def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            if self._offset:
+                try:  # подтвердить уже разосланные по шардам апдейты, иначе Telegram отдаст их снова
+                    await self._call("getUpdates", offset=self._offset, timeout=0)
+                except Exception as e:
+                    log.warning("final getUpdates failed: %s", e)
+        await self.http.stop()
+        if self._client is not None:
+            await self._client.aclose()
+
+
+async def run(workers: int, stop: asyncio.Event = None):
+    token = (os.getenv("BOT_TOKEN") or "").strip()
+    if not token:
+        raise RuntimeError("BOT_TOKEN не задан.")
+    mode = (os.getenv("BOT_MODE") or "polling").strip().lower()
+    port = int(os.getenv("PORT", "10000"))
+    public_url = (os.getenv("WEBHOOK_URL") or os.getenv("BASE_URL") or os.getenv("RENDER_EXTERNAL_URL")
+                  or "").strip().rstrip("/")
+    if mode == "webhook" and not public_url:
+        raise RuntimeError("BOT_MODE=webhook, но не задан WEBHOOK_URL/BASE_URL (или RENDER_EXTERNAL_URL).")
+    path = "/" + (os.getenv("WEBHOOK_PATH") or "telegram").strip().strip("/")
+    # секрет вебхука Telegram — как в bot.py; между приёмником и воркерами — свой, случайный на запуск
+    webhook_secret = (os.getenv("WEBHOOK_SECRET") or "").strip() or hashlib.sha256(
+        ("webhook:" + token).encode()).hexdigest()[:48]
+    internal_secret = secrets.token_hex(24)
+    base_port = int(os.getenv("SHARD_BASE_PORT") or port + 1)
+
+    state_db = os.getenv("STATE_DB", "state.db").strip()
+    if (os.getenv("STATE_BACKEND", "sqlite").strip().lower() == "sqlite" and os.path.exists(state_db)
+            and not _shard_files(state_db)):
+        log.info("splitting %s into %d shards: %s", state_db, workers, split_state(state_db, workers))
+
+    router = ShardRouter(workers, base_port, path, internal_secret)
+    pool = WorkerPool(workers, base_port, internal_secret)
+    receiver = Receiver(router, token, api_url=os.getenv("BOT_API_URL") or "https://api.telegram.org",
+                        mode=mode, port=port, public_url=public_url, path=path, secret=webhook_secret)
+    if stop is None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:  # Windows
+                pass
+    await router.start()
+    await pool.start()
+    await receiver.start()
+    log.info("sharded bot started: %d workers on ports %d-%d", workers, base_port, base_port + workers - 1)
+    try:
+        await stop.wait()
+    finally:
+        await receiver.stop()
+        await router.drain()
+        await router.stop()
+        await pool.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="MindMeld: приёмник апдейтов + N воркеров bot.py")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("SHARDS") or os.cpu_count() or 1))
+    ap.add_argument("--split", action="store_true", help="разложить STATE_DB по шардам и выйти")
+    args = ap.parse_args()
+    if args.split:
+        state_db = os.getenv("STATE_DB", "state.db").strip()
+        print(f"[shard] {state_db} → {args.workers} shards: {split_state(state_db, args.workers)}")
+        return
+    asyncio.run(run(max(1, args.workers)))
+
+
+if __name__ == "__main__":
+    main()
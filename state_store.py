@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Долговременное состояние бота (USER_STATE, USER_GUIDE_RECEIVED, …)
+- Чтения — только из памяти; данные подгружаются из бэкенда один раз, при первом обращении
+- Записи копятся в «грязном» буфере и сбрасываются пачкой фоновой задачей (write-behind),
+  сам диск трогается в отдельном потоке → хендлеры никогда не ждут I/O
+- Бэкенды: sqlite (WAL, по умолчанию) и memory (без сохранения)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections.abc import MutableMapping, MutableSet
+
+log = logging.getLogger("mindmeld_bot.state")
+
+_DELETED = object()
+
+
+# ─────────── Бэкенды ───────────
+class MemoryBackend:
+    """Ничего не сохраняет — для локальных запусков и бенчмарков."""
+
+    def load(self, ns: str) -> dict:
+        return {}
+
+    def write(self, ops) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " PRIMARY KEY (ns, key)) WITHOUT ROWID"
+        )
+
+    def load(self, ns: str) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT key, value FROM kv WHERE ns = ?", (ns,)).fetchall()
+        return dict(rows)
+
+    def write(self, ops) -> None:
+        """ops — [(ns, key, value | None)]; None = удалить."""
+        upserts = [(ns, k, v) for ns, k, v in ops if v is not None]
+        deletes = [(ns, k) for ns, k, v in ops if v is None]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                if upserts:
+                    self._db.executemany(
+                        "INSERT INTO kv (ns, key, value) VALUES (?, ?, ?) "
+                        "ON CONFLICT (ns, key) DO UPDATE SET value = excluded.value", upserts)
+                if deletes:
+                    self._db.executemany("DELETE FROM kv WHERE ns = ? AND key = ?", deletes)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "memory": lambda path=None: MemoryBackend(),
+}
+
+
+def make_backend(kind: str = "sqlite", path: str = "state.db"):
+    try:
+        factory = BACKENDS[kind]
+    except KeyError:
+        raise RuntimeError(f"Неизвестный STATE_BACKEND: {kind!r} (есть: {', '.join(BACKENDS)})")
+    return factory(path)
+
+
+# ─────────── Коллекции поверх стора ───────────
+class _Collection:
+    def __init__(self, store: "StateStore", ns: str):
+        self._store = store
+        self._ns = ns
+        self._data = None
+
+    def _items(self) -> dict:
+        if self._data is None:
+            raw = self._store.backend.load(self._ns)
+            self._data = {json.loads(k): json.loads(v) for k, v in raw.items()}
+        return self._data
+
+    def _put(self, key, value):
+        self._items()[key] = value
+        self._store._mark(self._ns, key, value)
+
+    def _drop(self, key):
+        del self._items()[key]
+        self._store._mark(self._ns, key, _DELETED)
+
+
+class PersistentDict(_Collection, MutableMapping):
+    """dict с сохранением. Вложенные значения не отслеживаются — после правки присваивай заново."""
+
+    def __getitem__(self, key):
+        return self._items()[key]
+
+    def __setitem__(self, key, value):
+        self._put(key, value)
+
+    def __delitem__(self, key):
+        self._drop(key)
+
+    def __iter__(self):
+        return iter(list(self._items()))
+
+    def __len__(self):
+        return len(self._items())
+
+    def __contains__(self, key):
+        return key in self._items()
+
+    def get(self, key, default=None):
+        return self._items().get(key, default)
+
+
+class PersistentSet(_Collection, MutableSet):
+    def __contains__(self, key):
+        return key in self._items()
+
+    def __iter__(self):
+        return iter(list(self._items()))
+
+    def __len__(self):
+        return len(self._items())
+
+    def add(self, key):
+        if key not in self._items():
+            self._put(key, 1)
+
+    def discard(self, key):
+        if key in self._items():
+            self._drop(key)
+
+
+# ─────────── Стор ───────────
+class StateStore:
+    def __init__(self, backend, flush_interval: float = 0.5, max_batch: int = 500):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._collections = {}
+        self._dirty = {}              # (ns, key_json) → value_json | None
+        self._wakeup = None
+        self._task = None
+        self._flush_lock = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def dict(self, ns: str) -> PersistentDict:
+        return self._collections.setdefault(ns, PersistentDict(self, ns))
+
+    def set(self, ns: str) -> PersistentSet:
+        return self._collections.setdefault(ns, PersistentSet(self, ns))
+
+    def preload(self):
+        for coll in list(self._collections.values()):
+            coll._items()
+
+    def _mark(self, ns, key, value):
+        k = json.dumps(key, ensure_ascii=False)
+        self._dirty[(ns, k)] = None if value is _DELETED else json.dumps(value, ensure_ascii=False)
+        if self._wakeup is not None and len(self._dirty) >= self.max_batch:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    async def start(self):
+        await asyncio.to_thread(self.preload)
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._flusher(), name="state-flusher")
+
+    async def _flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                log.warning("state flush failed (will retry): %s", e)
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        async with self._flush_lock or asyncio.Lock():
+            batch, self._dirty = self._dirty, {}
+            ops = [(ns, k, v) for (ns, k), v in batch.items()]
+            try:
+                await asyncio.to_thread(self.backend.write, ops)
+            except Exception:
+                # вернуть в буфер то, что не перезаписали свежие правки
+                for key, v in batch.items():
+                    self._dirty.setdefault(key, v)
+                raise
+            self.flushes += 1
+            self.rows_written += len(ops)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        self.backend.close()
+
+
+def open_store() -> StateStore:
+    kind = os.getenv("STATE_BACKEND", "sqlite").strip().lower()
+    path = os.getenv("STATE_DB", "state.db").strip()
+    return StateStore(make_backend(kind, path),
+                      flush_interval=float(os.getenv("STATE_FLUSH_INTERVAL", "0.5")))
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Транспорт Bot API: пулы соединений и учёт исходящих вызовов
+- TunedRequest — HTTPXRequest со своим именованным пулом: размер, keep-alive (сколько держать
+  простаивающих соединений и как долго), HTTP/2 при установленном h2, таймауты по методам
+  (загрузка файла — долгая запись, answerCallbackQuery — короткие) и учёт ожидания свободного
+  соединения: trace-расширение httpcore отмечает момент, когда запрос получил соединение
+- Соединение из пула ждут по одному, в порядке очереди (asyncio.Lock до первого события соединения):
+  httpcore 1.0 раздаёт всю очередь на первое свободное keep-alive соединение, все кроме одного получают
+  ConnectionNotAvailable и идут на новый круг — всплеск из сотни запросов стоит сотни кругов, и чем больше
+  пул, тем дороже круг. По одному — каждый сразу берёт своё свободное соединение
+- pool timeout — настоящий предел всего ожидания (очередь + пул): httpcore перевзводит свой таймаут
+  на каждом круге, поэтому ограничиваем сами — asyncio.timeout, снимаемый с первым событием соединения;
+  не дождался → TimedOut, запрос не ушёл
+- У long-poll getUpdates и у исходящих вызовов разные пулы → висящий getUpdates не занимает
+  соединение, нужное send*, а пачка отправок не задерживает приём апдейтов
+- CountingRequest — HTTPXRequest, который считает каждый запрос (всего и по методам)
+- CountingApplication — Application, открывающий «рамку» на время обработки апдейта
+  → видно, сколько вызовов API в среднем уходит на один апдейт (contextvar, без глобальных флагов)
+- Вызовы вне апдейта (напоминания, прогрев медиа, set_webhook) идут в background
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import Counter
+
+import httpx
+from telegram.error import TimedOut
+from telegram.ext import Application
+from telegram.request import BaseRequest, HTTPXRequest
+
+from metrics import API_CONNECTIONS, API_POOL_TIMEOUTS, API_POOL_WAIT
+
+log = logging.getLogger("mindmeld_bot.transport")
+
+_CURRENT = contextvars.ContextVar("api_calls_frame", default=None)
+_POOL_WAIT = contextvars.ContextVar("api_pool_wait", default=None)
+
+
+class _PoolWait:
+    """Ожидание соединения одним запросом: предел (asyncio.Timeout) и занята ли очередь пула."""
+    __slots__ = ("deadline", "queued")
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.queued = False
+
+DEFAULT_TIMEOUTS = {"connect": 5.0, "read": 5.0, "write": 5.0, "pool": 1.0}  # как у HTTPXRequest
+# поверх общих, если вызывающий не передал свои
+METHOD_TIMEOUTS = {
+    "answerCallbackQuery": {"connect": 3.0, "read": 3.0, "write": 3.0},  # поздний ответ на нажатие уже не нужен
+    "getChatMember": {"read": 4.0},
+    "deleteMessage": {"read": 4.0},
+}
+# запрос с файлом (гайд/фото ещё без file_id): PTB по умолчанию даёт на запись 20 с
+UPLOAD_TIMEOUTS = {"read": 30.0, "write": 60.0}
+
+POOLS = {}  # имя пула → TunedRequest (для /metrics и /cache)
+
+
+class ApiCallStats:
+    def __init__(self):
+        self.updates = 0
+        self.calls = 0         # вызовы внутри апдейтов
+        self.background = 0    # вызовы вне апдейтов
+        self.max_per_update = 0
+        self.by_method = Counter()
+
+    def record_call(self, method: str):
+        self.by_method[method] += 1
+        frame = _CURRENT.get()
+        if frame is None:
+            self.background += 1
+        else:
+            frame[0] += 1
+
+    def begin(self):
+        return _CURRENT.set([0])
+
+    def end(self, token):
+        calls = _CURRENT.get()[0]
+        _CURRENT.reset(token)
+        self.updates += 1
+        self.calls += calls
+        self.max_per_update = max(self.max_per_update, calls)
+
+    def stats(self) -> dict:
+        return {
+            "updates": self.updates, "calls": self.calls, "background": self.background,
+            "per_update": round(self.calls / self.updates, 3) if self.updates else 0.0,
+            "max_per_update": self.max_per_update, "by_method": dict(self.by_method.most_common()),
+        }
+
+
+API_STATS = ApiCallStats()
+
+
+class TunedRequest(HTTPXRequest):
+    def __init__(self, pool: str = "send", pool_size: int = 256, keepalive: int = None,
+                 keepalive_expiry: float = 30.0, http2: bool = False, timeouts: dict = None,
+                 method_timeouts: dict = None, upload_timeouts: dict = None):
+        self.pool = pool
+        self.pool_size = pool_size
+        self.method_timeouts = METHOD_TIMEOUTS if method_timeouts is None else method_timeouts
+        self.upload_timeouts = UPLOAD_TIMEOUTS if upload_timeouts is None else upload_timeouts
+        self.in_use = 0        # запросы, которые сейчас ждут соединение или идут по нему
+        self.peak = 0
+        self.opened = 0        # новые TCP-соединения (остальные запросы — по keep-alive)
+        self._queue = asyncio.Lock()  # соединение из пула ждут по одному
+        self._limits = httpx.Limits(max_connections=pool_size,
+                                    max_keepalive_connections=pool_size if keepalive is None else keepalive,
+                                    keepalive_expiry=keepalive_expiry)
+        t = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        kwargs = dict(connection_pool_size=pool_size, read_timeout=t["read"], write_timeout=t["write"],
+                      connect_timeout=t["connect"], pool_timeout=t["pool"])
+        try:
+            super().__init__(http_version="2" if http2 else "1.1", **kwargs)
+        except RuntimeError as e:  # нет h2 (pip install "python-telegram-bot[http2]")
+            log.warning("HTTP/2 unavailable for pool %s, using HTTP/1.1: %s", pool, e)
+            super().__init__(http_version="1.1", **kwargs)
+        POOLS[pool] = self
+
+    def _build_client(self) -> httpx.AsyncClient:
+        self._client_kwargs["limits"] = self._limits
+        self._client_kwargs["event_hooks"] = {"request": [self._on_request]}
+        return super()._build_client()
+
+    async def _on_request(self, request: httpx.Request):
+        """Хук httpx до пула: первое событие соединения (connect или отправка заголовков
+        по живому соединению) = запрос дождался соединения."""
+        started = time.perf_counter()
+        waiting = [True]
+        wait = _POOL_WAIT.get()
+        if wait is not None:
+            await self._queue.acquire()
+            wait.queued = True
+
+        async def trace(name, info):
+            if waiting:
+                waiting.clear()
+                if wait is not None:
+                    self._release(wait)
+                    if not wait.deadline.expired():
+                        wait.deadline.reschedule(None)  # соединение есть — дальше только connect/read/write таймауты
+                API_POOL_WAIT.observe(time.perf_counter() - started, self.pool)
+            if name == "connection.connect_tcp.started":
+                self.opened += 1
+                API_CONNECTIONS.inc(self.pool)
+
+        request.extensions["trace"] = trace
+
+    def _release(self, wait: _PoolWait):
+        if wait.queued:
+            wait.queued = False
+            self._queue.release()
+
+    def _timeouts_for(self, api_method: str, request_data) -> dict:
+        timeouts = self.method_timeouts.get(api_method) or {}
+        if request_data is not None and request_data.contains_files:
+            timeouts = {**timeouts, **self.upload_timeouts}
+        return timeouts
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        timeouts = self._timeouts_for(url.rsplit("/", 1)[-1], request_data)
+        if timeouts:
+            default = BaseRequest.DEFAULT_NONE
+            read_timeout = timeouts.get("read", read_timeout) if read_timeout is default else read_timeout
+            write_timeout = timeouts.get("write", write_timeout) if write_timeout is default else write_timeout
+            connect_timeout = timeouts.get("connect", connect_timeout) if connect_timeout is default else connect_timeout
+            pool_timeout = timeouts.get("pool", pool_timeout) if pool_timeout is default else pool_timeout
+        wait_cap = self._client.timeout.pool if pool_timeout is BaseRequest.DEFAULT_NONE else pool_timeout
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        wait = _PoolWait(asyncio.timeout(wait_cap))
+        token = _POOL_WAIT.set(wait)
+        try:
+            async with wait.deadline:
+                return await super().do_request(url, method, request_data, read_timeout=read_timeout,
+                                                write_timeout=write_timeout, connect_timeout=connect_timeout,
+                                                pool_timeout=pool_timeout)
+        except TimeoutError:
+            API_POOL_TIMEOUTS.inc(self.pool)
+            raise TimedOut(f"Pool timeout: no free connection in pool {self.pool!r} within {wait_cap}s. "
+                           "Request was *not* sent to Telegram.") from None
+        except TimedOut as e:
+            if isinstance(e.__cause__, httpx.PoolTimeout):
+                API_POOL_TIMEOUTS.inc(self.pool)
+            raise
+        finally:
+            self._release(wait)  # ошибка или отмена до соединения
+            _POOL_WAIT.reset(token)
+            self.in_use -= 1
+
+    def stats(self) -> dict:
+        return {"size": self.pool_size, "http": self.http_version, "in_use": self.in_use, "peak": self.peak,
+                "opened": self.opened, "waits": API_POOL_WAIT.count(self.pool),
+                "pool_timeouts": API_POOL_TIMEOUTS.value(self.pool)}
+
+
+class CountingRequest(HTTPXRequest):
+    async def do_request(self, url, method, *args, **kwargs):
+        API_STATS.record_call(url.rsplit("/", 1)[-1])
+        return await super().do_request(url, method, *args, **kwargs)
+
+
+class CountingApplication(Application):
+    async def process_update(self, update):
+        token = API_STATS.begin()
+        try:
+            await super().process_update(update)
+        finally:
+            API_STATS.end(token)
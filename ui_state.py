@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Что уже показано пользователю — чтобы не слать лишних запросов в Bot API
+- Старая reply-клавиатура: убираем один раз на чат (множество в state_store, переживает рестарт)
+- По каждому нашему сообщению помним тип (photo/text) и отпечаток последнего содержимого
+  → safe_edit сразу выбирает edit_caption / edit_text / новое сообщение и пропускает правку «на то же самое»
+- Отпечатки живут только в памяти (LRU на max_messages): после рестарта первая правка просто не пропускается
+"""
+
+from collections import OrderedDict
+
+CAPTION_LIMIT = 1024  # больше в подпись к фото не влезет — сразу шлём текстом
+
+
+def _key(msg):
+    return msg.chat_id, msg.message_id
+
+
+def kind_of(msg) -> str:
+    """'photo' | 'text' | None (документ, стикер и т.п. — править нечего)."""
+    if getattr(msg, "photo", None):
+        return "photo"
+    if getattr(msg, "text", None):
+        return "text"
+    return None
+
+
+def fingerprint(text, markup) -> int:
+    # InlineKeyboardMarkup неизменяемый и хэшируется по содержимому кнопок
+    return hash((text, markup))
+
+
+class UIState:
+    def __init__(self, store, max_messages: int = 20000):
+        self._kb_removed = store.set("kb_removed")
+        self._rendered = OrderedDict()  # (chat_id, message_id) → (тип, отпечаток)
+        self.max_messages = max_messages
+        self.skipped_edits = 0
+        self.kb_removals = 0
+
+    # ─────────── reply-клавиатура ───────────
+    def needs_kb_removal(self, chat_id) -> bool:
+        return chat_id not in self._kb_removed
+
+    def mark_kb_removed(self, chat_id):
+        if chat_id not in self._kb_removed:
+            self._kb_removed.add(chat_id)
+            self.kb_removals += 1
+
+    # ─────────── сообщения бота ───────────
+    def kind(self, msg) -> str:
+        seen = self._rendered.get(_key(msg))
+        return seen[0] if seen else kind_of(msg)
+
+    def is_unchanged(self, msg, text, markup) -> bool:
+        seen = self._rendered.get(_key(msg))
+        if seen is None or seen[1] != fingerprint(text, markup):
+            return False
+        self._rendered.move_to_end(_key(msg))
+        self.skipped_edits += 1
+        return True
+
+    def remember(self, msg, kind: str, text, markup):
+        if msg is None or not hasattr(msg, "message_id"):
+            return
+        key = _key(msg)
+        self._rendered[key] = (kind, fingerprint(text, markup))
+        self._rendered.move_to_end(key)
+        while len(self._rendered) > self.max_messages:
+            self._rendered.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"kb_removed_chats": len(self._kb_removed), "kb_removals": self.kb_removals,
+                "tracked_messages": len(self._rendered), "skipped_edits": self.skipped_edits}
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Параллельная обработка апдейтов с сохранением порядка внутри одного пользователя
+- Разные пользователи обрабатываются одновременно (до max_concurrent_updates воркеров):
+  долгая загрузка гайда или медленный get_chat_member у одного не держат нажатия остальных
+- Апдейты одного пользователя идут строго по очереди прихода → переходы USER_STATE
+  в qod_callbacks / message_router не гоняются между собой
+- Следующий апдейт занятого пользователя не занимает воркер в ожидании: он встаёт в очередь
+  пользователя, и его выполнит тот же воркер сразу после текущего (один пользователь — максимум один воркер)
+- Порядок входа задаётся Application: задачи создаются в порядке update_queue, а семафор воркеров — FIFO
+- Апдейт без пользователя и чата (например, poll) обрабатывается без очереди
+"""
+
+import logging
+from collections import deque
+
+from telegram.ext import BaseUpdateProcessor
+
+log = logging.getLogger("mindmeld_bot.updates")
+
+
+def update_key(update):
+    """Кому принадлежит апдейт: id пользователя, иначе id чата, иначе None."""
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(update, "effective_chat", None)
+    return chat.id if chat is not None else None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int = 32):
+        super().__init__(max_concurrent_updates)
+        self._backlogs = {}       # ключ пользователя → deque корутин, ждущих текущий апдейт
+        self.processed = 0
+        self.chained = 0          # апдейты, отложенные за предыдущим апдейтом того же пользователя
+        self.max_backlog = 0
+        self.running = 0
+
+    async def do_process_update(self, update, coroutine):
+        key = update_key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+        backlog = self._backlogs.get(key)
+        if backlog is not None:
+            backlog.append(coroutine)
+            self.chained += 1
+            self.max_backlog = max(self.max_backlog, len(backlog))
+            return
+        backlog = self._backlogs[key] = deque()
+        try:
+            await self._run(coroutine)
+            while backlog:
+                await self._run(backlog.popleft())
+        finally:
+            del self._backlogs[key]
+            for rest in backlog:  # остаётся только при отмене (остановка приложения)
+                rest.close()
+
+    async def _run(self, coroutine):
+        self.running += 1
+        try:
+            await coroutine
+        except Exception:
+            # Application.process_update сам отдаёт ошибки хендлеров в error handlers; сюда — только то,
+            # что проскочило мимо, и оно не должно остановить очередь пользователя
+            log.exception("update processing failed")
+        finally:
+            self.running -= 1
+            self.processed += 1
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def backlog(self) -> int:
+        return sum(len(b) for b in self._backlogs.values())
+
+    def stats(self) -> dict:
+        return {"workers": self.max_concurrent_updates, "running": self.running,
+                "users": len(self._backlogs), "backlog": self.backlog(), "processed": self.processed,
+                "chained": self.chained, "max_backlog": self.max_backlog}
@@ -1,10 +1,18 @@
-import os, json, csv
+import os, json
 from datetime import date
 from typing import List
 
 from aiogram import Bot
 from config import BOT_TOKEN, STATS_CSV, INSIGHTS_STORE, WELCOME_PHOTO, DONATION_QR, GUIDES
 
+from broadcast import Broadcast, campaign_id_for
+from content import ContentCatalog
+from eventlog import EventIndex, EventLog
+from outbound import bulk_lane
+
+BROADCAST_DIR = os.getenv("BROADCAST_DIR", "broadcasts")
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "30"))
+
 # -------- Ассеты (проверка наличия, ничего не создаём) --------
 def ensure_images():
     for path in (WELCOME_PHOTO, DONATION_QR):
@@ -34,83 +42,74 @@ def _default_insights() -> List[str]:
         "Какое маленькое действие приблизит тебя к большому?",
     ]
 
+_CONTENT = None
+
+def _content() -> ContentCatalog:
+    global _CONTENT
+    if _CONTENT is None:
+        _CONTENT = ContentCatalog(insights=INSIGHTS_STORE, questions=None, texts=None,
+                                  defaults={"insights": tuple(_default_insights())})
+    _CONTENT.refresh()  # stat не чаще раза в check_interval, перечитка — только при новом mtime
+    return _CONTENT
+
 def load_insights() -> List[str]:
-    if os.path.exists(INSIGHTS_STORE):
-        try:
-            with open(INSIGHTS_STORE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list) and all(isinstance(x, str) for x in data):
-                    return data
-        except Exception as e:
-            print(f"[insights] read error: {e}")
-    # создаём файл с дефолтными вопросами
-    data = _default_insights()
-    try:
-        with open(INSIGHTS_STORE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"[insights] write default error: {e}")
-    return data
+    """Инсайты из INSIGHTS_STORE: {"insights": [...]} или [...]. Файл не перезаписывается;
+    если его нет или он битый — встроенные вопросы."""
+    return list(_content().current.insights)
 
 def get_today_insight() -> str:
-    items = load_insights()
-    if not items:
-        items = _default_insights()
-    idx = (date.today().toordinal()) % len(items)
-    return items[idx]
+    return _content().current.insight(date.today())
 
 # -------- Статистика / рассылка --------
-def _collect_user_ids_from_events() -> list[int]:
-    users = set()
-    if not os.path.exists(STATS_CSV):
-        return []
+_EVENT_INDEX = None
+
+def _event_index() -> EventIndex:
+    global _EVENT_INDEX
+    if _EVENT_INDEX is None:
+        _EVENT_INDEX = EventIndex(EventLog(STATS_CSV))
     try:
-        with open(STATS_CSV, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            next(reader, None)  # заголовок
-            for row in reader:
-                if len(row) >= 2:
-                    try:
-                        uid = int(row[1])
-                        users.add(uid)
-                    except:
-                        pass
+        _EVENT_INDEX.refresh()  # дочитывает только новые строки
     except Exception as e:
-        print(f"[stats] read error: {e}")
-    return sorted(users)
+        print(f"[stats] index refresh error: {e}")
+    return _EVENT_INDEX
+
+def _collect_user_ids_from_events() -> list[int]:
+    return _event_index().user_ids()
 
 def get_stats() -> str:
-    total_users = len(_collect_user_ids_from_events())
-    starts = downloads = subs = unsubs = 0
-    if os.path.exists(STATS_CSV):
-        with open(STATS_CSV, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            next(reader, None)
-            for _, _, event, _ in reader:
-                if event == "start": starts += 1
-                elif event == "guide_download": downloads += 1
-                elif event == "daily_subscribe": subs += 1
-                elif event == "daily_unsubscribe": unsubs += 1
+    idx = _event_index()
+    counts = idx.counts
     return (
-        f"Пользователей (по событиям): {total_users}\n"
-        f"Стартов: {starts}\n"
-        f"Скачиваний гайдов: {downloads}\n"
-        f"Подписок на «Вопрос дня»: {subs}\n"
-        f"Отписок: {unsubs}"
+        f"Пользователей (по событиям): {len(idx.users)}\n"
+        f"Стартов: {counts.get('start', 0)}\n"
+        f"Скачиваний гайдов: {counts.get('guide_download', 0)}\n"
+        f"Подписок на «Вопрос дня»: {counts.get('daily_subscribe', 0)}\n"
+        f"Отписок: {counts.get('daily_unsubscribe', 0)}"
     )
 
-async def broadcast_message(text: str) -> int:
-    """Простая рассылка по всем user_id, встреченным в events.csv."""
+async def broadcast_message(text: str, campaign_id: str = None, bot: Bot = None) -> int:
+    """Рассылка по всем user_id, встреченным в events.csv.
+    Параллельно под лимитом ~30 msg/s; прерванная кампания (тот же текст / campaign_id) продолжается."""
     ids = _collect_user_ids_from_events()
     if not ids:
         return 0
-    bot = Bot(token=BOT_TOKEN)
-    sent = 0
-    for uid in ids:
-        try:
+    own_bot = bot is None
+    if own_bot:
+        bot = Bot(token=BOT_TOKEN)
+
+    async def send(uid):
+        with bulk_lane():  # если бот общий с bot.py — рассылка идёт фоновой полосой планировщика
             await bot.send_message(uid, text)
-            sent += 1
-        except Exception as e:
-            print(f"[broadcast] fail to {uid}: {e}")
-    await bot.session.close()
-    return sent
+
+    try:
+        result = await Broadcast(
+            send,
+            ids,
+            campaign_id or campaign_id_for(text),
+            state_dir=BROADCAST_DIR,
+            rate=BROADCAST_RATE,
+        ).run()
+    finally:
+        if own_bot:
+            await bot.session.close()
+    return result.sent